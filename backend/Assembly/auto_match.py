@@ -1,14 +1,21 @@
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
 from pathlib import Path
 import json
 import re
 
-import pandas as pd
-from rapidfuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
 import jellyfish
 
 from fastapi import APIRouter, HTTPException
 
+from backend.Assembly.db_snapshot import WorkTimeDbSnapshot, get_work_time_db_snapshot
+from backend.Assembly.gram_index import GramIndex
+from backend.text_normalization import normalize_part_text as normalize_text
+
 # 당신 프로젝트에 이미 존재하는 것들(경로/세션 유틸)
 # - DATA_DIR
 # - SESSION_STATE
@@ -28,76 +35,15 @@ ONLY_INHOUSE = True
 TOPK = 5
 JW_THRESHOLD = 90.0
 COMBINED_THRESHOLD = 90.0
+# 정규화/점수 규칙이 바뀌면 올린다 (사전 매칭·매칭 캐시 무효화 기준)
+MATCH_SCORING_VERSION = 5
 EXCLUDED_MATCH_SHEETS = {"대형램프 DB"}
 
-STOP_TOKENS = {
-    "LH", "RH", "STD", "ECE", "LHD", "RHD", "LD", "HD", "EC",
-    "LEFT", "RIGHT",
-    "TYPE", "TYP", "ASSY", "S/A",
-}
-
-SYN_MAP = {
-    "BPR": "BUMPER",
-    "BUMPER": "BUMPER",
-    "BRKT": "BRACKET",
-    "BRACKET": "BRACKET",
-    "HSG": "HOUSING",
-    "HOUSING": "HOUSING",
-    "INR": "INNER",
-    "INNER": "INNER",
-    "OTR": "MAIN",
-    "OUTER": "MAIN",
-    "EXTN": "EXTENSION",
-    "EXT": "EXTENSION",
-    "EXTENSION": "EXTENSION",
-    "WIRG": "WIRING",
-    "WIRING": "WIRING",
-    "WIRE": "WIRING",
-    "TURN": "T/SIG",
-    "SIGNAL": "",
-}
-
 ASSEMBLY_COLUMNS = [
     "부품 기준", "요소작업", "OPTION", "작업자", "no", "동작요소", "반복횟수", "SEC", "TOTAL"
 ]
 
 
-# =========================
-# 텍스트 정규화
-# =========================
-def normalize_text(s: Any) -> str:
-    if s is None:
-        return ""
-
-    s = str(s).strip()
-    if not s:
-        return ""
-
-    # [] 안 제거 (요구사항 반영)
-    s = re.sub(r"\[[^\]]*\]", " ", s)
-
-    s = s.replace("-", " ").replace("_", " ")
-    s = s.upper()
-    s = re.sub(r"[^A-Z0-9/ ]+", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-
-    tokens = s.split(" ")
-    out: List[str] = []
-
-    for t in tokens:
-        if not t:
-            continue
-        # STOP_TOKENS 만나면 이후 토큰은 버림 (당신 기존 로직)
-        if t in STOP_TOKENS:
-            break
-        if t in SYN_MAP:
-            t = SYN_MAP[t]
-        if t:
-            out.append(t)
-
-    return " ".join(out).strip()
-
-
 # =========================
 # 점수 함수들
 # =========================
@@ -117,6 +63,30 @@ def combined_score(rf: float, jw: float) -> float:
     return round((float(rf) * 0.45) + (float(jw) * 0.55), 2)
 
 
+def combined_upper_bound(rf: float) -> float:
+    # JW가 최대(100)일 때의 combined. 반올림 여유 0.01 포함
+    return (float(rf) * 0.45) + 55.0 + 0.01
+
+
+def rf_score_matrix(queries_norm: List[str], choices: List[str]) -> "np.ndarray":
+    # 질의 × 선택지 rf_score 행렬을 멀티스레드 C 코드 한 번으로 계산
+    if not queries_norm or not choices:
+        return np.zeros((len(queries_norm), len(choices)), dtype=np.float64)
+    return process.cdist(
+        queries_norm,
+        choices,
+        scorer=fuzz.WRatio,
+        processor=None,
+        dtype=np.float64,
+        workers=-1,
+    )
+
+
+def rf_score_many(query_norm: str, choices: List[str]) -> "np.ndarray":
+    # rf_score와 같은 값을 선택지 전체에 대해 C 코드 한 번으로 계산
+    return rf_score_matrix([query_norm], choices)[0]
+
+
 # =========================
 # 엑셀 컬럼 찾기
 # =========================
@@ -139,42 +109,226 @@ def find_part_col(columns) -> Optional[str]:
 # =========================
 # DB(엑셀) 로딩
 # =========================
-def load_db_rows(excel_path: Path) -> Tuple[List[Dict[str, Any]], List[str]]:
-    if not excel_path.exists():
-        raise HTTPException(500, f"작업시간분석표DB.xlsx 파일이 없습니다: {excel_path}")
+def _header_labels(header) -> List[str]:
+    # pandas(header=EXCEL_HEADER_ROW)와 같은 컬럼 라벨 규칙
+    return [f"Unnamed: {i}" if h is None else str(h) for i, h in enumerate(header)]
+
+
+def _used_row_count(rows) -> int:
+    # 끝쪽의 값 없는 행(read_only 시트 dimension까지 채워진 빈 행)은 시트 길이에서 제외
+    for i in range(len(rows) - 1, -1, -1):
+        if any(v is not None for v in rows[i]):
+            return i + 1
+    return 0
+
+
+def _cell_text(value: Any) -> str:
+    """
+    셀 값 → 문자열: 빈 칸은 "", 나머지는 str(value).strip()
+    - openpyxl 값을 그대로 쓰므로 pandas(read_excel)의 dtype 추론은 따라 하지 않는다
+      (예: 빈 칸이 섞인 숫자 컬럼의 정수 2는 pandas의 "2.0"이 아니라 "2", 빈 칸은 "nan"이 아니라 "")
+    """
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+@dataclass
+class MatchDbTable:
+    """'부품 기준' 등장 위치를 컬럼 단위로 담은 매칭용 테이블.
+
+    i번째 항목은 sheets[sheet_ids[i]] 시트의 row_index[i] 행에서 시작하는 부품 블록이다.
+    시트 s의 항목은 [sheet_offsets[s], sheet_offsets[s + 1]) 구간에 row_index 오름차순으로 있다.
+    """
+
+    sheets: List[str] = field(default_factory=list)
+    sheet_offsets: array = field(default_factory=lambda: array("i", [0]))
+    sheet_row_counts: array = field(default_factory=lambda: array("i"))
+    raw: List[str] = field(default_factory=list)
+    norm: List[str] = field(default_factory=list)
+    sheet_ids: array = field(default_factory=lambda: array("i"))
+    row_index: array = field(default_factory=lambda: array("i"))
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def sheet(self, i: int) -> str:
+        return self.sheets[self.sheet_ids[i]]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {
+            "db_part_raw": self.raw[i],
+            "db_part_norm": self.norm[i],
+            "sheet": self.sheet(i),
+            "row_index": self.row_index[i],
+        }
+
+    def to_db_rows(self) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in range(len(self))]
+
+    def block_bounds(self, sheet: str, start: int) -> Optional[Tuple[int, int]]:
+        # 블록 끝 = 같은 시트에서 start 다음 부품 시작 행 (없으면 시트의 사용 행 수)
+        if sheet not in self.sheets:
+            return None
+        sheet_id = self.sheets.index(sheet)
+        lo = self.sheet_offsets[sheet_id]
+        hi = self.sheet_offsets[sheet_id + 1]
+        pos = bisect_right(self.row_index, start, lo, hi)
+        end = self.row_index[pos] if pos < hi else self.sheet_row_counts[sheet_id]
+        return start, end
+
+
+class MatchDbRows(Sequence):
+    """MatchDbTable 위의 읽기 전용 db_rows 뷰.
+
+    행 dict를 미리 만들어 두지 않고 접근할 때만 만든다 (스냅샷에 행 수만큼 dict를 들고 있지 않게).
+    """
+
+    __slots__ = ("table",)
+
+    def __init__(self, table: MatchDbTable):
+        self.table = table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.table.row(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.table.row(i)
+
+
+@dataclass
+class ChoiceTable:
+    """정규화 문자열 중복 제거 테이블.
+
+    unique[u]는 같은 정규화 문자열을 한 번만 담고(첫 등장 순서),
+    그 문자열이 나오는 db_rows 위치는 rows[offsets[u]:offsets[u + 1]]에 오름차순으로 있다.
+    unique id 순서 = 첫 등장 위치 순서이므로 unique 위의 동점 정렬(인덱스 오름차순)이
+    행 위의 동점 정렬과 어긋나지 않는다.
+    """
+
+    unique: List[str] = field(default_factory=list)
+    offsets: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int32))
+    rows: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int32))
+    unique_of_row: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int32))
+    id_by_text: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, choices: Sequence[str]) -> "ChoiceTable":
+        id_by_text: Dict[str, int] = {}
+        unique_of_row = array("i")
+        for text in choices:
+            unique_of_row.append(id_by_text.setdefault(text, len(id_by_text)))
+
+        unique_of_row_np = np.frombuffer(unique_of_row, dtype=np.int32).copy()
+        counts = np.bincount(unique_of_row_np, minlength=len(id_by_text))
+        offsets = np.zeros(len(id_by_text) + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(
+            unique=list(id_by_text),
+            offsets=offsets,
+            rows=np.argsort(unique_of_row_np, kind="stable").astype(np.int32),
+            unique_of_row=unique_of_row_np,
+            id_by_text=id_by_text,
+        )
+
+    def __len__(self) -> int:
+        return len(self.unique)
+
+    @property
+    def row_count(self) -> int:
+        return int(self.unique_of_row.shape[0])
+
+    def occurrences(self, uid: int) -> np.ndarray:
+        return self.rows[self.offsets[uid]:self.offsets[uid + 1]]
+
+    def rows_of_text(self, text: str) -> np.ndarray:
+        uid = self.id_by_text.get(text)
+        return self.occurrences(uid) if uid is not None else self.rows[:0]
+
+    def expand_topk(self, top_unique: List[Tuple[int, float]], topk: int) -> List[Tuple[int, float]]:
+        """
+        unique 위 TopK(점수 내림차순, 동점은 unique id 오름차순) → 행 위 TopK(동점은 행 위치 오름차순)
+        TopK unique 밖의 행은 앞선 unique들의 첫 등장 행 topk개보다 뒤이므로 여기서 다 나온다.
+        """
+        expanded = [
+            (int(row), score)
+            for uid, score in top_unique
+            for row in self.occurrences(uid)[:topk]
+        ]
+        expanded.sort(key=lambda item: (-item[1], item[0]))
+        return expanded[:topk]
+
 
-    xls = pd.ExcelFile(excel_path)
-    db_rows: List[Dict[str, Any]] = []
+def _build_match_db_table(snapshot: WorkTimeDbSnapshot) -> MatchDbTable:
+    table_out = MatchDbTable()
 
-    for sheet in xls.sheet_names:
+    for sheet in snapshot.sheet_names:
         if sheet in EXCLUDED_MATCH_SHEETS:
             continue
 
-        df = pd.read_excel(excel_path, sheet_name=sheet, header=EXCEL_HEADER_ROW)
-
-        part_col = find_part_col(df.columns)
+        table = snapshot.tables[sheet]
+        labels = _header_labels(table.header)
+        part_col = find_part_col(labels)
         if not part_col:
             continue
+        col = labels.index(part_col)
 
-        for idx, val in df[part_col].items():
-            if pd.isna(val):
-                continue
-            raw = str(val).strip()
+        sheet_id = len(table_out.sheets)
+        row_count = _used_row_count(table.rows)
+
+        # 한 번의 순회로 부품 시작 행을 모은다 (블록 끝은 block_bounds에서 다음 시작 행으로)
+        for idx in range(row_count):
+            raw = _cell_text(table.rows[idx][col])
             if not raw:
                 continue
 
-            db_rows.append({
-                "db_part_raw": raw,
-                "db_part_norm": normalize_text(raw),
-                "sheet": sheet,
-                "row_index": int(idx),
-            })
+            table_out.raw.append(raw)
+            table_out.norm.append(normalize_text(raw))
+            table_out.sheet_ids.append(sheet_id)
+            table_out.row_index.append(idx)
 
-    if not db_rows:
+        table_out.sheets.append(sheet)
+        table_out.sheet_row_counts.append(row_count)
+        table_out.sheet_offsets.append(len(table_out))
+
+    return table_out
+
+
+def load_match_db(excel_path: Path) -> MatchDbTable:
+    if not excel_path.exists():
+        raise HTTPException(500, f"작업시간분석표DB.xlsx 파일이 없습니다: {excel_path}")
+
+    snapshot = get_work_time_db_snapshot(excel_path)
+    return snapshot.derive("auto_match.match_db", lambda: _build_match_db_table(snapshot))
+
+
+def load_db_rows(excel_path: Path) -> Tuple[MatchDbRows, List[str]]:
+    # db_rows는 MatchDbTable 위의 뷰, db_choices는 테이블의 norm 컬럼 그대로 (복사 없음)
+    match_db = load_match_db(excel_path)
+    if not len(match_db):
         raise HTTPException(500, "엑셀에서 '부품 기준' 컬럼을 찾지 못했습니다.")
 
-    db_choices = [r["db_part_norm"] for r in db_rows]
-    return db_rows, db_choices
+    snapshot = get_work_time_db_snapshot(excel_path)
+    return snapshot.derive("auto_match.db_rows", lambda: (MatchDbRows(match_db), match_db.norm))
+
+
+def load_choice_table(excel_path: Path) -> ChoiceTable:
+    _, db_choices = load_db_rows(excel_path)
+    snapshot = get_work_time_db_snapshot(excel_path)
+    return snapshot.derive("auto_match.choice_table", lambda: ChoiceTable.build(db_choices))
+
+
+def load_match_gram_index(excel_path: Path) -> GramIndex:
+    # load_choice_table()의 unique 문자열 위 색인 (후보 위치 = unique id)
+    choice_table = load_choice_table(excel_path)
+    snapshot = get_work_time_db_snapshot(excel_path)
+    return snapshot.derive("auto_match.gram_index", lambda: GramIndex.build(choice_table.unique))
 
 
 # =========================
@@ -205,50 +359,208 @@ def extract_json_ids(nodes: List[Dict[str, Any]]) -> List[str]:
 # =========================
 # 매칭 (1등만)
 # =========================
+def _rf_topk(
+    qn: str,
+    db_choices: List[str],
+    topk: int,
+    score_cutoff: Optional[float] = None,
+) -> List[Tuple[int, float]]:
+    # C 구현 extract: 점수 내림차순, 동점은 인덱스 오름차순 (기존 안정 정렬과 동일)
+    return [
+        (idx, float(score))
+        for _, score, idx in process.extract(
+            qn,
+            db_choices,
+            scorer=fuzz.WRatio,
+            processor=None,
+            limit=topk,
+            score_cutoff=score_cutoff,
+        )
+    ]
+
+
+def _topk_indices(scores: "np.ndarray", topk: int) -> List[int]:
+    # 점수 내림차순 + 동점은 인덱스 오름차순으로 상위 topk (전체 정렬 없이)
+    n = scores.shape[0]
+    if topk >= n:
+        return np.argsort(-scores, kind="stable").tolist()
+
+    kth = np.partition(scores, n - topk)[n - topk]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: topk - above.size]
+    picked = np.concatenate([above, ties])
+    order = np.lexsort((picked, -scores[picked]))
+    return picked[order].tolist()
+
+
+def _rf_topk_table(
+    qn: str,
+    choice_table: ChoiceTable,
+    topk: int,
+    score_cutoff: Optional[float] = None,
+    gram_index: Optional[GramIndex] = None,
+) -> List[Tuple[int, float]]:
+    # unique 문자열만 점수 계산 → 행 위치로 펼침
+    uids = gram_index.candidates(qn) if gram_index is not None else None
+    if uids is None:
+        top_unique = _rf_topk(qn, choice_table.unique, topk, score_cutoff)
+    else:
+        subset = [choice_table.unique[uid] for uid in uids]
+        top_unique = [
+            (uids[idx], score)
+            for idx, score in _rf_topk(qn, subset, topk, score_cutoff)
+        ]
+    return choice_table.expand_topk(top_unique, topk)
+
+
+def _rf_topk_many(
+    queries_norm: List[str],
+    choice_table: ChoiceTable,
+    topk: int,
+    score_cutoff: Optional[float] = None,
+    *,
+    workers: int = -1,
+) -> List[List[Tuple[int, float]]]:
+    # 질의 전체 × DB unique 문자열 WRatio 행렬을 멀티스레드 C 코드로 한 번에 계산
+    if not queries_norm or not len(choice_table):
+        return [[] for _ in queries_norm]
+
+    matrix = process.cdist(
+        queries_norm,
+        choice_table.unique,
+        scorer=fuzz.WRatio,
+        processor=None,
+        dtype=np.float64,
+        workers=workers,
+        score_cutoff=score_cutoff,
+    )
+    result = []
+    for row in matrix:
+        top_unique = [(uid, float(row[uid])) for uid in _topk_indices(row, topk)]
+        if score_cutoff is not None:
+            # cdist는 cutoff 미만을 0으로 채우므로 extract와 같게 걸러낸다
+            top_unique = [(uid, score) for uid, score in top_unique if score >= score_cutoff]
+        result.append(choice_table.expand_topk(top_unique, topk))
+    return result
+
+
+def _rank_by_jw(
+    query_raw: str,
+    qn: str,
+    top_candidates: List[Tuple[int, float]],
+    db_rows: Sequence[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    # TopK에 대해서 JW 계산 → JW 내림차순 (동점이면 RF 순위가 앞선 후보 유지)
+    # 같은 정규화 문자열의 행은 JW가 같으므로 한 번만 계산
+    jw_by_norm: Dict[str, float] = {}
+    ranked = []
+    for idx, rf in top_candidates:
+        meta = db_rows[idx]
+        norm = meta["db_part_norm"]
+        jw = jw_by_norm.get(norm)
+        if jw is None:
+            jw = jw_by_norm[norm] = jw_score(qn, norm)
+        ranked.append({
+            "json_id_raw": query_raw,
+            "json_id_norm": qn,
+            "db_part_raw": meta["db_part_raw"],
+            "db_part_norm": norm,
+            "score_rapidfuzz": rf,
+            "score_jw": jw,
+            "score_combined": combined_score(rf, jw),
+            # 참고용으로만 유지(지금 단계에서는 반환/저장 안 함)
+            "sheet": meta["sheet"],
+            "row_index": meta["row_index"],
+        })
+    ranked.sort(key=lambda item: item["score_jw"], reverse=True)
+    return ranked
+
+
+def _pick_best_by_jw(
+    query_raw: str,
+    qn: str,
+    top_candidates: List[Tuple[int, float]],
+    db_rows: Sequence[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    ranked = _rank_by_jw(query_raw, qn, top_candidates, db_rows)
+    return ranked[0] if ranked else None
+
+
 def match_one_best(
     query_raw: str,
-    db_rows: List[Dict[str, Any]],
+    db_rows: Sequence[Dict[str, Any]],
     db_choices: List[str],
-    topk: int = TOPK
+    topk: int = TOPK,
+    score_cutoff: Optional[float] = None,
+    gram_index: Optional[GramIndex] = None,
+    choice_table: Optional[ChoiceTable] = None,
 ) -> Optional[Dict[str, Any]]:
+    """
+    score_cutoff: RF가 이 값 미만인 후보는 TopK에서 제외 (None이면 전체 스캔 결과 그대로)
+    choice_table: db_choices의 중복 제거 테이블. 주면 unique 문자열만 점수 계산
+    gram_index: 후보 역색인 (choice_table이 있으면 choice_table.unique 위, 없으면 db_choices 위).
+                주면 gram을 공유하는 후보만 점수 계산 (추린 후보가 너무 적으면 전체 스캔)
+    """
     qn = normalize_text(query_raw)
     if not qn:
         return None
 
-    # 1) rapidfuzz로 전체 스캔 → 상위 TopK 인덱스 추림
-    scored = []
-    for i, choice_norm in enumerate(db_choices):
-        scored.append((i, rf_score(qn, choice_norm)))
+    # 1) rapidfuzz로 (추린 후보 또는 전체) 스캔 → 상위 TopK 인덱스 추림
+    # 2) TopK에 대해서 JW 계산 → 1등 선택
+    if choice_table is not None:
+        top_candidates = _rf_topk_table(qn, choice_table, topk, score_cutoff, gram_index)
+        return _pick_best_by_jw(query_raw, qn, top_candidates, db_rows)
+
+    positions = gram_index.candidates(qn) if gram_index is not None else None
+    if positions is None:
+        top_candidates = _rf_topk(qn, db_choices, topk, score_cutoff)
+    else:
+        subset = [db_choices[i] for i in positions]
+        top_candidates = [
+            (positions[idx], score)
+            for idx, score in _rf_topk(qn, subset, topk, score_cutoff)
+        ]
+    return _pick_best_by_jw(query_raw, qn, top_candidates, db_rows)
 
-    scored.sort(key=lambda x: x[1], reverse=True)
-    top_candidates = scored[:topk]
 
-    # 2) TopK에 대해서 JW 계산 → 1등 선택
-    best = None
-    best_jw = -1.0
-    best_rf = -1.0
+def match_many_topk(
+    queries_raw: List[str],
+    db_rows: Sequence[Dict[str, Any]],
+    db_choices: List[str],
+    topk: int = TOPK,
+    score_cutoff: Optional[float] = None,
+    choice_table: Optional[ChoiceTable] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    여러 질의를 질의×DB(unique 문자열) 점수 행렬 한 번으로 매칭하고 질의별 TopK 후보를 돌려준다.
+    - 후보는 match_one_best 선택 순서(JW 내림차순, 동점이면 RF 순위)로 정렬
+    - 첫 후보가 match_one_best 결과와 같다
+    - choice_table을 안 주면 db_choices로 한 번 만든다
+    """
+    table = choice_table if choice_table is not None else ChoiceTable.build(db_choices)
+    queries_norm = [normalize_text(q) for q in queries_raw]
+    unique_norms = list(dict.fromkeys(qn for qn in queries_norm if qn))
+    top_by_norm = dict(zip(unique_norms, _rf_topk_many(unique_norms, table, topk, score_cutoff)))
 
-    for idx, rf in top_candidates:
-        choice_norm = db_rows[idx]["db_part_norm"]
-        jw = jw_score(qn, choice_norm)
-
-        if jw > best_jw:
-            best_jw = jw
-            best_rf = rf
-            best = {
-                "json_id_raw": query_raw,
-                "json_id_norm": qn,
-                "db_part_raw": db_rows[idx]["db_part_raw"],
-                "db_part_norm": db_rows[idx]["db_part_norm"],
-                "score_rapidfuzz": best_rf,
-                "score_jw": best_jw,
-                "score_combined": combined_score(best_rf, best_jw),
-                # 참고용으로만 유지(지금 단계에서는 반환/저장 안 함)
-                "sheet": db_rows[idx]["sheet"],
-                "row_index": db_rows[idx]["row_index"],
-            }
-
-    return best
+    return [
+        _rank_by_jw(query_raw, qn, top_by_norm[qn], db_rows) if qn else []
+        for query_raw, qn in zip(queries_raw, queries_norm)
+    ]
+
+
+def match_many_best(
+    queries_raw: List[str],
+    db_rows: Sequence[Dict[str, Any]],
+    db_choices: List[str],
+    topk: int = TOPK,
+    score_cutoff: Optional[float] = None,
+    choice_table: Optional[ChoiceTable] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """match_one_best를 여러 질의에 한 번에 적용. 결과는 queries_raw 순서와 같다."""
+    return [
+        ranked[0] if ranked else None
+        for ranked in match_many_topk(queries_raw, db_rows, db_choices, topk, score_cutoff, choice_table)
+    ]
 
 
 def make_empty_assembly_row(db_part_raw: str) -> Dict[str, Any]:
@@ -263,11 +575,22 @@ def get_db_meta_rows_for_part(db_rows, part_raw):
         if r["db_part_raw"] == part_raw
     ]
 
-import pandas as pd
+def _assembly_column_layout(snapshot: WorkTimeDbSnapshot, sheet: str) -> Dict[str, int]:
+    """ASSEMBLY_COLUMNS 이름 → 컬럼 위치 (같은 라벨이 여러 번이면 첫 컬럼). 없는 컬럼은 빠진다."""
+
+    def build() -> Dict[str, int]:
+        col_by_name: Dict[str, int] = {}
+        for i, label in enumerate(_header_labels(snapshot.tables[sheet].header)):
+            col_by_name.setdefault(label, i)
+        return {name: col_by_name[name] for name in ASSEMBLY_COLUMNS if name in col_by_name}
+
+    return snapshot.derive(f"auto_match.assembly_columns.{sheet}", build)
+
 
 def load_excel_rows_for_matches(excel_path, matched_meta_rows):
-    xls = pd.ExcelFile(excel_path)
-    sheet_cache = {}
+    excel_path = Path(excel_path)
+    snapshot = get_work_time_db_snapshot(excel_path)
+    match_db = load_match_db(excel_path)
     out = []
 
     # sheet별로 묶기
@@ -278,41 +601,25 @@ def load_excel_rows_for_matches(excel_path, matched_meta_rows):
     for sheet, metas in by_sheet.items():
         metas = sorted(metas, key=lambda x: x["row_index"])
 
-        if sheet not in sheet_cache:
-            df = pd.read_excel(excel_path, sheet_name=sheet, header=EXCEL_HEADER_ROW)
-            sheet_cache[sheet] = df
-        else:
-            df = sheet_cache[sheet]
-
-        part_col = find_part_col(df.columns)
-        if not part_col:
+        table = snapshot.tables.get(sheet)
+        if table is None:
             continue
 
-        part_rows = [
-            i for i, v in df[part_col].items()
-            if not pd.isna(v) and str(v).strip()
-        ]
+        if not find_part_col(_header_labels(table.header)):
+            continue
+        layout = _assembly_column_layout(snapshot, sheet)
 
         for m in metas:
-            start = m["row_index"]
-
-            # 다음 part 시작 전까지
-            next_part_rows = [r for r in part_rows if r > start]
-            end = next_part_rows[0] if next_part_rows else len(df)
-
-            for i in range(start, end):
-                row = df.iloc[i]
+            # 다음 part 시작 전까지 (블록 경계는 로딩 시 계산됨)
+            bounds = match_db.block_bounds(sheet, m["row_index"])
+            if bounds is None:
+                continue
+            start, end = bounds
 
+            for row in table.rows[start:end]:
                 out.append({
-                    "부품 기준": str(row.get("부품 기준", "")).strip(),
-                    "요소작업": str(row.get("요소작업", "")).strip(),
-                    "OPTION": str(row.get("OPTION", "")).strip(),
-                    "작업자": str(row.get("작업자", "")).strip(),
-                    "no": str(row.get("no", "")).strip(),
-                    "동작요소": str(row.get("동작요소", "")).strip(),
-                    "반복횟수": str(row.get("반복횟수", "")).strip(),
-                    "SEC": str(row.get("SEC", "")).strip(),
-                    "TOTAL": str(row.get("TOTAL", "")).strip(),
+                    name: _cell_text(row[layout[name]]) if name in layout else ""
+                    for name in ASSEMBLY_COLUMNS
                 })
 
     return out
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.Assembly.auto_match import (
+    MATCH_SCORING_VERSION,
+    TOPK,
+    load_choice_table,
+    load_db_rows,
+    load_match_gram_index,
+    match_many_topk,
+    match_one_best,
+    normalize_text,
+)
+from backend.Assembly.db_snapshot import get_work_time_db_snapshot
+from backend.Assembly.match_cache import get_match_cache
+
+logger = logging.getLogger(__name__)
+
+# BOM run 폴더에 저장하는 사전 매칭 결과 (BOM 업로드 직후 생성)
+PREMATCH_FILENAME = "part_matches.json"
+TREE_SPECS_CACHE_FILENAME = "tree_specs_cache.json"
+
+
+# =========================
+# 질의 → TopK 후보
+# =========================
+def part_node_query(node: Dict[str, Any]) -> str:
+    # 트리 노드의 매칭 질의: 품번(id) 우선, 없으면 품명
+    return str(node.get("id") or node.get("name") or "").strip()
+
+
+def _exact_candidate(query_text: str, normalized_query: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "json_id_raw": query_text,
+        "json_id_norm": normalized_query,
+        "db_part_raw": row["db_part_raw"],
+        "db_part_norm": row["db_part_norm"],
+        "score_rapidfuzz": 100.0,
+        "score_jw": 100.0,
+        "score_combined": 100.0,
+        "sheet": row["sheet"],
+        "row_index": row["row_index"],
+    }
+
+
+def match_part_queries(
+    queries: Iterable[str],
+    excel_path: Path,
+    *,
+    topk: int = TOPK,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    질의 목록을 한 번에 매칭해 {질의: TopK 후보} 반환
+    - 정규화 결과가 DB에 정확히 1건 있으면 그 행 하나(점수 100)
+    - 나머지는 질의×DB 점수 행렬(RapidFuzz cdist, 전 코어)로 한 번에 계산
+    """
+    db_rows, db_choices = load_db_rows(excel_path)
+    choice_table = load_choice_table(excel_path)
+
+    result: Dict[str, List[Dict[str, Any]]] = {}
+    fuzzy_queries: List[str] = []
+    for query in dict.fromkeys(str(q or "").strip() for q in queries):
+        if not query:
+            continue
+        normalized_query = normalize_text(query)
+        exact_rows = choice_table.rows_of_text(normalized_query) if normalized_query else ()
+        if len(exact_rows) == 1:
+            result[query] = [_exact_candidate(query, normalized_query, db_rows[int(exact_rows[0])])]
+        else:
+            fuzzy_queries.append(query)
+
+    if not fuzzy_queries or not db_choices:
+        return result
+
+    # 영구 캐시(정규화 질의 + DB 해시 + 점수 규칙 버전)에 없는 질의만 점수 행렬 계산
+    cache = get_match_cache()
+    cache_key = {
+        "db_hash": get_work_time_db_snapshot(excel_path).content_hash,
+        "scoring_version": MATCH_SCORING_VERSION,
+        "topk": topk,
+    }
+    norm_by_query = {query: normalize_text(query) for query in fuzzy_queries}
+    cached = cache.get_many("part_topk", norm_by_query.values(), **cache_key)
+
+    missing = [query for query in fuzzy_queries if norm_by_query[query] not in cached]
+    computed: Dict[str, List[Dict[str, Any]]] = {}
+    for query, candidates in zip(missing, match_many_topk(missing, db_rows, db_choices, topk=topk, choice_table=choice_table)):
+        result[query] = candidates
+        computed[norm_by_query[query]] = candidates
+    cache.put_many("part_topk", {norm: items for norm, items in computed.items() if norm}, **cache_key)
+
+    for query in fuzzy_queries:
+        if query not in result:
+            result[query] = [{**item, "json_id_raw": query} for item in cached[norm_by_query[query]]]
+    return result
+
+
+def match_part_best(query_raw: str, excel_path: Path) -> Optional[Dict[str, Any]]:
+    """match_one_best(gram 역색인 사용) + 영구 매칭 캐시."""
+    normalized_query = normalize_text(query_raw)
+    if not normalized_query:
+        return None
+
+    cache = get_match_cache()
+    cache_key = {
+        "db_hash": get_work_time_db_snapshot(excel_path).content_hash,
+        "scoring_version": MATCH_SCORING_VERSION,
+        "topk": TOPK,
+    }
+    cached = cache.get_many("part_best", [normalized_query], **cache_key)
+    if normalized_query in cached:
+        best = cached[normalized_query]
+        return {**best, "json_id_raw": query_raw} if best else None
+
+    db_rows, db_choices = load_db_rows(excel_path)
+    best = match_one_best(
+        query_raw,
+        db_rows,
+        db_choices,
+        gram_index=load_match_gram_index(excel_path),
+        choice_table=load_choice_table(excel_path),
+    )
+    cache.put_many("part_best", {normalized_query: best}, **cache_key)
+    return best
+
+
+def match_tree_nodes(
+    nodes: List[Dict[str, Any]],
+    excel_path: Path,
+    *,
+    include_all_parts: bool = True,
+    topk: int = TOPK,
+    known_matches: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    트리의 PART 노드 전체를 배치 매칭
+    - known_matches: 사전 매칭 등 이미 계산된 {질의: 후보}는 재계산하지 않음
+    """
+    part_nodes = [
+        node
+        for node in nodes
+        if node.get("type") == "PART" and (include_all_parts or node.get("inhouse") is True)
+    ]
+    known = known_matches or {}
+    pending = [q for q in (part_node_query(node) for node in part_nodes) if q and q not in known]
+    matches = {**known, **match_part_queries(pending, excel_path, topk=topk)} if pending else known
+
+    return [
+        {
+            "partId": node.get("id"),
+            "nodeName": str(node.get("name") or "").strip(),
+            "inhouse": node.get("inhouse") is True,
+            "query": part_node_query(node),
+            "candidates": matches.get(part_node_query(node), [])[:topk],
+        }
+        for node in part_nodes
+    ]
+
+
+# =========================
+# BOM run 단위 (사전 매칭)
+# =========================
+def iter_spec_trees(root: Path) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """BOM run의 사양별 트리. 저장된 `<spec>.json`이 있으면 원본 캐시보다 우선한다."""
+    cache_path = root / TREE_SPECS_CACHE_FILENAME
+    try:
+        cached_trees = json.loads(cache_path.read_text(encoding="utf-8")) if cache_path.exists() else {}
+    except Exception:
+        cached_trees = {}
+
+    for spec, raw_tree in cached_trees.items():
+        spec_path = root / f"{spec}.json"
+        tree = raw_tree
+        if spec_path.exists():
+            try:
+                tree = json.loads(spec_path.read_text(encoding="utf-8"))
+            except Exception:
+                tree = raw_tree
+        yield spec, tree or {}
+
+
+def _prematch_header(excel_path: Path, topk: int) -> Dict[str, Any]:
+    return {
+        "dbHash": get_work_time_db_snapshot(excel_path).content_hash,
+        "scoringVersion": MATCH_SCORING_VERSION,
+        "topk": topk,
+    }
+
+
+def prematch_bom_run(root: Path, excel_path: Path, *, topk: int = TOPK) -> Dict[str, Any]:
+    """
+    BOM 업로드 직후 모든 사양의 PART 노드를 한 번에 매칭해 part_matches.json으로 저장
+    (시퀀스 화면을 처음 열 때 전체 DB 스캔을 하지 않도록)
+    """
+    started = time.perf_counter()
+    queries = [
+        part_node_query(node)
+        for _, tree in iter_spec_trees(root)
+        for node in tree.get("nodes", [])
+        if node.get("type") == "PART"
+    ]
+    matches = match_part_queries(queries, excel_path, topk=topk)
+
+    payload = {
+        **_prematch_header(excel_path, topk),
+        "createdAt": time.time(),
+        "queryCount": len(matches),
+        "seconds": round(time.perf_counter() - started, 3),
+        "matches": matches,
+    }
+    target = root / PREMATCH_FILENAME
+    temp_path = target.with_suffix(f"{target.suffix}.{os.getpid()}.tmp")
+    temp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.replace(temp_path, target)
+    return payload
+
+
+# 백그라운드 사전 매칭이 도는 BOM run 폴더 (같은 run은 한 번에 하나)
+_PREMATCH_RUNNING: set = set()
+_PREMATCH_LOCK = threading.Lock()
+
+
+def schedule_prematch_bom_run(root: Path, excel_path: Path, *, topk: int = TOPK) -> bool:
+    """
+    prematch_bom_run을 백그라운드 스레드로 실행 (BOM 업로드/요청 지연에 포함되지 않게)
+    - 같은 BOM run이 이미 돌고 있으면 False
+    - 사전 매칭은 속도용 캐시일 뿐이라 실패는 로그만 남긴다
+    """
+    key = str(Path(root).resolve())
+    with _PREMATCH_LOCK:
+        if key in _PREMATCH_RUNNING:
+            return False
+        _PREMATCH_RUNNING.add(key)
+
+    def run() -> None:
+        try:
+            payload = prematch_bom_run(root, excel_path, topk=topk)
+            logger.info(
+                "Pre-matched %d part queries for %s in %.3fs",
+                payload["queryCount"],
+                root,
+                payload["seconds"],
+            )
+        except Exception as exc:
+            logger.warning("Part pre-match failed for %s: %s", root, exc)
+        finally:
+            with _PREMATCH_LOCK:
+                _PREMATCH_RUNNING.discard(key)
+
+    threading.Thread(target=run, name=f"prematch-{Path(root).name}", daemon=True).start()
+    return True
+
+
+def load_prematched_matches(root: Path, excel_path: Path, *, topk: int = TOPK) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    DB 내용/점수 규칙이 그대로일 때만 사전 매칭 결과를 돌려준다.
+    - 파일이 없거나 낡았으면 {} (호출 측이 필요한 질의만 매칭)를 돌려주고 기본 topk 사전 매칭을 백그라운드로 예약
+    """
+    path = root / PREMATCH_FILENAME
+    header = _prematch_header(excel_path, topk)
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+    except Exception as exc:
+        logger.warning("Failed to read %s: %s", path, exc)
+        payload = None
+
+    if payload is None or any(payload.get(key) != value for key, value in header.items()):
+        # 트리가 아직 없으면(임포트 중) 빈 결과를 저장하지 않도록 예약하지 않는다
+        if topk == TOPK and (root / TREE_SPECS_CACHE_FILENAME).exists():
+            schedule_prematch_bom_run(root, excel_path)
+        return {}
+    return payload.get("matches") or {}
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+
+from backend.Assembly.excel_db import EXCEL_PATH
+from backend.Sub.bom_service import BOM_RUNS_DIR
+from backend.Sub.utills import read_bom_meta
+
+# =========================
+# 작업시간분석표 DB 버전 레지스트리
+# =========================
+# - "default": 기존 backend/작업시간분석표DB.xlsx
+# - 그 외: WORK_TIME_DB_VERSIONS_DIR 아래 `<버전명>.xlsx` (공장/연식별 DB)
+# 요청마다 헤더/쿼리 또는 BOM run의 bom_meta.json(`workTimeDb`)으로 버전을 고른다.
+DEFAULT_DB_VERSION = "default"
+DB_VERSIONS_DIR = Path(
+    os.getenv("WORK_TIME_DB_VERSIONS_DIR", str(Path(__file__).resolve().parents[1] / "data" / "work_time_dbs"))
+)
+DB_VERSION_HEADER = "x-work-time-db"
+DB_VERSION_QUERY = "dbVersion"
+BOM_META_DB_VERSION_KEY = "workTimeDb"
+
+_CURRENT_DB_VERSION: ContextVar[str] = ContextVar("work_time_db_version", default=DEFAULT_DB_VERSION)
+# 헤더/쿼리/경로(또는 use_db_version)로 버전을 이미 골랐는지 (본문 bomId보다 우선)
+_DB_VERSION_SELECTED: ContextVar[bool] = ContextVar("work_time_db_version_selected", default=False)
+
+
+class UnknownDbVersionError(LookupError):
+    pass
+
+
+def list_db_versions() -> Dict[str, Path]:
+    versions = {DEFAULT_DB_VERSION: EXCEL_PATH}
+    if DB_VERSIONS_DIR.is_dir():
+        for path in sorted(DB_VERSIONS_DIR.glob("*.xlsx")):
+            if path.name.startswith("~$"):
+                continue
+            versions.setdefault(path.stem, path)
+    return versions
+
+
+def resolve_db_path(version: Optional[str] = None) -> Path:
+    name = str(version or "").strip() or DEFAULT_DB_VERSION
+    if name == DEFAULT_DB_VERSION:
+        return EXCEL_PATH
+
+    path = DB_VERSIONS_DIR / f"{name}.xlsx"
+    # 버전명은 파일명 그대로만 허용 (경로 탈출 방지)
+    if Path(name).name != name or not path.is_file():
+        raise UnknownDbVersionError(f"알 수 없는 작업시간분석표 DB 버전: {name}")
+    return path
+
+
+def current_db_version() -> str:
+    return _CURRENT_DB_VERSION.get()
+
+
+def current_db_path() -> Path:
+    return resolve_db_path(current_db_version())
+
+
+@contextmanager
+def use_db_version(version: Optional[str]) -> Iterator[Path]:
+    """백그라운드 작업 등 요청 밖에서 특정 DB 버전으로 실행할 때 사용."""
+    path = resolve_db_path(version)
+    token = _CURRENT_DB_VERSION.set(str(version or "").strip() or DEFAULT_DB_VERSION)
+    selected_token = _DB_VERSION_SELECTED.set(True)
+    try:
+        yield path
+    finally:
+        _DB_VERSION_SELECTED.reset(selected_token)
+        _CURRENT_DB_VERSION.reset(token)
+
+
+@contextmanager
+def use_bom_db_version(bom_id: Optional[str]) -> Iterator[Path]:
+    """
+    요청 본문의 bomId로 DB 버전을 고른다 (미들웨어는 본문을 읽지 않으므로 채팅 등 POST 본문용)
+    - 헤더/쿼리/경로로 이미 골랐거나 BOM에 지정 버전이 없으면 현재 버전 그대로
+    """
+    version = None if _DB_VERSION_SELECTED.get() else db_version_for_bom(bom_id)
+    if version is None:
+        yield current_db_path()
+        return
+    with use_db_version(version) as path:
+        yield path
+
+
+@lru_cache(maxsize=256)
+def _cached_bom_db_version(bom_id: str, meta_mtime: float) -> Optional[str]:
+    value = read_bom_meta(BOM_RUNS_DIR / bom_id).get(BOM_META_DB_VERSION_KEY)
+    return (str(value).strip() or None) if value else None
+
+
+def db_version_for_bom(bom_id: Optional[str]) -> Optional[str]:
+    bom_id = str(bom_id or "").strip()
+    if not bom_id or Path(bom_id).name != bom_id:
+        return None
+    try:
+        meta_mtime = (BOM_RUNS_DIR / bom_id / "bom_meta.json").stat().st_mtime
+    except OSError:
+        return None
+    return _cached_bom_db_version(bom_id, meta_mtime)
+
+
+def _bom_id_from_path(path: str) -> Optional[str]:
+    segments = [segment for segment in path.split("/") if segment]
+    for index, segment in enumerate(segments[:-1]):
+        if segment == "bom":
+            return segments[index + 1]
+    return None
+
+
+def requested_db_version(headers: Dict[str, str], query: Dict[str, list], path: str) -> Optional[str]:
+    explicit = headers.get(DB_VERSION_HEADER) or (query.get(DB_VERSION_QUERY) or [None])[0]
+    if explicit:
+        return explicit.strip() or None
+
+    bom_id = (query.get("bomId") or query.get("bom_id") or [None])[0] or _bom_id_from_path(path)
+    return db_version_for_bom(bom_id)
+
+
+class WorkTimeDbVersionMiddleware:
+    """요청이 고른 DB 버전을 ContextVar로 흘려보내는 ASGI 미들웨어."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {
+            key.decode("latin-1").lower(): value.decode("utf-8", "replace")
+            for key, value in scope.get("headers") or []
+        }
+        query = parse_qs((scope.get("query_string") or b"").decode("utf-8", "replace"))
+        version = requested_db_version(headers, query, scope.get("path") or "")
+        if version is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            resolve_db_path(version)
+        except UnknownDbVersionError as exc:
+            response = JSONResponse({"detail": str(exc)}, status_code=404)
+            await response(scope, receive, send)
+            return
+
+        token = _CURRENT_DB_VERSION.set(version)
+        selected_token = _DB_VERSION_SELECTED.set(True)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _DB_VERSION_SELECTED.reset(selected_token)
+            _CURRENT_DB_VERSION.reset(token)
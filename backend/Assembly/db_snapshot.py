@@ -0,0 +1,632 @@
+from __future__ import annotations
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+
+from backend.Assembly.excel_db import EXCEL_PATH
+
+logger = logging.getLogger(__name__)
+
+# 작업시간분석표DB.xlsx 레이아웃: 1행 제목, 2행 헤더, 3행부터 데이터
+HEADER_ROW = 2
+FIRST_DATA_ROW = HEADER_ROW + 1
+
+# 파싱 결과를 xlsx SHA-256 기준으로 저장해 두는 디스크 캐시
+COMPILED_DB_DIR = Path(__file__).resolve().parents[1] / "data" / "db_cache"
+COMPILED_DB_FORMAT_VERSION = 2
+
+# 여러 DB 버전을 동시에 올릴 때 프로세스가 유지할 파싱 테이블 메모리 상한 (LRU 축출)
+SNAPSHOT_MEMORY_BUDGET_BYTES = int(float(os.getenv("WORK_TIME_DB_MEMORY_BUDGET_MB", "512")) * 1024 * 1024)
+
+
+# =========================
+# 시트 테이블
+# =========================
+@dataclass
+class SheetTable:
+    name: str
+    header: Tuple[Any, ...]
+    rows: List[Tuple[Any, ...]]
+    first_row: int = FIRST_DATA_ROW
+
+    def excel_row(self, row_index: int) -> int:
+        return self.first_row + row_index
+
+
+def _read_header_map(header: Tuple[Any, ...]) -> Dict[str, int]:
+    # 같은 헤더가 여러 번 나오면 마지막 컬럼이 이김 (기존 ws.cell 기반 로직과 동일)
+    headers: Dict[str, int] = {}
+    for index, value in enumerate(header):
+        if value is not None and str(value).strip():
+            headers[str(value).strip()] = index
+    return headers
+
+
+def resolve_sequence_columns(header: Tuple[Any, ...]) -> Dict[str, Optional[int]]:
+    columns: Dict[str, Optional[int]] = {
+        "part": None,
+        "process": None,
+        "option": None,
+        "worker": None,
+        "category": None,
+        "action": None,
+    }
+
+    for key, column in _read_header_map(header).items():
+        normalized = key.replace(" ", "")
+        upper_key = key.upper()
+
+        if columns["part"] is None and "부품" in normalized:
+            columns["part"] = column
+        if columns["process"] is None and ("요소작업" in normalized or "공정" in normalized):
+            columns["process"] = column
+        if columns["option"] is None and "OPTION" in upper_key:
+            columns["option"] = column
+        if columns["worker"] is None and "작업자" in normalized:
+            columns["worker"] = column
+        if columns["category"] is None and normalized == "no":
+            columns["category"] = column
+        if columns["action"] is None and "동작요소" in normalized:
+            columns["action"] = column
+
+    return columns
+
+
+def _clean_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def iter_sequence_rows(table: SheetTable) -> Iterator[Dict[str, Any]]:
+    columns = resolve_sequence_columns(table.header)
+    part_col = columns["part"]
+    process_col = columns["process"]
+    option_col = columns["option"]
+
+    if part_col is None:
+        return
+
+    current_part = ""
+    current_process = ""
+    current_option = ""
+
+    for row_index, row in enumerate(table.rows):
+        raw_part = _clean_cell(row[part_col])
+        raw_process = _clean_cell(row[process_col]) if process_col is not None else ""
+        raw_option = _clean_cell(row[option_col]) if option_col is not None else ""
+
+        if raw_part:
+            current_part = raw_part
+        if raw_process:
+            current_process = raw_process
+        if raw_option:
+            current_option = raw_option
+
+        if not current_part and not current_process and not current_option:
+            continue
+
+        yield {
+            "row": table.excel_row(row_index),
+            "partBase": current_part,
+            "processLabel": current_process,
+            "option": current_option,
+        }
+
+
+def iter_action_rows(table: SheetTable) -> Iterator[Dict[str, Any]]:
+    columns = resolve_sequence_columns(table.header)
+    if columns["part"] is None:
+        return
+
+    def read(row: Tuple[Any, ...], key: str) -> str:
+        column = columns[key]
+        return _clean_cell(row[column]) if column is not None else ""
+
+    current_part = ""
+    current_process = ""
+    current_option = ""
+
+    for row_index, row in enumerate(table.rows):
+        raw_part = read(row, "part")
+        raw_process = read(row, "process")
+        raw_option = read(row, "option")
+
+        if raw_part:
+            current_part = raw_part
+        if raw_process:
+            current_process = raw_process
+        if raw_option:
+            current_option = raw_option
+
+        action_value = read(row, "action")
+        if not current_part and not current_process and not current_option and not action_value:
+            continue
+
+        yield {
+            "row": table.excel_row(row_index),
+            "partBase": current_part,
+            "processLabel": current_process,
+            "option": current_option,
+            "worker": read(row, "worker"),
+            "category": read(row, "category"),
+            "actionElement": action_value,
+        }
+
+
+# =========================
+# 스냅샷
+# =========================
+@dataclass
+class WorkTimeDbSnapshot:
+    """작업시간분석표DB.xlsx 한 버전을 한 번만 파싱해 둔 읽기 전용 스냅샷.
+
+    모든 소비자(Assembly 캐시, auto-match, Sequence 옵션/공정, 임베딩, RAG 빌더)는
+    같은 스냅샷의 시트 테이블에서 자기 뷰를 `derive()`로 만들어 재사용한다.
+    """
+
+    path: Path
+    content_hash: str
+    mtime: float
+    size: int
+    sheet_names: List[str]
+    tables: Dict[str, SheetTable]
+    loaded_at: float = field(default_factory=time.time)
+    memory_bytes: int = 0
+    last_used: float = field(default_factory=time.monotonic, repr=False)
+    _derived: Dict[str, Any] = field(default_factory=dict, repr=False)
+    _derived_lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+
+    @property
+    def version(self) -> str:
+        return self.content_hash[:12]
+
+    def derive(self, key: str, factory: Callable[[], Any]) -> Any:
+        if key in self._derived:
+            return self._derived[key]
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = factory()
+            return self._derived[key]
+
+    @property
+    def sequence_rows(self) -> Dict[str, List[Dict[str, Any]]]:
+        return self.derive(
+            "snapshot.sequence_rows",
+            lambda: {name: list(iter_sequence_rows(self.tables[name])) for name in self.sheet_names},
+        )
+
+    @property
+    def action_rows(self) -> Dict[str, List[Dict[str, Any]]]:
+        return self.derive(
+            "snapshot.action_rows",
+            lambda: {name: list(iter_action_rows(self.tables[name])) for name in self.sheet_names},
+        )
+
+    @property
+    def part_bases(self) -> Dict[str, List[str]]:
+        def build() -> Dict[str, List[str]]:
+            return {
+                name: list(dict.fromkeys(item["partBase"] for item in rows if item["partBase"]))
+                for name, rows in self.sequence_rows.items()
+            }
+
+        return self.derive("snapshot.part_bases", build)
+
+    @property
+    def options(self) -> Dict[str, Dict[str, List[str]]]:
+        def build() -> Dict[str, Dict[str, List[str]]]:
+            options_by_sheet: Dict[str, Dict[str, List[str]]] = {}
+            for name, rows in self.sequence_rows.items():
+                by_part: Dict[str, List[str]] = {}
+                for item in rows:
+                    if not item["partBase"] or not item["option"]:
+                        continue
+                    by_part.setdefault(item["partBase"], [])
+                    if item["option"] not in by_part[item["partBase"]]:
+                        by_part[item["partBase"]].append(item["option"])
+                options_by_sheet[name] = by_part
+            return options_by_sheet
+
+        return self.derive("snapshot.options", build)
+
+    @property
+    def processes(self) -> List[Tuple[str, str, str]]:
+        """(sheet, partBase, processLabel) 조합을 시트/행 순서대로 중복 없이."""
+
+        def build() -> List[Tuple[str, str, str]]:
+            seen = set()
+            out: List[Tuple[str, str, str]] = []
+            for name in self.sheet_names:
+                for item in self.sequence_rows.get(name, []):
+                    if not item["partBase"] or not item["processLabel"]:
+                        continue
+                    key = (name, item["partBase"], item["processLabel"])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    out.append(key)
+            return out
+
+        return self.derive("snapshot.processes", build)
+
+
+def compute_file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _pad_rows(rows: List[Tuple[Any, ...]], width: int) -> List[Tuple[Any, ...]]:
+    return [row if len(row) >= width else row + (None,) * (width - len(row)) for row in rows]
+
+
+def parse_work_time_db(path: Path, *, content_hash: Optional[str] = None) -> WorkTimeDbSnapshot:
+    stat = path.stat()
+    digest = content_hash or compute_file_hash(path)
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet_names: List[str] = []
+        tables: Dict[str, SheetTable] = {}
+        for worksheet in workbook.worksheets:
+            header: Tuple[Any, ...] = ()
+            data_rows: List[Tuple[Any, ...]] = []
+            for row_number, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+                if row_number == HEADER_ROW:
+                    header = tuple(row)
+                elif row_number >= FIRST_DATA_ROW:
+                    data_rows.append(tuple(row))
+
+            width = max([len(header), *(len(row) for row in data_rows)])
+            sheet_names.append(worksheet.title)
+            tables[worksheet.title] = SheetTable(
+                name=worksheet.title,
+                header=header + (None,) * (width - len(header)),
+                rows=_pad_rows(data_rows, width),
+            )
+    finally:
+        workbook.close()
+
+    return WorkTimeDbSnapshot(
+        path=path,
+        content_hash=digest,
+        mtime=stat.st_mtime,
+        size=stat.st_size,
+        sheet_names=sheet_names,
+        tables=tables,
+    )
+
+
+# =========================
+# 컴파일 캐시 (디스크)
+# =========================
+# 셀 값은 JSON 기본형만 그대로 두고, 날짜/시간 값은 {"$": 타입, "v": ISO 문자열}로 적는다
+# (pickle처럼 읽을 때 코드를 실행하지 않으므로 공용 data 폴더에 둬도 안전)
+_CELL_TYPES = {
+    "datetime": datetime.datetime,
+    "date": datetime.date,
+    "time": datetime.time,
+}
+
+
+def _encode_cell(value: Any) -> Any:
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, datetime.timedelta):
+        return {"$": "timedelta", "v": value.total_seconds()}
+    for name, cell_type in _CELL_TYPES.items():
+        if type(value) is cell_type:
+            return {"$": name, "v": value.isoformat()}
+    return str(value)
+
+
+def _decode_cell(value: Any) -> Any:
+    if not isinstance(value, dict):
+        return value
+    kind = value.get("$")
+    if kind == "timedelta":
+        return datetime.timedelta(seconds=value["v"])
+    return _CELL_TYPES[kind].fromisoformat(value["v"])
+
+
+def _compiled_db_prefix(source_path: Path) -> str:
+    # 같은 파일명(stem)의 다른 원본(DB 버전 폴더 등)과 캐시가 섞이지 않게 원본 경로 해시를 붙인다
+    path_key = hashlib.sha1(str(source_path.resolve()).encode("utf-8")).hexdigest()[:12]
+    return f"{source_path.stem}-{path_key}"
+
+
+def compiled_db_path(source_path: Path, content_hash: str) -> Path:
+    return COMPILED_DB_DIR / f"{_compiled_db_prefix(source_path)}-{content_hash}.json"
+
+
+def save_compiled_snapshot(snapshot: WorkTimeDbSnapshot) -> Path:
+    target = compiled_db_path(snapshot.path, snapshot.content_hash)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # 시트마다 컬럼 단위 배열로 저장 (행 튜플은 읽을 때 zip으로 복원)
+    payload = {
+        "formatVersion": COMPILED_DB_FORMAT_VERSION,
+        "contentHash": snapshot.content_hash,
+        "sheets": [
+            {
+                "name": name,
+                "header": [_encode_cell(value) for value in snapshot.tables[name].header],
+                "rowCount": len(snapshot.tables[name].rows),
+                "columns": [
+                    [_encode_cell(value) for value in column]
+                    for column in zip(*snapshot.tables[name].rows)
+                ],
+            }
+            for name in snapshot.sheet_names
+        ],
+    }
+
+    temp_path = target.with_suffix(f"{target.suffix}.{os.getpid()}.tmp")
+    with temp_path.open("w", encoding="utf-8") as fp:
+        json.dump(payload, fp, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, target)
+    return target
+
+
+def _decode_sheet(sheet: Dict[str, Any]) -> SheetTable:
+    header = tuple(_decode_cell(value) for value in sheet["header"])
+    columns = [[_decode_cell(value) for value in column] for column in sheet["columns"]]
+    row_count = int(sheet["rowCount"])
+    if any(len(column) != row_count for column in columns) or (row_count and len(columns) != len(header)):
+        raise ValueError(f"column lengths do not match rowCount in sheet {sheet['name']!r}")
+    rows = list(zip(*columns)) if columns else [()] * row_count
+    return SheetTable(name=sheet["name"], header=header, rows=rows)
+
+
+def load_compiled_snapshot(source_path: Path, content_hash: str) -> Optional[WorkTimeDbSnapshot]:
+    target = compiled_db_path(source_path, content_hash)
+    if not target.exists():
+        return None
+
+    try:
+        with target.open("r", encoding="utf-8") as fp:
+            payload = json.load(fp)
+        if (
+            payload.get("formatVersion") != COMPILED_DB_FORMAT_VERSION
+            or payload.get("contentHash") != content_hash
+        ):
+            return None
+        tables = {sheet["name"]: _decode_sheet(sheet) for sheet in payload["sheets"]}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+        logger.warning("Failed to read compiled work-time DB %s: %s", target, exc)
+        return None
+
+    stat = source_path.stat()
+    return WorkTimeDbSnapshot(
+        path=source_path,
+        content_hash=content_hash,
+        mtime=stat.st_mtime,
+        size=stat.st_size,
+        sheet_names=list(tables),
+        tables=tables,
+    )
+
+
+def prune_compiled_snapshots(source_path: Path, keep_hash: str) -> List[Path]:
+    """이 원본의 이전 리비전 캐시만 지운다 (같은 stem의 다른 원본 캐시는 그대로)."""
+    removed: List[Path] = []
+    keep = compiled_db_path(source_path, keep_hash)
+    for candidate in COMPILED_DB_DIR.glob(f"{_compiled_db_prefix(source_path)}-*.json"):
+        if candidate == keep:
+            continue
+        try:
+            candidate.unlink()
+            removed.append(candidate)
+        except OSError:
+            continue
+    return removed
+
+
+def load_work_time_db(path: Path, *, content_hash: Optional[str] = None) -> WorkTimeDbSnapshot:
+    """컴파일 캐시가 있으면 그것을, 없으면 openpyxl로 파싱한 뒤 캐시를 남긴다."""
+    digest = content_hash or compute_file_hash(path)
+
+    snapshot = load_compiled_snapshot(path, digest)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = parse_work_time_db(path, content_hash=digest)
+    try:
+        save_compiled_snapshot(snapshot)
+    except OSError as exc:
+        logger.warning("Failed to write compiled work-time DB for %s: %s", path, exc)
+    return snapshot
+
+
+# =========================
+# 프로세스 공용 캐시
+# =========================
+_SNAPSHOTS: Dict[str, WorkTimeDbSnapshot] = {}
+_SNAPSHOT_LOCK = threading.Lock()
+
+
+def estimate_snapshot_bytes(snapshot: WorkTimeDbSnapshot) -> int:
+    """시트 테이블(리스트/튜플/셀 값) 기준 대략적인 메모리 사용량. 파생 뷰는 포함하지 않는다."""
+    total = 0
+    for table in snapshot.tables.values():
+        total += sys.getsizeof(table.rows) + sys.getsizeof(table.header)
+        for row in table.rows:
+            total += sys.getsizeof(row)
+            for value in row:
+                if value is not None:
+                    total += sys.getsizeof(value)
+    return total
+
+
+def _evict_snapshots(keep_key: str) -> List[str]:
+    # _SNAPSHOT_LOCK 안에서 호출. 방금 쓴 버전은 예산을 넘더라도 남긴다.
+    evicted: List[str] = []
+    total = sum(item.memory_bytes for item in _SNAPSHOTS.values())
+    while total > SNAPSHOT_MEMORY_BUDGET_BYTES and len(_SNAPSHOTS) > 1:
+        victim_key = min(
+            (key for key in _SNAPSHOTS if key != keep_key),
+            key=lambda key: _SNAPSHOTS[key].last_used,
+        )
+        victim = _SNAPSHOTS.pop(victim_key)
+        total -= victim.memory_bytes
+        evicted.append(victim_key)
+        logger.info(
+            "Evicted work-time DB snapshot %s (%s, %.1f MB)",
+            victim_key,
+            victim.version,
+            victim.memory_bytes / (1024 * 1024),
+        )
+    return evicted
+
+
+def _is_fresh(snapshot: WorkTimeDbSnapshot, stat: Any) -> bool:
+    return snapshot.mtime == stat.st_mtime and snapshot.size == stat.st_size
+
+
+def get_work_time_db_snapshot(excel_path: Optional[Path] = None) -> WorkTimeDbSnapshot:
+    path = Path(excel_path or EXCEL_PATH).resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"작업시간분석표DB.xlsx 파일이 없습니다: {path}")
+
+    cache_key = str(path)
+    stat = path.stat()
+    cached = _SNAPSHOTS.get(cache_key)
+    if cached is not None and _is_fresh(cached, stat):
+        cached.last_used = time.monotonic()
+        return cached
+
+    with _SNAPSHOT_LOCK:
+        cached = _SNAPSHOTS.get(cache_key)
+        stat = path.stat()
+        if cached is not None and _is_fresh(cached, stat):
+            cached.last_used = time.monotonic()
+            return cached
+
+        # mtime만 바뀐 경우(복사/touch)는 내용 해시가 같으면 재파싱하지 않음
+        digest = compute_file_hash(path)
+        if cached is not None and cached.content_hash == digest:
+            cached.mtime = stat.st_mtime
+            cached.size = stat.st_size
+            cached.last_used = time.monotonic()
+            return cached
+
+        snapshot = load_work_time_db(path, content_hash=digest)
+        snapshot.memory_bytes = estimate_snapshot_bytes(snapshot)
+        _SNAPSHOTS[cache_key] = snapshot
+        _evict_snapshots(cache_key)
+        return snapshot
+
+
+def get_snapshot_cache_status() -> Dict[str, Any]:
+    with _SNAPSHOT_LOCK:
+        snapshots = list(_SNAPSHOTS.values())
+    snapshots.sort(key=lambda item: item.last_used, reverse=True)
+    return {
+        "budgetBytes": SNAPSHOT_MEMORY_BUDGET_BYTES,
+        "usedBytes": sum(item.memory_bytes for item in snapshots),
+        "snapshots": [
+            {
+                "path": str(item.path),
+                "version": item.version,
+                "memoryBytes": item.memory_bytes,
+                "loadedAt": item.loaded_at,
+            }
+            for item in snapshots
+        ],
+    }
+
+
+def compile_work_time_db(excel_path: Path, *, force: bool = False, keep_stale: bool = False) -> Dict[str, Any]:
+    started = time.perf_counter()
+    digest = compute_file_hash(excel_path)
+    target = compiled_db_path(excel_path, digest)
+
+    snapshot = None if force else load_compiled_snapshot(excel_path, digest)
+    status = "up_to_date"
+    if snapshot is None:
+        snapshot = parse_work_time_db(excel_path, content_hash=digest)
+        target = save_compiled_snapshot(snapshot)
+        status = "compiled"
+
+    removed = [] if keep_stale else prune_compiled_snapshots(excel_path, digest)
+    return {
+        "status": status,
+        "hash": digest,
+        "sheets": len(snapshot.sheet_names),
+        "rows": sum(len(table.rows) for table in snapshot.tables.values()),
+        "compiled_path": target,
+        "stale_removed": len(removed),
+        "elapsed_ms": f"{(time.perf_counter() - started) * 1000:.1f}",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="작업시간분석표DB.xlsx 컴파일 캐시를 미리 생성합니다.")
+    parser.add_argument("--excel-db", default=None, help="Workbook path (default: the default DB version).")
+    parser.add_argument(
+        "--version",
+        action="append",
+        default=[],
+        help="DB version name under WORK_TIME_DB_VERSIONS_DIR (repeatable).",
+    )
+    parser.add_argument(
+        "--all-versions",
+        action="store_true",
+        help="Compile the default workbook and every workbook under WORK_TIME_DB_VERSIONS_DIR.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-parse the workbook even if a compiled cache already exists.",
+    )
+    parser.add_argument(
+        "--keep-stale",
+        action="store_true",
+        help="Keep compiled caches of older workbook revisions.",
+    )
+    args = parser.parse_args()
+
+    # 레지스트리는 BOM 모듈까지 끌어오므로 CLI에서만 import
+    from backend.Assembly.db_registry import UnknownDbVersionError, list_db_versions, resolve_db_path
+
+    targets: Dict[str, Path] = {}
+    if args.all_versions:
+        targets.update(list_db_versions())
+    for version in args.version:
+        try:
+            targets[version] = resolve_db_path(version)
+        except UnknownDbVersionError as exc:
+            parser.error(str(exc))
+    if args.excel_db or not targets:
+        targets[args.excel_db or "default"] = Path(args.excel_db) if args.excel_db else EXCEL_PATH
+
+    for index, (name, excel_path) in enumerate(targets.items()):
+        if index:
+            print()
+        if len(targets) > 1:
+            print(f"version={name}")
+        if not excel_path.is_file():
+            print("status=missing")
+            print(f"excel_path={excel_path}")
+            continue
+        result = compile_work_time_db(excel_path.resolve(), force=args.force, keep_stale=args.keep_stale)
+        for key, value in result.items():
+            print(f"{key}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+# =========================
+# 설정
+# =========================
+# 질의/후보 중 짧은 쪽 gram의 이 비율 이상을 공유하는 후보만 점수 계산
+# (WRatio는 부분 일치에 높은 점수를 주므로 짧은 후보가 걸러지지 않게 짧은 쪽 기준)
+MIN_SHARED_RATIO = 0.3
+# 추린 후보가 이보다 적으면 전체 스캔으로 되돌아간다 (놓치는 후보 방지)
+MIN_CANDIDATES = 32
+
+
+def text_grams(text: str) -> Set[str]:
+    """토큰 + 문자 3-gram. 토큰은 3-gram과 겹치지 않게 접두어를 붙인다."""
+    text = str(text or "").strip()
+    if not text:
+        return set()
+
+    grams = {f"#{token}" for token in text.split()}
+    padded = f" {text} "
+    grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@dataclass
+class GramIndex:
+    """정규화된 선택지 목록 위의 토큰/3-gram 역색인.
+
+    같은 문자열은 한 번만 색인하고(unique id), 원래 목록 위치는 positions로 되찾는다.
+    """
+
+    size: int = 0
+    positions: List[np.ndarray] = field(default_factory=list)
+    gram_counts: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int32))
+    postings: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, choices: Sequence[str]) -> "GramIndex":
+        unique_ids: Dict[str, int] = {}
+        positions: List[List[int]] = []
+        gram_counts: List[int] = []
+        postings: Dict[str, List[int]] = {}
+
+        for position, text in enumerate(choices):
+            uid = unique_ids.get(text)
+            if uid is None:
+                uid = len(positions)
+                unique_ids[text] = uid
+                positions.append([])
+                grams = text_grams(text)
+                gram_counts.append(len(grams))
+                for gram in grams:
+                    postings.setdefault(gram, []).append(uid)
+            positions[uid].append(position)
+
+        return cls(
+            size=len(choices),
+            positions=[np.asarray(items, dtype=np.int32) for items in positions],
+            gram_counts=np.asarray(gram_counts, dtype=np.int32),
+            postings={gram: np.asarray(items, dtype=np.int32) for gram, items in postings.items()},
+        )
+
+    def candidates(
+        self,
+        query: str,
+        *,
+        min_shared_ratio: float = MIN_SHARED_RATIO,
+        min_candidates: int = MIN_CANDIDATES,
+    ) -> Optional[List[int]]:
+        """
+        질의와 gram을 충분히 공유하는 선택지 위치(오름차순)
+        - None: 추린 후보가 너무 적음 → 호출 측에서 전체 스캔
+        """
+        query_grams = text_grams(query)
+        hit_lists = [self.postings[gram] for gram in query_grams if gram in self.postings]
+        if not hit_lists:
+            return None
+
+        counts = np.bincount(np.concatenate(hit_lists), minlength=len(self.positions))
+        needed = np.ceil(np.minimum(self.gram_counts, len(query_grams)) * min_shared_ratio)
+        unique_hits = np.flatnonzero(counts >= np.maximum(needed, 1))
+        if unique_hits.size == 0:
+            return None
+
+        picked = np.sort(np.concatenate([self.positions[uid] for uid in unique_hits]))
+        if picked.size < min(min_candidates, self.size):
+            return None
+        return picked.tolist()
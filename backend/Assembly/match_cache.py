@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# 설정
+# =========================
+MATCH_CACHE_PATH = Path(
+    os.getenv(
+        "MATCH_CACHE_PATH",
+        str(Path(__file__).resolve().parents[1] / "data" / "match_cache.sqlite3"),
+    )
+)
+MATCH_CACHE_MAX_ENTRIES = int(os.getenv("MATCH_CACHE_MAX_ENTRIES", "50000"))
+# 매 put마다 정리하지 않고 이만큼 쓸 때마다 한 번 LRU 정리
+_TRIM_EVERY = 500
+# 캐시 폴더 생성 실패(OSError)도 sqlite 오류처럼 miss로 처리
+_CACHE_ERRORS = (sqlite3.Error, OSError)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS match_results (
+    kind TEXT NOT NULL,
+    query TEXT NOT NULL,
+    db_hash TEXT NOT NULL,
+    scoring_version INTEGER NOT NULL,
+    topk INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (kind, query, db_hash, scoring_version, topk)
+);
+CREATE INDEX IF NOT EXISTS idx_match_results_last_used ON match_results (last_used);
+"""
+
+
+class MatchCache:
+    """(정규화 질의, DB 내용 해시, 점수 규칙 버전) → 매칭 결과를 sqlite에 보관하는 영구 캐시.
+
+    DB 해시가 키에 들어가므로 작업시간분석표가 바뀌면 이전 결과는 자동으로 안 맞고,
+    오래 안 쓴 항목부터 max_entries를 넘는 만큼 지운다.
+    """
+
+    def __init__(self, path: Path = MATCH_CACHE_PATH, max_entries: int = MATCH_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+        self._writes_since_trim = 0
+        # 조회 적중의 last_used 갱신은 메모리에 모았다가 다음 쓰기(put/trim) 트랜잭션에서 한 번에 반영
+        # (kind, query, db_hash, scoring_version, topk) → 마지막 적중 시각
+        self._pending_touches: Dict[Tuple[str, str, str, int, int], float] = {}
+        # 캐시 폴더/파일을 못 쓰면 캐시 없이 동작 (매 요청 500 대신 miss)
+        self._unavailable: Optional[str] = None
+
+    # -----------------------------
+    # 연결
+    # -----------------------------
+    def _connect(self) -> sqlite3.Connection:
+        if self._unavailable is not None:
+            raise sqlite3.OperationalError(self._unavailable)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # 폴더/파일 열기, WAL 설정, 스키마 생성 중 하나라도 실패하면 캐시를 끈다
+            # (요청마다 다시 시도하며 경고를 반복하지 않게 첫 실패에서 고정)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.path), timeout=5.0)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.executescript(_SCHEMA)
+                except sqlite3.Error:
+                    conn.close()
+                    raise
+            except _CACHE_ERRORS as exc:
+                self._unavailable = f"match cache disabled: {exc}"
+                logger.warning("Match cache unavailable, caching disabled: %s", exc)
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _take_pending_touches(self) -> List[Tuple[float, str, str, str, int, int]]:
+        with self._stats_lock:
+            touches, self._pending_touches = self._pending_touches, {}
+        return [(used, *key) for key, used in touches.items()]
+
+    def _restore_pending_touches(self, touches: List[Tuple[float, str, str, str, int, int]]) -> None:
+        with self._stats_lock:
+            for used, *key in touches:
+                self._pending_touches.setdefault(tuple(key), used)
+
+    @staticmethod
+    def _apply_touches(conn: sqlite3.Connection, touches: List[Tuple[float, str, str, str, int, int]]) -> None:
+        if touches:
+            conn.executemany(
+                "UPDATE match_results SET last_used = ? "
+                "WHERE kind = ? AND query = ? AND db_hash = ? AND scoring_version = ? AND topk = ?",
+                touches,
+            )
+
+    # -----------------------------
+    # 조회 / 저장
+    # -----------------------------
+    def get_many(
+        self,
+        kind: str,
+        queries: Iterable[str],
+        *,
+        db_hash: str,
+        scoring_version: int,
+        topk: int,
+    ) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(q for q in queries if q))
+        if not keys:
+            return {}
+
+        found: Dict[str, Any] = {}
+        try:
+            conn = self._connect()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT query, payload FROM match_results "
+                    f"WHERE kind = ? AND db_hash = ? AND scoring_version = ? AND topk = ? "
+                    f"AND query IN ({placeholders})",
+                    (kind, db_hash, scoring_version, topk, *chunk),
+                ).fetchall()
+                for query, payload in rows:
+                    found[query] = json.loads(payload)
+        except _CACHE_ERRORS as exc:
+            # 이미 읽은 행은 그대로 돌려준다 (나머지만 miss)
+            self._count("errors")
+            if self._unavailable is None:
+                logger.warning("Match cache read failed: %s", exc)
+
+        # 읽기 경로에서는 쓰기 트랜잭션을 열지 않는다
+        now = time.time()
+        with self._stats_lock:
+            for query in found:
+                self._pending_touches[(kind, query, db_hash, scoring_version, topk)] = now
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(
+        self,
+        kind: str,
+        items: Dict[str, Any],
+        *,
+        db_hash: str,
+        scoring_version: int,
+        topk: int,
+    ) -> None:
+        if not items:
+            return
+
+        now = time.time()
+        touches = self._take_pending_touches()
+        try:
+            conn = self._connect()
+            with conn:
+                self._apply_touches(conn, touches)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO match_results "
+                    "(kind, query, db_hash, scoring_version, topk, payload, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (kind, query, db_hash, scoring_version, topk, json.dumps(value, ensure_ascii=False), now)
+                        for query, value in items.items()
+                        if query
+                    ],
+                )
+        except _CACHE_ERRORS as exc:
+            self._count("errors")
+            if self._unavailable is None:
+                self._restore_pending_touches(touches)
+                logger.warning("Match cache write failed: %s", exc)
+            return
+
+        self._count("writes", len(items))
+        with self._stats_lock:
+            self._writes_since_trim += len(items)
+            should_trim = self._writes_since_trim >= _TRIM_EVERY
+            if should_trim:
+                self._writes_since_trim = 0
+        if should_trim:
+            self.trim()
+
+    def trim(self) -> int:
+        touches = self._take_pending_touches()
+        try:
+            conn = self._connect()
+            with conn:
+                self._apply_touches(conn, touches)
+                total = conn.execute("SELECT COUNT(*) FROM match_results").fetchone()[0]
+                excess = total - self.max_entries
+                if excess <= 0:
+                    return 0
+                conn.execute(
+                    "DELETE FROM match_results WHERE rowid IN "
+                    "(SELECT rowid FROM match_results ORDER BY last_used ASC LIMIT ?)",
+                    (excess,),
+                )
+        except _CACHE_ERRORS as exc:
+            self._count("errors")
+            if self._unavailable is None:
+                self._restore_pending_touches(touches)
+                logger.warning("Match cache trim failed: %s", exc)
+            return 0
+
+        self._count("evictions", excess)
+        return excess
+
+    def clear(self) -> None:
+        self._take_pending_touches()
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM match_results")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        try:
+            entries = self._connect().execute("SELECT COUNT(*) FROM match_results").fetchone()[0]
+        except _CACHE_ERRORS:
+            entries = None
+        with self._stats_lock:
+            pending_touches = len(self._pending_touches)
+        return {
+            **stats,
+            "hitRate": round(stats["hits"] / lookups, 4) if lookups else None,
+            "entries": entries,
+            "maxEntries": self.max_entries,
+            "pendingTouches": pending_touches,
+            "available": self._unavailable is None,
+            "path": str(self.path),
+        }
+
+
+_MATCH_CACHE: Optional[MatchCache] = None
+_MATCH_CACHE_LOCK = threading.Lock()
+
+
+def get_match_cache() -> MatchCache:
+    global _MATCH_CACHE
+
+    if _MATCH_CACHE is None:
+        with _MATCH_CACHE_LOCK:
+            if _MATCH_CACHE is None:
+                _MATCH_CACHE = MatchCache()
+    return _MATCH_CACHE
@@ -1,8 +1,23 @@
 from fastapi import APIRouter, HTTPException, Request, Response
-from backend.Assembly.excel_db import load_workbook_readonly
+from backend.Assembly.excel_db import EXCEL_PATH
+from backend.Assembly.db_snapshot import get_snapshot_cache_status, get_work_time_db_snapshot
+from backend.Assembly.match_cache import get_match_cache
+from backend.warmup import request_rewarm
+from backend.text_normalization import normalizer_stats
+from backend.Assembly.db_registry import (
+    BOM_META_DB_VERSION_KEY,
+    DEFAULT_DB_VERSION,
+    UnknownDbVersionError,
+    current_db_path,
+    current_db_version,
+    list_db_versions,
+    resolve_db_path,
+)
 from backend.Assembly.constants import REQUIRED_COLUMNS
 
 from backend.Sub.session_store import get_or_create_sid, refresh_session_state, save_session_state, SESSION_STATE
+from backend.Sub.bom_service import BOM_RUNS_DIR, write_bom_meta
+from backend.Sub.utills import read_bom_meta
 
 from typing import List, Dict, Any, Optional
 from pathlib import Path
@@ -17,14 +32,26 @@ DATA_DIR = Path("backend/data")
 # -----------------------------
 # 캐시 구조
 # -----------------------------
+# 캐시는 통째로 교체(atomic swap)만 한다. 요청은 ensure_assembly_cache()가 돌려준
+# dict 한 개만 읽으므로 재빌드 중에도 이전 버전을 끝까지 일관되게 본다.
 ASSEMBLY_CACHE = {
     "ready": False,
+    "version": None,
+    "signature": None,
+    "builtAt": None,
     "sheets": [],
     "parts": {},
     "options": {},
     "tasks": {},
 }
 _CACHE_LOCK = threading.Lock()
+_RELOAD_STATE = {
+    "running": False,
+    "lastStartedAt": None,
+    "lastFinishedAt": None,
+    "lastError": None,
+}
+_RELOAD_STATE_LOCK = threading.Lock()
 
 
 # -----------------------------
@@ -49,18 +76,18 @@ def find_col(headers, target):
 # -----------------------------
 EXCLUDE_SHEETS = {"대형랩프 DB"}
 
-def build_assembly_cache():
-    wb = load_workbook_readonly()
+def build_assembly_cache(snapshot=None):
+    snapshot = snapshot or get_work_time_db_snapshot(EXCEL_PATH)
 
-    sheets = [s for s in wb.sheetnames if s not in EXCLUDE_SHEETS]
+    sheets = [s for s in snapshot.sheet_names if s not in EXCLUDE_SHEETS]
 
     parts_map = {}
     options_map = {}
     tasks_map = {}
 
     for sheet in sheets:
-        ws = wb[sheet]
-        headers = [cell.value for cell in ws[2]]
+        table = snapshot.tables[sheet]
+        headers = list(table.header)
 
         col_idx = {}
         for col in REQUIRED_COLUMNS:
@@ -78,7 +105,7 @@ def build_assembly_cache():
         current_task = None
         current_option = None
 
-        for row in ws.iter_rows(min_row=3, values_only=True):
+        for row in table.rows:
             if row[i_part] is not None:
                 current_part = row[i_part]
                 current_task = None
@@ -127,21 +154,98 @@ def build_assembly_cache():
 
         tasks_map[sheet] = tasks_by_part_option
 
-    ASSEMBLY_CACHE["sheets"] = sheets
-    ASSEMBLY_CACHE["parts"] = parts_map
-    ASSEMBLY_CACHE["options"] = options_map
-    ASSEMBLY_CACHE["tasks"] = tasks_map
-    ASSEMBLY_CACHE["ready"] = True
+    return {
+        "ready": True,
+        "version": snapshot.content_hash,
+        "signature": (snapshot.mtime, snapshot.size),
+        "builtAt": time.time(),
+        "sheets": sheets,
+        "parts": parts_map,
+        "options": options_map,
+        "tasks": tasks_map,
+    }
 
 
-def ensure_assembly_cache():
-    if ASSEMBLY_CACHE.get("ready"):
-        return
+def _db_file_signature():
+    try:
+        stat = EXCEL_PATH.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def reload_assembly_cache() -> Dict[str, Any]:
+    global ASSEMBLY_CACHE
 
     with _CACHE_LOCK:
-        if ASSEMBLY_CACHE.get("ready"):
-            return
-        build_assembly_cache()
+        current = ASSEMBLY_CACHE
+        snapshot = get_work_time_db_snapshot(EXCEL_PATH)
+        if current.get("ready") and current.get("version") == snapshot.content_hash:
+            # 내용은 같고 mtime만 바뀐 경우: 맵은 그대로 두고 서명만 갱신
+            ASSEMBLY_CACHE = {**current, "signature": (snapshot.mtime, snapshot.size)}
+        else:
+            ASSEMBLY_CACHE = build_assembly_cache()
+        return ASSEMBLY_CACHE
+
+
+def _run_background_reload() -> None:
+    try:
+        reload_assembly_cache()
+        error = None
+    except Exception as exc:
+        error = str(getattr(exc, "detail", None) or exc)
+    with _RELOAD_STATE_LOCK:
+        _RELOAD_STATE["running"] = False
+        _RELOAD_STATE["lastFinishedAt"] = time.time()
+        _RELOAD_STATE["lastError"] = error
+
+
+def _schedule_assembly_cache_reload() -> bool:
+    with _RELOAD_STATE_LOCK:
+        if _RELOAD_STATE["running"]:
+            return False
+        _RELOAD_STATE["running"] = True
+        _RELOAD_STATE["lastStartedAt"] = time.time()
+    threading.Thread(
+        target=_run_background_reload,
+        name="assembly-cache-reload",
+        daemon=True,
+    ).start()
+    return True
+
+
+def ensure_assembly_cache() -> Dict[str, Any]:
+    if current_db_version() != DEFAULT_DB_VERSION:
+        # 기본 외 버전은 스냅샷에 붙여 둔다. 스냅샷이 LRU로 축출되면 캐시도 같이 사라진다.
+        snapshot = get_work_time_db_snapshot(current_db_path())
+        return snapshot.derive("assembly.cache", lambda: build_assembly_cache(snapshot))
+
+    cache = ASSEMBLY_CACHE
+    if cache.get("ready"):
+        signature = _db_file_signature()
+        if signature is not None and signature != cache.get("signature"):
+            _schedule_assembly_cache_reload()
+        return cache
+
+    # 최초 빌드는 동기로 수행. 동시에 들어온 요청은 락에서 기다렸다가 같은 버전을 받는다.
+    return reload_assembly_cache()
+
+
+def get_assembly_cache_status() -> Dict[str, Any]:
+    cache = ASSEMBLY_CACHE
+    with _RELOAD_STATE_LOCK:
+        reload_state = dict(_RELOAD_STATE)
+    signature = cache.get("signature") or (None, None)
+    return {
+        "ready": bool(cache.get("ready")),
+        "dbPath": str(EXCEL_PATH),
+        "version": cache.get("version"),
+        "dbMtime": signature[0],
+        "dbSize": signature[1],
+        "builtAt": cache.get("builtAt"),
+        "stale": bool(cache.get("ready")) and _db_file_signature() not in (None, cache.get("signature")),
+        "reload": reload_state,
+    }
 
 
 def _as_clean_str(value: Any) -> str:
@@ -200,8 +304,7 @@ def _infer_sequence_node_type(source_sheet: str, part_base: str = "") -> str:
 
 def _fallback_first_option(part_base: str, source_sheet: str) -> str:
     """option이 빈 문자열일 때 캐시에서 첫 번째 사용 가능한 옵션을 반환."""
-    ensure_assembly_cache()
-    options_by_sheet = ASSEMBLY_CACHE.get("options", {})
+    options_by_sheet = ensure_assembly_cache().get("options", {})
     # 지정된 시트 우선
     if source_sheet:
         opts = options_by_sheet.get(source_sheet, {}).get(part_base, [])
@@ -230,8 +333,7 @@ def _resolve_sequence_option(
     if normalized_option:
         return normalized_option, normalized_sheet
 
-    ensure_assembly_cache()
-    options_by_sheet = ASSEMBLY_CACHE.get("options", {})
+    options_by_sheet = ensure_assembly_cache().get("options", {})
 
     if normalized_sheet and normalized_sheet in options_by_sheet:
         sheet_options = options_by_sheet[normalized_sheet].get(normalized_part, [])
@@ -1013,13 +1115,13 @@ def _build_assembly_rows_from_sequence_entries(
             "skipped": [],
         }
 
-    ensure_assembly_cache()
+    cache = ensure_assembly_cache()
 
     added = []
     skipped = []
     seen_rows = set()
 
-    tasks_by_sheet = ASSEMBLY_CACHE["tasks"]
+    tasks_by_sheet = cache["tasks"]
     part_key = REQUIRED_COLUMNS[0]
     option_key = REQUIRED_COLUMNS[2]
     repeat_key = REQUIRED_COLUMNS[6]
@@ -1151,25 +1253,24 @@ def write_assembly_rows_json(bom_id: str, spec: str, rows: List[Dict[str, Any]])
 # -----------------------------
 @router.get("/sheets")
 def get_sheets():
-    ensure_assembly_cache()
-    return ASSEMBLY_CACHE["sheets"]
+    return ensure_assembly_cache()["sheets"]
 
 
 @router.get("/part-bases")
 def get_part_bases(sheet: str):
-    ensure_assembly_cache()
+    cache = ensure_assembly_cache()
 
-    if sheet not in ASSEMBLY_CACHE["parts"]:
+    if sheet not in cache["parts"]:
         raise HTTPException(status_code=404, detail="Sheet not found")
 
-    return ASSEMBLY_CACHE["parts"][sheet]
+    return cache["parts"][sheet]
 
 
 @router.get("/all-part-bases")
 def get_all_part_bases():
-    ensure_assembly_cache()
+    cache = ensure_assembly_cache()
     result = []
-    for sheet, parts in ASSEMBLY_CACHE["parts"].items():
+    for sheet, parts in cache["parts"].items():
         for part_base in parts:
             result.append({"partBase": part_base, "sheet": sheet})
     return result
@@ -1177,12 +1278,12 @@ def get_all_part_bases():
 
 @router.get("/options")
 def get_options(sheet: str, part_base: str):
-    ensure_assembly_cache()
+    cache = ensure_assembly_cache()
 
-    if sheet not in ASSEMBLY_CACHE["options"]:
+    if sheet not in cache["options"]:
         raise HTTPException(status_code=404, detail="Sheet not found")
 
-    return ASSEMBLY_CACHE["options"][sheet].get(part_base, [])
+    return cache["options"][sheet].get(part_base, [])
 
 
 @router.get("/tasks")
@@ -1191,16 +1292,100 @@ def get_tasks(
     part_base: str,
     option: str,
 ):
-    ensure_assembly_cache()
+    cache = ensure_assembly_cache()
 
-    if sheet not in ASSEMBLY_CACHE["tasks"]:
+    if sheet not in cache["tasks"]:
         raise HTTPException(status_code=404, detail="Sheet not found")
 
-    by_part = ASSEMBLY_CACHE["tasks"][sheet]
+    by_part = cache["tasks"][sheet]
     by_opt = by_part.get(part_base, {})
     return by_opt.get(option, [])
 
 
+@router.get("/admin/db-version")
+def get_assembly_db_version():
+    return get_assembly_cache_status()
+
+
+@router.post("/admin/reload")
+def force_assembly_cache_reload(wait: bool = True):
+    """
+    작업시간분석표 DB 강제 재로딩
+    - wait=true: 재빌드가 끝난 뒤 새 버전을 반환
+    - wait=false: 백그라운드 재빌드만 예약하고 현재 버전을 반환
+    """
+    if wait:
+        try:
+            reload_assembly_cache()
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        # DB를 다시 올렸으니 실패했던 워밍업 단계(→ /api/ready 503)도 다시 시도
+        request_rewarm()
+        return get_assembly_cache_status()
+
+    _schedule_assembly_cache_reload()
+    request_rewarm()
+    return get_assembly_cache_status()
+
+
+@router.get("/admin/db-versions")
+def get_assembly_db_versions():
+    """
+    사용 가능한 작업시간분석표 DB 버전 목록 + 메모리에 올라와 있는 스냅샷(LRU) 상태
+    """
+    return {
+        "current": current_db_version(),
+        "versions": [
+            {"name": name, "path": str(path), "exists": path.exists()}
+            for name, path in list_db_versions().items()
+        ],
+        "memory": get_snapshot_cache_status(),
+    }
+
+
+@router.get("/admin/match-cache")
+def get_match_cache_stats():
+    """
+    영구 매칭 캐시(sqlite) 적중/미스 카운터와 항목 수
+    """
+    return get_match_cache().stats()
+
+
+@router.get("/admin/text-normalization")
+def get_text_normalization_stats():
+    """
+    공용 텍스트 정규화 함수별 LRU 적중/미스 카운터
+    """
+    return normalizer_stats()
+
+
+@router.put("/bom/{bom_id}/db-version")
+def set_bom_db_version(bom_id: str, payload: Dict[str, Any]):
+    """
+    BOM run이 사용할 DB 버전을 bom_meta.json(workTimeDb)에 기록
+    - version 비우면 기본 DB로 되돌림
+    """
+    root = BOM_RUNS_DIR / bom_id
+    if Path(bom_id).name != bom_id or not root.is_dir():
+        raise HTTPException(status_code=404, detail="BOM not found")
+
+    version = str(payload.get("version") or "").strip()
+    if version:
+        try:
+            resolve_db_path(version)
+        except UnknownDbVersionError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+    bom_meta = read_bom_meta(root)
+    if version and version != DEFAULT_DB_VERSION:
+        bom_meta[BOM_META_DB_VERSION_KEY] = version
+    else:
+        bom_meta.pop(BOM_META_DB_VERSION_KEY, None)
+    write_bom_meta(root, bom_meta)
+
+    return {"bomId": bom_id, "dbVersion": version or DEFAULT_DB_VERSION}
+
+
 # -----------------------------
 # JSON 저장 / 로드 (기존 유지)
 # -----------------------------
@@ -7,24 +7,41 @@ from fastapi.encoders import jsonable_encoder
 from pathlib import Path
 import json
 import os
-from openpyxl import load_workbook
-from typing import Any, List, Dict, Optional, Set, Tuple
+from contextlib import contextmanager
+from typing import Any, List, Dict, Iterator, Optional, Set, Tuple
 from functools import lru_cache
 import re
 from types import SimpleNamespace
+from backend.Assembly.db_snapshot import WorkTimeDbSnapshot, get_work_time_db_snapshot
+from backend.Assembly.db_registry import UnknownDbVersionError, current_db_path, current_db_version, use_bom_db_version
+from backend.Assembly.batch_match import (
+    iter_spec_trees,
+    load_prematched_matches,
+    match_part_queries,
+    match_tree_nodes,
+    part_node_query,
+)
 from backend.Assembly.auto_match import (
     combined_score,
-    load_db_rows,
-    match_one_best,
     jw_score,
     COMBINED_THRESHOLD,
-    normalize_text,
     rf_score,
     TOPK,
 )
 from backend.sequence.ai_provider import generate_sequence_chat_recommendations
+from backend.text_normalization import (
+    memoized_normalizer,
+    normalize_chat_text as _normalize_chat_text,
+    normalize_relation_key as _normalize_relation_key,
+)
 from backend.sequence.ai_service import generate_sequence_ai_draft
-from backend.sequence.embedding_search import search_chat_candidates_with_bge_m3
+from backend.sequence.embedding_search import (
+    EmbeddingIndexNotReady,
+    embedding_index_serves,
+    get_embedding_index_status,
+    schedule_global_embedding_index_build,
+    search_chat_candidates_with_bge_m3,
+)
 from backend.sequence.schema import (
     SequenceAIDraftRequest,
     SequenceDebugPrintRequest,
@@ -80,25 +97,6 @@ def _append_sequence_debug_log(stage: str, payload: Optional[Dict[str, Any]] = N
         fp.write(line + "\n")
 
 
-@lru_cache(maxsize=4)
-def _get_cached_db_rows(excel_path_str: str, mtime: float):
-    return load_db_rows(Path(excel_path_str))
-
-
-@lru_cache(maxsize=4)
-def _get_cached_db_match_data(excel_path_str: str, mtime: float):
-    db_rows, db_choices = _get_cached_db_rows(excel_path_str, mtime)
-    exact_rows_by_norm: Dict[str, List[Dict[str, Any]]] = {}
-
-    for row in db_rows:
-        norm = str(row.get("db_part_norm") or "").strip()
-        if not norm:
-            continue
-        exact_rows_by_norm.setdefault(norm, []).append(row)
-
-    return db_rows, db_choices, exact_rows_by_norm
-
-
 def _format_tree_label(node: Dict) -> str:
     for key in ("id", "part_no", "name"):
         value = node.get(key)
@@ -154,11 +152,12 @@ def _get_cached_sequence_part_candidates(
     spec: str,
     include_all_parts: bool,
     tree_mtime: float,
+    excel_path_text: str,
     excel_mtime: float,
 ) -> Dict[str, Any]:
     root_dir = DATA_DIR / "data" / "bom_runs" / bom_id
     json_path = root_dir / f"{spec}.json"
-    excel_path = DATA_DIR / "작업시간분석표DB.xlsx"
+    excel_path = Path(excel_path_text)
 
     try:
         tree = json.loads(json_path.read_text(encoding="utf-8"))
@@ -166,15 +165,27 @@ def _get_cached_sequence_part_candidates(
         raise HTTPException(500, f"JSON 로드 실패: {str(e)}")
 
     nodes = tree.get("nodes", [])
-    db_rows, db_choices, exact_rows_by_norm = _get_cached_db_match_data(
-        str(excel_path.resolve()),
-        excel_mtime,
-    )
 
     parts = []
-    query_cache: Dict[str, Optional[Dict[str, Any]]] = {}
     tree_path_map = _build_tree_path_map(nodes)
 
+    # 추천값이 없는 노드의 질의를 모아 한 번에 매칭 (BOM 업로드 때 사전 매칭된 질의는 재사용)
+    pending_queries = [
+        part_node_query(n)
+        for n in nodes
+        if n.get("type") == "PART"
+        and (include_all_parts or n.get("inhouse") is True)
+        and not (n.get("recommended_part_base") and n.get("recommended_source_sheet"))
+    ]
+    known_matches = load_prematched_matches(root_dir, excel_path)
+    matches_by_query = {
+        **known_matches,
+        **match_part_queries(
+            [q for q in pending_queries if q and q not in known_matches],
+            excel_path,
+        ),
+    }
+
     for n in nodes:
         if n.get("type") != "PART":
             continue
@@ -196,46 +207,9 @@ def _get_cached_sequence_part_candidates(
                 "source": "manual-recommendation",
             }
         else:
-            for query_raw in [part_name, part_id]:
-                if not query_raw:
-                    continue
-
-                query_text = str(query_raw).strip()
-                if not query_text:
-                    continue
-
-                if query_text in query_cache:
-                    candidate = query_cache[query_text]
-                else:
-                    normalized_query = normalize_text(query_text)
-                    exact_matches = exact_rows_by_norm.get(normalized_query, [])
-
-                    if len(exact_matches) == 1:
-                        exact_match = exact_matches[0]
-                        candidate = {
-                            "json_id_raw": query_text,
-                            "json_id_norm": normalized_query,
-                            "db_part_raw": exact_match["db_part_raw"],
-                            "db_part_norm": exact_match["db_part_norm"],
-                            "score_rapidfuzz": 100.0,
-                            "score_jw": 100.0,
-                            "score_combined": 100.0,
-                            "sheet": exact_match["sheet"],
-                            "row_index": exact_match["row_index"],
-                        }
-                    else:
-                        candidate = match_one_best(
-                            query_raw=query_text,
-                            db_rows=db_rows,
-                            db_choices=db_choices,
-                            topk=TOPK,
-                        )
-
-                    query_cache[query_text] = candidate
-
-                if candidate and candidate["score_combined"] >= COMBINED_THRESHOLD:
-                    best = candidate
-                    break
+            candidates = matches_by_query.get(part_node_query(n)) or []
+            if candidates and candidates[0]["score_combined"] >= COMBINED_THRESHOLD:
+                best = candidates[0]
 
         if recommended_part_base and recommended_source_sheet:
             pass
@@ -279,7 +253,7 @@ def _load_sequence_part_candidates(
 ) -> Dict[str, Any]:
     root_dir = DATA_DIR / "data"/ "bom_runs" / bom_id
     json_path = root_dir / f"{spec}.json"
-    excel_path = DATA_DIR / "작업시간분석표DB.xlsx"
+    excel_path = current_db_path()
 
     if not excel_path.exists():
         raise HTTPException(
@@ -300,6 +274,7 @@ def _load_sequence_part_candidates(
         spec,
         include_all_parts,
         json_path.stat().st_mtime,
+        str(excel_path),
         excel_path.stat().st_mtime,
     )
 
@@ -338,205 +313,86 @@ def get_sequence_parts(bomId: str, spec: str):
     return _filter_sequence_part_candidates_to_db_mapped(payload)
 
 
+@router.get("/admin/embedding-index")
+def get_sequence_embedding_index_status():
+    """
+    채팅 임베딩 색인 상태 (서비스 중인 색인, 원본 DB 대비 stale 여부, 백그라운드 빌드 진행/최근 결과)
+    """
+    return get_embedding_index_status()
 
-EXCEL_DB_PATH = Path("backend/작업시간분석표DB.xlsx")
-
-
-def _read_sequence_sheet_headers(ws, header_row: int) -> Dict[str, int]:
-    headers: Dict[str, int] = {}
-    for col in range(1, ws.max_column + 1):
-        value = ws.cell(row=header_row, column=col).value
-        if value is not None and str(value).strip():
-            headers[str(value).strip()] = col
-    return headers
-
-
-def _resolve_sequence_sheet_columns(headers: Dict[str, int]) -> Tuple[Optional[int], Optional[int], Optional[int]]:
-    part_col = None
-    process_col = None
-    option_col = None
-
-    for key, column in headers.items():
-        normalized = key.replace(" ", "")
-        if "부품" in normalized and part_col is None:
-            part_col = column
-        if ("요소작업" in normalized or "공정" in normalized) and process_col is None:
-            process_col = column
-        if "OPTION" in key.upper() and option_col is None:
-            option_col = column
-
-    return part_col, process_col, option_col
-
-
-def _resolve_sequence_action_columns(headers: Dict[str, int]) -> Dict[str, Optional[int]]:
-    columns: Dict[str, Optional[int]] = {
-        "part": None,
-        "process": None,
-        "option": None,
-        "worker": None,
-        "category": None,
-        "action": None,
-    }
-
-    for key, column in headers.items():
-        normalized = key.replace(" ", "")
-        upper_key = key.upper()
-
-        if columns["part"] is None and "부품" in normalized:
-            columns["part"] = column
-        if columns["process"] is None and ("요소작업" in normalized or "공정" in normalized):
-            columns["process"] = column
-        if columns["option"] is None and "OPTION" in upper_key:
-            columns["option"] = column
-        if columns["worker"] is None and "작업자" in normalized:
-            columns["worker"] = column
-        if columns["category"] is None and normalized == "no":
-            columns["category"] = column
-        if columns["action"] is None and "동작요소" in normalized:
-            columns["action"] = column
-
-    return columns
-
-
-def _iter_sequence_sheet_rows(ws, header_row: int):
-    headers = _read_sequence_sheet_headers(ws, header_row)
-    part_col, process_col, option_col = _resolve_sequence_sheet_columns(headers)
-
-    if not part_col:
-        return
-
-    current_part = None
-    current_process = None
-    current_option = None
-
-    for row in range(header_row + 1, ws.max_row + 1):
-        raw_part = ws.cell(row=row, column=part_col).value
-        raw_process = ws.cell(row=row, column=process_col).value if process_col else None
-        raw_option = ws.cell(row=row, column=option_col).value if option_col else None
-
-        if raw_part is not None and str(raw_part).strip():
-            current_part = str(raw_part).strip()
-        if raw_process is not None and str(raw_process).strip():
-            current_process = str(raw_process).strip()
-        if raw_option is not None and str(raw_option).strip():
-            current_option = str(raw_option).strip()
-
-        option_value = current_option or ""
-        if not current_part and not current_process and not option_value:
-            continue
-
-        yield {
-            "row": row,
-            "partBase": current_part or "",
-            "processLabel": current_process or "",
-            "option": option_value,
-        }
-
-
-def _iter_sequence_action_rows(ws, header_row: int):
-    headers = _read_sequence_sheet_headers(ws, header_row)
-    columns = _resolve_sequence_action_columns(headers)
 
-    if not columns["part"]:
-        return
+@router.post("/admin/embedding-index/rebuild")
+def rebuild_sequence_embedding_index():
+    """
+    채팅 임베딩 색인 백그라운드 재빌드 예약 (이미 예약/진행 중이면 그대로)
+    - 빌드 중에도 채팅은 이전 색인(없으면 휴리스틱 후보)으로 응답
+    """
+    scheduled = schedule_global_embedding_index_build("manual", force=True)
+    return {"scheduled": scheduled, **get_embedding_index_status()}
 
-    current_part = None
-    current_process = None
-    current_option = None
 
-    for row in range(header_row + 1, ws.max_row + 1):
-        raw_part = ws.cell(row=row, column=columns["part"]).value
-        raw_process = (
-            ws.cell(row=row, column=columns["process"]).value
-            if columns["process"]
-            else None
-        )
-        raw_option = (
-            ws.cell(row=row, column=columns["option"]).value
-            if columns["option"]
-            else None
-        )
-        raw_worker = (
-            ws.cell(row=row, column=columns["worker"]).value
-            if columns["worker"]
-            else None
-        )
-        raw_category = (
-            ws.cell(row=row, column=columns["category"]).value
-            if columns["category"]
-            else None
-        )
-        raw_action = (
-            ws.cell(row=row, column=columns["action"]).value
-            if columns["action"]
-            else None
+@router.get("/part-matches")
+def get_sequence_part_matches(
+    bomId: str,
+    spec: Optional[str] = None,
+    topk: int = Query(TOPK, ge=1, le=50),
+    include_all_parts: bool = Query(True, alias="includeAllParts"),
+):
+    """
+    BOM 트리 PART 노드 → 작업시간 DB 부품 기준 배치 매칭 (노드별 TopK 후보 + 점수)
+    - spec 지정: 해당 사양만 / 생략: BOM run의 전체 사양
+    """
+    root_dir = DATA_DIR / "data" / "bom_runs" / bomId
+    excel_path = current_db_path()
+    if not excel_path.exists():
+        raise HTTPException(500, f"작업시간 분석표 DB 엑셀 없음: {excel_path}")
+    if not root_dir.is_dir():
+        raise HTTPException(404, "BOM not found")
+
+    if spec:
+        json_path = root_dir / f"{spec}.json"
+        if not json_path.exists():
+            raise HTTPException(404, "Spec not found")
+        trees = [(spec, json.loads(json_path.read_text(encoding="utf-8")))]
+    else:
+        trees = list(iter_spec_trees(root_dir))
+
+    known_matches = load_prematched_matches(root_dir, excel_path, topk=topk)
+    specs = []
+    for spec_name, tree in trees:
+        nodes = match_tree_nodes(
+            tree.get("nodes", []),
+            excel_path,
+            include_all_parts=include_all_parts,
+            topk=topk,
+            known_matches=known_matches,
         )
-
-        if raw_part is not None and str(raw_part).strip():
-            current_part = str(raw_part).strip()
-        if raw_process is not None and str(raw_process).strip():
-            current_process = str(raw_process).strip()
-        if raw_option is not None and str(raw_option).strip():
-            current_option = str(raw_option).strip()
-
-        action_value = str(raw_action).strip() if raw_action is not None and str(raw_action).strip() else ""
-        if not current_part and not current_process and not current_option and not action_value:
-            continue
-
-        yield {
-            "row": row,
-            "partBase": current_part or "",
-            "processLabel": current_process or "",
-            "option": current_option or "",
-            "worker": str(raw_worker).strip() if raw_worker is not None and str(raw_worker).strip() else "",
-            "category": str(raw_category).strip() if raw_category is not None and str(raw_category).strip() else "",
-            "actionElement": action_value,
-        }
-
-
-def collect_options_for_part(ws, part_col: int, option_col: int, header_row: int, part_base: str):
-    options = set()
-
-    for item in _iter_sequence_sheet_rows(ws, header_row):
-        if item.get("partBase") != part_base:
-            continue
-        option_value = item.get("option")
-        if option_value:
-            options.add(option_value)
-
-    return sorted(options)
-
-
-@lru_cache(maxsize=4)
-def _get_cached_sequence_option_rows(excel_path_str: str, mtime: float) -> Dict[str, Any]:
-    wb = load_workbook(Path(excel_path_str), data_only=True)
-    rows_by_sheet: Dict[str, List[Dict[str, Any]]] = {}
-    action_rows_by_sheet: Dict[str, List[Dict[str, Any]]] = {}
-
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        rows_by_sheet[sheet_name] = list(_iter_sequence_sheet_rows(ws, 2))
-        action_rows_by_sheet[sheet_name] = list(_iter_sequence_action_rows(ws, 2))
+        specs.append({"spec": spec_name, "count": len(nodes), "nodes": nodes})
 
     return {
-        "sheetNames": list(wb.sheetnames),
-        "rowsBySheet": rows_by_sheet,
-        "actionRowsBySheet": action_rows_by_sheet,
+        "bomId": bomId,
+        "topk": topk,
+        "threshold": COMBINED_THRESHOLD,
+        "specs": specs,
     }
 
 
+
 def _get_sequence_option_index() -> Dict[str, Any]:
-    if not EXCEL_DB_PATH.exists():
+    excel_path = current_db_path()
+    if not excel_path.exists():
         return {
             "sheetNames": [],
             "rowsBySheet": {},
             "actionRowsBySheet": {},
         }
 
-    return _get_cached_sequence_option_rows(
-        str(EXCEL_DB_PATH.resolve()),
-        EXCEL_DB_PATH.stat().st_mtime,
-    )
+    snapshot = get_work_time_db_snapshot(excel_path)
+    return {
+        "sheetNames": list(snapshot.sheet_names),
+        "rowsBySheet": snapshot.sequence_rows,
+        "actionRowsBySheet": snapshot.action_rows,
+    }
 
 
 def _resolve_option_sheet_names(option_index: Dict[str, Any], source_sheet: Optional[str]) -> List[str]:
@@ -839,16 +695,6 @@ _CHAT_PART_CANONICAL_TARGETS = {
 }
 
 
-def _normalize_chat_text(value: Any) -> str:
-    normalized = str(value or "").strip().upper()
-    if not normalized:
-        return ""
-    normalized = normalized.replace("_", " ").replace("-", " ")
-    normalized = re.sub(r"[^0-9A-Z가-힣/ ]+", " ", normalized)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    return normalized
-
-
 def _tokenize_chat_text(value: Any) -> List[str]:
     normalized = _normalize_chat_text(value)
     if not normalized:
@@ -1383,7 +1229,7 @@ def _filter_process_matches_by_requested_context(
 
 def _load_options_from_excel(part_base: str, source_sheet: Optional[str]) -> List[str]:
     part_base = str(part_base or "").strip()
-    if not part_base or not EXCEL_DB_PATH.exists():
+    if not part_base or not current_db_path().exists():
         return []
 
     option_index = _get_sequence_option_index()
@@ -1410,7 +1256,7 @@ def _load_process_options_from_excel(
 ) -> List[str]:
     part_base = str(part_base or "").strip()
     process_label = str(process_label or "").strip()
-    if not part_base or not process_label or not EXCEL_DB_PATH.exists():
+    if not part_base or not process_label or not current_db_path().exists():
         return []
 
     option_index = _get_sequence_option_index()
@@ -1461,36 +1307,20 @@ def _sequence_process_template_to_dict(template: Any) -> Dict[str, Any]:
     }
 
 
-@lru_cache(maxsize=4)
-def _get_cached_process_templates(excel_path_str: str, mtime: float) -> Dict[str, Any]:
-    excel_path = Path(excel_path_str)
-    wb = load_workbook(excel_path, data_only=True)
-
+def _build_process_templates(snapshot: WorkTimeDbSnapshot) -> Dict[str, Any]:
     processes = []
-    seen = set()
 
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        for item in _iter_sequence_sheet_rows(ws, 2):
-            part_base = str(item.get("partBase") or "").strip()
-            process_label = str(item.get("processLabel") or "").strip()
-            if not part_base or not process_label:
-                continue
-            if not _is_valid_process_label(process_label, part_base):
-                continue
-            key = (sheet_name, part_base, process_label)
-
-            if key in seen:
-                continue
-            seen.add(key)
+    for sheet_name, part_base, process_label in snapshot.processes:
+        if not _is_valid_process_label(process_label, part_base):
+            continue
 
-            processes.append({
-                "processKey": f"{sheet_name}:{part_base}:{process_label}",
-                "processType": "STANDARD",
-                "label": process_label,
-                "sourceSheet": sheet_name,
-                "partBase": part_base,
-            })
+        processes.append({
+            "processKey": f"{sheet_name}:{part_base}:{process_label}",
+            "processType": "STANDARD",
+            "label": process_label,
+            "sourceSheet": sheet_name,
+            "partBase": part_base,
+        })
 
     return {
         "source": "assembly-db",
@@ -1515,6 +1345,21 @@ def _resolve_effective_process_templates(req_templates: Optional[List[Any]] = No
     return get_process_templates().get("processes", [])
 
 
+def _effective_process_templates_version(req_templates: Optional[List[Any]] = None) -> Optional[Tuple[str, str]]:
+    """
+    채팅 임베딩 매칭의 템플릿 색인 캐시 키 (요청마다 템플릿 목록 전체를 훑지 않도록)
+    - 서버가 DB에서 만든 템플릿 목록만 DB 내용 해시를 버전으로 삼는다
+    - 요청 템플릿은 클라이언트가 걸러 보낸 목록이라 같은 DB라도 내용이 다를 수 있음 → None (내용 digest로 캐시)
+    """
+    if req_templates:
+        return None
+    try:
+        content_hash = get_work_time_db_snapshot(current_db_path()).content_hash
+    except Exception:
+        return None
+    return ("db", content_hash)
+
+
 def _build_chat_reply(
     message: str,
     part_matches: List[Dict[str, Any]],
@@ -2035,16 +1880,23 @@ def _process_family_key(process_key: Any, label: Any) -> str:
     return str(process_key or label or "").strip().upper()
 
 
+_PART_FAMILY_PAREN_RE = re.compile(r"\([^)]*\)")
+_PART_FAMILY_BRACKET_RE = re.compile(r"\[[^\]]*\]")
+_PART_FAMILY_NON_CHAR_RE = re.compile(r"[^A-Z0-9가-힣/ ]+")
+_NON_COMPACT_CHAR_RE = re.compile(r"[^A-Z0-9가-힣]+")
+
+
+@memoized_normalizer("partFamily")
 def _part_family_key(value: Any) -> str:
     normalized = _normalize_relation_key(value)
     if not normalized:
         return ""
 
-    normalized = re.sub(r"\([^)]*\)", " ", normalized)
-    normalized = re.sub(r"\[[^\]]*\]", " ", normalized)
+    normalized = _PART_FAMILY_PAREN_RE.sub(" ", normalized)
+    normalized = _PART_FAMILY_BRACKET_RE.sub(" ", normalized)
     normalized = normalized.replace("-", " ")
-    normalized = re.sub(r"[^A-Z0-9가-힣/ ]+", " ", normalized)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
+    normalized = _PART_FAMILY_NON_CHAR_RE.sub(" ", normalized)
+    normalized = " ".join(normalized.split())
 
     aliases = {
         "LED DRIVE MODULE": "LDM",
@@ -2236,10 +2088,6 @@ def _dedupe_part_matches(parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return deduped
 
 
-def _normalize_relation_key(value: Any) -> str:
-    return re.sub(r"\s+", " ", str(value or "").strip()).upper()
-
-
 def _is_valid_process_label(process_label: Any, part_base: Any = None) -> bool:
     label = " ".join(str(process_label or "").split()).strip()
     if not label:
@@ -3640,16 +3488,15 @@ def get_process_templates():
     - '요소작업' = 실제 공정 라벨
     """
 
-    if not EXCEL_DB_PATH.exists():
+    excel_path = current_db_path()
+    if not excel_path.exists():
         raise HTTPException(
             status_code=404,
             detail="작업시간 분석표 DB 엑셀 파일 없음"
         )
 
-    return _get_cached_process_templates(
-        str(EXCEL_DB_PATH.resolve()),
-        EXCEL_DB_PATH.stat().st_mtime,
-    )
+    snapshot = get_work_time_db_snapshot(excel_path)
+    return snapshot.derive("sequence.process_templates", lambda: _build_process_templates(snapshot))
 
 
 def _recommend_next_processes_from_graph(
@@ -4331,7 +4178,7 @@ def _is_assy_part(part: Any) -> bool:
             getattr(part, "displayLabel", None),
         ]
     haystack = " ".join(str(value or "").upper() for value in values)
-    compact = re.sub(r"[^A-Z0-9가-힣]+", "", haystack)
+    compact = _NON_COMPACT_CHAR_RE.sub("", haystack)
     return "ASSY" in compact or "ASS'Y" in haystack or "SUBASSY" in compact
 
 
@@ -4505,7 +4352,7 @@ def _is_manual_barcode_reading_process(item: Any, process_key: Any = "", label:
         ]
 
     haystack = _normalize_relation_key(" ".join(str(value or "") for value in values))
-    compact = re.sub(r"[^A-Z0-9가-힣]+", "", haystack)
+    compact = _NON_COMPACT_CHAR_RE.sub("", haystack)
     has_barcode = any(keyword in haystack for keyword in ("바코드", "BAR CODE", "BAR-CODE", "BARCODE"))
     has_reading = any(keyword in haystack for keyword in ("리딩", "READ", "READING", "SCAN", "스캔"))
     return (has_barcode and has_reading) or "단순 리딩 작업" in haystack or "단순리딩작업" in compact
@@ -5004,7 +4851,7 @@ def get_part_options(
     source: 작업시간 분석표 DB 엑셀
     """
 
-    if not EXCEL_DB_PATH.exists():
+    if not current_db_path().exists():
         raise HTTPException(404, "작업시간 분석표 DB 엑셀 파일 없음")
 
     requested_sheet = (source_sheet or "").strip()
@@ -5038,7 +4885,7 @@ def get_node_action_elements(
     process_label: Optional[str] = Query(None, alias="processLabel"),
     source_sheet: Optional[str] = Query(None, alias="sourceSheet"),
 ):
-    if not EXCEL_DB_PATH.exists():
+    if not current_db_path().exists():
         raise HTTPException(404, "작업시간 분석표 DB 엑셀 파일 없음")
 
     normalized_type = str(node_type or "").strip().upper()
@@ -5065,8 +4912,23 @@ def get_node_action_elements(
     }
 
 
+@contextmanager
+def _chat_db_version(bom_id: Optional[str]) -> Iterator[None]:
+    # 채팅 요청은 본문에 bomId가 있어 미들웨어가 못 고른 BOM별 DB 버전을 여기서 적용
+    try:
+        with use_bom_db_version(bom_id):
+            yield
+    except UnknownDbVersionError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
 @router.post("/chat", response_model=SequenceChatResponse)
 def chat_sequence_recommendations(req: SequenceChatRequest):
+    with _chat_db_version(req.bomId):
+        return _chat_sequence_recommendations(req)
+
+
+def _chat_sequence_recommendations(req: SequenceChatRequest) -> SequenceChatResponse:
     message = str(req.message or "").strip()
     if not message:
         raise HTTPException(status_code=400, detail="message가 비어 있습니다.")
@@ -5134,7 +4996,16 @@ def chat_sequence_recommendations(req: SequenceChatRequest):
             recommended_processes = fast_path_processes
             used_fast_path = True
 
-    if not used_fast_path:
+    # 전역 임베딩 색인은 기본 DB 한 버전의 문서로만 빌드 → 다른 DB 버전이면 임베딩 후보 없이 진행
+    use_embedding_index = embedding_index_serves(current_db_path())
+    if not used_fast_path and not use_embedding_index:
+        _emit_sequence_recommend_log(
+            "CHAT_EMBEDDING_SKIPPED",
+            model="BAAI/bge-m3",
+            dbVersion=current_db_version(),
+        )
+
+    if not used_fast_path and use_embedding_index:
         try:
             embedding_result = search_chat_candidates_with_bge_m3(
                 message,
@@ -5142,6 +5013,7 @@ def chat_sequence_recommendations(req: SequenceChatRequest):
                 process_templates=effective_process_templates,
                 part_limit=max(candidate_limit, 30),
                 process_limit=max(candidate_limit * 2, 60),
+                process_templates_version=_effective_process_templates_version(req.processTemplates),
             )
             embedding_part_matches = [
                 _part_match_from_embedding_document(item)
@@ -5176,6 +5048,14 @@ def chat_sequence_recommendations(req: SequenceChatRequest):
                     for item in embedding_process_matches[:5]
                 ],
             )
+        except EmbeddingIndexNotReady as exc:
+            # 색인은 백그라운드에서 빌드 중: 요청은 기다리지 않고 휴리스틱 후보로 진행
+            logger.info("bge-m3 embedding index not ready; using heuristic candidates: %s", exc)
+            _emit_sequence_recommend_log(
+                "CHAT_EMBEDDING_PENDING",
+                model="BAAI/bge-m3",
+                build=get_embedding_index_status()["build"],
+            )
         except Exception as exc:
             logger.warning("bge-m3 chat embedding search failed; falling back to heuristic candidates: %s", exc)
             _emit_sequence_recommend_log(
@@ -5595,6 +5475,11 @@ def chat_sequence_recommendations(req: SequenceChatRequest):
 
 @router.post("/chat/per-part", response_model=SequenceChatPerPartResponse)
 def chat_sequence_per_part_recommendations(req: SequenceChatPerPartRequest):
+    with _chat_db_version(req.bomId):
+        return _chat_sequence_per_part_recommendations(req)
+
+
+def _chat_sequence_per_part_recommendations(req: SequenceChatPerPartRequest) -> SequenceChatPerPartResponse:
     message = str(req.message or "").strip()
     if not message:
         raise HTTPException(status_code=400, detail="message가 비어 있습니다.")
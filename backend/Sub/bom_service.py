@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import hashlib
 import json
+import logging
 import shutil
 import tempfile
 from pathlib import Path
@@ -17,6 +18,8 @@ CACHE_DIR = Path(__file__).resolve().parents[1] / "data" / "bom_cache"
 BOM_RUNS_DIR.mkdir(parents=True, exist_ok=True)
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+logger = logging.getLogger(__name__)
+
 SUPPORTED_SUFFIX = {".xls", ".xlsx", ".xlsb", ".xlsm", ".xltm", ".xltx"}
 
 
@@ -133,6 +136,20 @@ def store_uploaded_file(root: Path, original_filename: str, binary_data: bytes)
     return file_path
 
 
+def _prematch_parts(bom_id: str, root: Path) -> None:
+    # 사전 매칭은 속도용 캐시일 뿐이라 백그라운드로 돌리고 임포트는 기다리지 않는다
+    # (서버가 먼저 내려가 결과가 없으면 첫 조회의 load_prematched_matches miss에서 다시 예약)
+    from backend.Assembly.batch_match import schedule_prematch_bom_run
+    from backend.Assembly.db_registry import db_version_for_bom, resolve_db_path
+
+    try:
+        excel_path = resolve_db_path(db_version_for_bom(bom_id))
+        if excel_path.exists():
+            schedule_prematch_bom_run(root, excel_path)
+    except Exception as error:
+        logger.warning("Part pre-match failed for BOM %s: %s", bom_id, error)
+
+
 def process_bom_run(
     *,
     bom_id: str,
@@ -198,6 +215,8 @@ def process_bom_run(
             encoding="utf-8",
         )
 
+    _prematch_parts(bom_id, root)
+
     if progress_callback:
         progress_callback("saving_results", 90, "분석 결과를 저장하는 중입니다.")
 
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import os
+from contextlib import asynccontextmanager
 from uuid import uuid4
 from pathlib import Path
 from typing import Dict, List, Optional, Any
@@ -30,8 +31,18 @@ from backend.Seuqence_router import router as seuquence_router
 from backend.Lob_router import router as lob_router
 
 from backend.Sub.session_store import get_or_create_sid, refresh_session_state, save_session_state, SESSION_STATE
+from backend.Assembly.db_registry import WorkTimeDbVersionMiddleware
+from backend.warmup import get_readiness, start_background_warmup
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # DB 파싱/임베딩 모델/그래프 인덱스를 첫 요청 전에 백그라운드에서 미리 올린다.
+    start_background_warmup()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(sub_router, prefix="/api")
 app.include_router(assembly_router, prefix="/api")
@@ -41,6 +52,7 @@ app.include_router(lob_router, prefix="/api")
 templates = Jinja2Templates(directory="frontend/template")
 app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
 
+app.add_middleware(WorkTimeDbVersionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=sorted(frontend_origins),  # 프론트 주소
@@ -59,6 +71,14 @@ async def favicon():
     return Response(status_code=204)
 
 
+@app.get("/api/ready")
+def get_ready(response: Response):
+    readiness = get_readiness()
+    if not readiness["ready"]:
+        response.status_code = 503
+    return readiness
+
+
 @app.post("/api/state", response_model=SessionState)
 def set_state(payload: dict, request: Request, response: Response):
     sid = get_or_create_sid(request, response)
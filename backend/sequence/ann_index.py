@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+# =========================
+# 설정
+# =========================
+DEFAULT_ITERATIONS = 8
+# k-means 학습 표본 = 리스트당 이 개수 (전체 행을 쓰지 않아도 중심은 충분히 안정)
+_TRAIN_SAMPLES_PER_LIST = 32
+_ASSIGN_CHUNK_ROWS = 8192
+
+
+def default_list_count(row_count: int) -> int:
+    # IVF 관례: 리스트 수 ≈ sqrt(행 수)
+    return max(1, int(round(math.sqrt(row_count))))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _nearest_centroids(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # 행 구간별로 float32로 올려 내적 최대 중심 배정 (float16/mmap 행렬도 그대로)
+    assignments = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], _ASSIGN_CHUNK_ROWS):
+        block = np.asarray(matrix[start:start + _ASSIGN_CHUNK_ROWS], dtype=np.float32)
+        assignments[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _group_offsets(assignments: np.ndarray, list_count: int) -> np.ndarray:
+    counts = np.bincount(assignments, minlength=list_count)
+    return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+@dataclass
+class IvfIndex:
+    """임베딩 행렬 위의 IVF-flat(역파일) 근사 최근접 색인.
+
+    spherical k-means 중심(coarse quantizer)으로 행을 리스트에 나누고, 벡터를 리스트 순서로 한 벌 더 들고 있다
+    (list_vectors, 행 우선). 검색은 질의와 내적이 큰 중심 nprobe개 리스트의 연속 구간만 점수 계산한다
+    (nprobe ↑ → 재현율 ↑, 지연 ↑).
+    """
+
+    centroids: np.ndarray
+    list_offsets: np.ndarray
+    list_rows: np.ndarray
+    list_vectors: np.ndarray
+
+    @property
+    def list_count(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def row_count(self) -> int:
+        return int(self.list_rows.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        *,
+        lists: int = 0,
+        iterations: int = DEFAULT_ITERATIONS,
+        seed: int = 0,
+    ) -> "IvfIndex":
+        row_count = int(matrix.shape[0])
+        list_count = min(max(lists or default_list_count(row_count), 1), max(row_count, 1))
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(row_count, list_count * _TRAIN_SAMPLES_PER_LIST)
+        sample_rows = np.sort(rng.choice(row_count, size=sample_size, replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        centroids = _normalize_rows(sample[rng.choice(sample_size, size=list_count, replace=False)].copy())
+
+        for _ in range(max(iterations, 0)):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            offsets = _group_offsets(assignments, list_count)
+            filled = np.flatnonzero(offsets[1:] > offsets[:-1])
+            # 빈 리스트는 이전 중심을 그대로 둔다
+            centroids[filled] = np.add.reduceat(sample[order], offsets[filled], axis=0)
+            _normalize_rows(centroids)
+
+        assignments = _nearest_centroids(matrix, centroids)
+        # 안정 정렬이라 리스트 안의 행 번호는 오름차순
+        list_rows = np.argsort(assignments, kind="stable").astype(np.int32)
+        list_vectors = np.empty((row_count, matrix.shape[1]), dtype=matrix.dtype)
+        for start in range(0, row_count, _ASSIGN_CHUNK_ROWS):
+            picked = list_rows[start:start + _ASSIGN_CHUNK_ROWS]
+            list_vectors[start:start + picked.size] = matrix[picked]
+        return cls(
+            centroids=centroids,
+            list_offsets=_group_offsets(assignments, list_count),
+            list_rows=list_rows,
+            list_vectors=list_vectors,
+        )
+
+    def search(self, query: np.ndarray, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """질의와 가까운 nprobe개 리스트의 (행 번호 오름차순, 내적 점수)."""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(max(int(nprobe), 1), self.list_count)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.list_count:
+            probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probed = np.arange(self.list_count)
+
+        row_parts = []
+        score_parts = []
+        for list_id in probed:
+            start, end = int(self.list_offsets[list_id]), int(self.list_offsets[list_id + 1])
+            if end <= start:
+                continue
+            score_parts.append(self.list_vectors[start:end].astype(np.float32, copy=False) @ query)
+            row_parts.append(self.list_rows[start:end])
+
+        if not row_parts:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        rows = np.concatenate(row_parts)
+        order = np.argsort(rows, kind="stable")
+        return rows[order], np.concatenate(score_parts)[order]
+
+    # -----------------------------
+    # 저장 / 읽기
+    # -----------------------------
+    @staticmethod
+    def file_names(prefix: str) -> Tuple[str, str]:
+        # (중심/리스트 구간: 작은 npz, 리스트 순서 벡터: mmap용 npy)
+        return f"{prefix}.ivf.npz", f"{prefix}.ivf.npy"
+
+    def save(self, directory: Path, prefix: str) -> None:
+        lists_file, vectors_file = self.file_names(prefix)
+        np.savez(
+            directory / lists_file,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+        )
+        np.save(directory / vectors_file, self.list_vectors)
+
+    @classmethod
+    def load(cls, directory: Path, prefix: str) -> "IvfIndex":
+        lists_file, vectors_file = cls.file_names(prefix)
+        with np.load(directory / lists_file) as payload:
+            centroids = np.asarray(payload["centroids"], dtype=np.float32)
+            list_offsets = np.asarray(payload["list_offsets"], dtype=np.int64)
+            list_rows = np.asarray(payload["list_rows"], dtype=np.int32)
+        return cls(
+            centroids=centroids,
+            list_offsets=list_offsets,
+            list_rows=list_rows,
+            list_vectors=np.asarray(np.load(directory / vectors_file, mmap_mode="r")),
+        )
@@ -1,20 +1,44 @@
 from __future__ import annotations
 
+import hashlib
+import itertools
 import json
 import logging
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
 
 import numpy as np
-from openpyxl import load_workbook
+
+from backend.Assembly.db_snapshot import get_work_time_db_snapshot
+from backend.Assembly.excel_db import EXCEL_PATH
+from backend.sequence.ann_index import IvfIndex
+from backend.sequence.micro_batcher import MicroBatcher
+from backend.sequence.hashed_embedding import DEFAULT_DIM, HASHED_NGRAM_MODEL, HashedNgramVectorizer
+from backend.text_normalization import normalize_embedding_key as _normalize_key
 
 logger = logging.getLogger(__name__)
 
-EMBEDDING_MODEL = os.getenv("SEQUENCE_EMBEDDING_MODEL", "BAAI/bge-m3").strip() or "BAAI/bge-m3"
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-m3"
+# HuggingFace 모델 이름 또는 "hashed-char-ngram"(모델 다운로드 없는 로컬 CPU 엔진)
+EMBEDDING_MODEL = os.getenv("SEQUENCE_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL).strip() or DEFAULT_EMBEDDING_MODEL
+EMBEDDING_HASH_DIM = int(os.getenv("SEQUENCE_EMBEDDING_HASH_DIM", str(DEFAULT_DIM)))
 EMBEDDING_DEVICE = os.getenv("SEQUENCE_EMBEDDING_DEVICE", "auto").strip().lower() or "auto"
 EMBEDDING_MAX_LENGTH = int(os.getenv("SEQUENCE_EMBEDDING_MAX_LENGTH", "512"))
+# 배치당 토큰 예산: 토큰 수 순으로 정렬해 (배치 문서 수 × 가장 긴 문서 토큰 수) ≤ 예산으로 묶는다
+# 0이면 예전 방식 (입력 순서대로 SEQUENCE_EMBEDDING_BATCH_SIZE개씩)
+EMBEDDING_TOKEN_BUDGET = int(os.getenv("SEQUENCE_EMBEDDING_TOKEN_BUDGET", "8192"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("SEQUENCE_EMBEDDING_BATCH_SIZE", "16"))
+EMBEDDING_MAX_BATCH_DOCS = int(os.getenv("SEQUENCE_EMBEDDING_MAX_BATCH_DOCS", "256"))
+# 빌드용 프로세스 풀 크기 (0, 1이면 현재 프로세스) / 풀 워커당 torch 스레드 수 (0이면 코어 수 ÷ 워커 수)
+EMBEDDING_BUILD_THREADS = int(os.getenv("SEQUENCE_EMBEDDING_BUILD_THREADS", "0"))
+EMBEDDING_BUILD_WORKERS = int(os.getenv("SEQUENCE_EMBEDDING_BUILD_WORKERS", "0"))
 EMBEDDING_SSL_VERIFY = os.getenv("SEQUENCE_EMBEDDING_SSL_VERIFY", "false").strip().lower() not in {
     "0",
     "false",
@@ -33,29 +57,75 @@ os.environ.setdefault("HF_HUB_DISABLE_XET", "1")
 EMBEDDING_DATA_DIR = Path(os.getenv("SEQUENCE_EMBEDDING_DATA_DIR", "backend/sequence/data")).resolve()
 EMBEDDING_DATA_DIR.mkdir(parents=True, exist_ok=True)
 EMBEDDING_INDEX_STEM = os.getenv("SEQUENCE_EMBEDDING_INDEX_STEM", "global_sequence_embedding_index").strip() or "global_sequence_embedding_index"
-EMBEDDING_INDEX_VECTORS_PATH = EMBEDDING_DATA_DIR / f"{EMBEDDING_INDEX_STEM}.npz"
-EMBEDDING_INDEX_META_PATH = EMBEDDING_DATA_DIR / f"{EMBEDDING_INDEX_STEM}.json"
-EXCEL_DB_PATH = Path(os.getenv("SEQUENCE_EMBEDDING_SOURCE_XLSX", "backend/작업시간분석표DB.xlsx")).resolve()
-EMBEDDING_INDEX_VERSION = 3
+# 메타 사이드카(compact JSON)가 이번 빌드의 벡터(.npy, mmap)/엔진 상태 파일 이름을 가리킨다
+EMBEDDING_INDEX_META_PATH = EMBEDDING_DATA_DIR / f"{EMBEDDING_INDEX_STEM}.meta.json"
+# 전역 색인은 한 DB 버전으로만 빌드한다 (기본: db_registry의 "default" 버전 파일).
+# 채팅은 요청이 고른 DB가 이 파일일 때만 임베딩 후보를 쓴다 (embedding_index_serves 참고)
+EXCEL_DB_PATH = Path(os.getenv("SEQUENCE_EMBEDDING_SOURCE_XLSX", str(EXCEL_PATH))).resolve()
+EMBEDDING_INDEX_VERSION = 4
+# 부품/공정 벡터를 한 행렬에 담는 dtype (float16이면 메모리 절반, 점수 계산은 float32로 나눠서)
+EMBEDDING_MATRIX_DTYPE = np.dtype(
+    "float16" if os.getenv("SEQUENCE_EMBEDDING_MATRIX_DTYPE", "float32").strip().lower() == "float16" else "float32"
+)
+_SCORE_CHUNK_ROWS = 8192
+# 질의 벡터의 0이 아닌 차원이 dim / 이 값 이하이면 희소 곱으로 점수 계산
+_SPARSE_QUERY_RATIO = 8
+# 근사 최근접(IVF) 색인: auto = 행 수가 SEQUENCE_EMBEDDING_ANN_MIN_ROWS 이상일 때만 빌드/사용, off = 항상 정확 검색
+EMBEDDING_ANN_MODE = os.getenv("SEQUENCE_EMBEDDING_ANN", "auto").strip().lower() or "auto"
+EMBEDDING_ANN_MIN_ROWS = int(os.getenv("SEQUENCE_EMBEDDING_ANN_MIN_ROWS", "100000"))
+# 리스트 수 (0이면 sqrt(행 수)) / 질의당 탐색 리스트 수 (클수록 재현율 ↑, 지연 ↑)
+EMBEDDING_ANN_LISTS = int(os.getenv("SEQUENCE_EMBEDDING_ANN_LISTS", "0"))
+EMBEDDING_ANN_NPROBE = int(os.getenv("SEQUENCE_EMBEDDING_ANN_NPROBE", "16"))
+# 채팅 질의 임베딩 LRU (같은 메시지 재전송/수정 시 모델 forward 생략)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("SEQUENCE_QUERY_EMBEDDING_CACHE_SIZE", "256"))
+# 동시 채팅 질의 micro-batching: 첫 질의 후 이 시간(ms) 안에 들어온 질의를 모델 forward 한 번으로 (0이면 끔)
+QUERY_EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("SEQUENCE_QUERY_EMBEDDING_BATCH_WINDOW_MS", "5"))
+QUERY_EMBEDDING_BATCH_MAX = int(os.getenv("SEQUENCE_QUERY_EMBEDDING_BATCH_MAX", "32"))
+# 백그라운드 빌드가 실패하면 채팅 요청이 다시 예약하지 않는 시간(초): 연속 실패마다 두 배, 최대 MAX
+# (원본 DB가 바뀌었거나 /admin 재빌드는 바로 다시)
+EMBEDDING_BUILD_RETRY_SECONDS = float(os.getenv("SEQUENCE_EMBEDDING_BUILD_RETRY_SECONDS", "60"))
+EMBEDDING_BUILD_RETRY_MAX_SECONDS = float(os.getenv("SEQUENCE_EMBEDDING_BUILD_RETRY_MAX_SECONDS", "1800"))
+
+_EMPTY_VECTOR_STORE: Tuple[np.ndarray, Dict[str, int]] = (np.empty((0, 0), dtype=np.float32), {})
+# npz 시절 색인 파일 (다음 빌드 때 정리)
+_LEGACY_INDEX_SUFFIXES = (".npz", ".json")
+
+_QUERY_EMBEDDING_CACHE: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+_QUERY_EMBEDDING_LOCK = threading.Lock()
+_QUERY_EMBEDDING_STATS = {"hits": 0, "misses": 0}
+# 채팅 후보(부품/공정 템플릿) 키 색인: 원본 버전(예: DB 내용 해시) 또는 키 필드 내용 digest별 LRU
+MATCH_INDEX_CACHE_SIZE = 8
+_MATCH_INDEX_CACHE: "OrderedDict[Tuple[str, Tuple[Any, ...]], Any]" = OrderedDict()
+_MATCH_INDEX_LOCK = threading.Lock()
+_MATCH_INDEX_STATS = {"hits": 0, "misses": 0}
+# 엔진 인스턴스/상태마다 다른 값 (질의 임베딩 캐시 키가 겹치지 않게)
+_STATE_VERSIONS = itertools.count(1)
+
+# 서비스 중인 색인과 백그라운드 빌드 상태 (Assembly 캐시 재로딩과 같은 방식)
+_GLOBAL_INDEX: Dict[str, Any] = {}
+_INDEX_BUILD_LOCK = threading.Lock()
+_INDEX_BUILD_STATE = {
+    "scheduled": False,
+    "running": False,
+    "reason": None,
+    "lastStartedAt": None,
+    "lastFinishedAt": None,
+    "lastSeconds": None,
+    "lastAction": None,
+    "lastError": None,
+    "lastBuildStats": None,
+    "lastFailedAt": None,
+    "lastFailedSignature": None,
+    "consecutiveFailures": 0,
+    "retryAfter": None,
+}
+_INDEX_BUILD_STATE_LOCK = threading.Lock()
 
 
 def _clean_text(value: Any) -> str:
     return " ".join(str(value or "").split()).strip()
 
 
-def _normalize_key(value: Any) -> str:
-    return (
-        _clean_text(value)
-        .upper()
-        .replace("-", " ")
-        .replace("_", " ")
-        .replace("(", " ")
-        .replace(")", " ")
-        .replace("[", " ")
-        .replace("]", " ")
-    )
-
-
 def _read_value(item: Any, key: str, default: Any = None) -> Any:
     if isinstance(item, dict):
         return item.get(key, default)
@@ -121,67 +191,25 @@ def _is_process_like_part_base(part_base: Any, process_label: Any = None) -> boo
     return any(_normalize_key(keyword) in normalized_part for keyword in process_keywords)
 
 
-def _read_sequence_sheet_headers(ws, header_row: int) -> Dict[str, int]:
-    headers: Dict[str, int] = {}
-    for col in range(1, ws.max_column + 1):
-        value = ws.cell(row=header_row, column=col).value
-        if value is not None and _clean_text(value):
-            headers[_clean_text(value)] = col
-    return headers
-
-
-def _resolve_sequence_sheet_columns(headers: Dict[str, int]) -> Tuple[Optional[int], Optional[int], Optional[int]]:
-    part_col = None
-    process_col = None
-    option_col = None
-    for key, column in headers.items():
-        normalized = key.replace(" ", "")
-        if "부품" in normalized and part_col is None:
-            part_col = column
-        if ("요소작업" in normalized or "공정" in normalized) and process_col is None:
-            process_col = column
-        if "OPTION" in key.upper() and option_col is None:
-            option_col = column
-    return part_col, process_col, option_col
-
-
 def _iter_excel_sequence_rows(excel_path: Path) -> List[Dict[str, str]]:
     if not excel_path.exists():
         return []
-    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    snapshot = get_work_time_db_snapshot(excel_path)
     rows: List[Dict[str, str]] = []
 
-    for worksheet in workbook.worksheets:
-        headers = _read_sequence_sheet_headers(worksheet, 2)
-        part_col, process_col, option_col = _resolve_sequence_sheet_columns(headers)
-        if not part_col:
-            continue
-
-        current_part = ""
-        current_process = ""
-        current_option = ""
-
-        for row in range(3, worksheet.max_row + 1):
-            raw_part = worksheet.cell(row=row, column=part_col).value
-            raw_process = worksheet.cell(row=row, column=process_col).value if process_col else None
-            raw_option = worksheet.cell(row=row, column=option_col).value if option_col else None
-
-            if _clean_text(raw_part):
-                current_part = _clean_text(raw_part)
-            if _clean_text(raw_process):
-                current_process = _clean_text(raw_process)
-            if _clean_text(raw_option):
-                current_option = _clean_text(raw_option)
-
-            if not current_part and not current_process:
+    for sheet_name in snapshot.sheet_names:
+        for item in snapshot.sequence_rows.get(sheet_name, []):
+            part_base = _clean_text(item.get("partBase"))
+            process_label = _clean_text(item.get("processLabel"))
+            if not part_base and not process_label:
                 continue
 
             rows.append(
                 {
-                    "partBase": current_part,
-                    "processLabel": current_process,
-                    "option": current_option,
-                    "sourceSheet": worksheet.title,
+                    "partBase": part_base,
+                    "processLabel": process_label,
+                    "option": _clean_text(item.get("option")),
+                    "sourceSheet": sheet_name,
                 }
             )
 
@@ -236,8 +264,8 @@ def _build_global_embedding_documents(excel_path: Path) -> Dict[str, List[Dict[s
     }
 
 
-@lru_cache(maxsize=1)
-def _load_embedding_model() -> Tuple[Any, Any, Any]:
+@lru_cache(maxsize=2)
+def _load_embedding_model(model_name: str = EMBEDDING_MODEL) -> Tuple[Any, Any, Any]:
     try:
         import torch
         from transformers import AutoModel, AutoTokenizer
@@ -273,8 +301,8 @@ def _load_embedding_model() -> Tuple[Any, Any, Any]:
     if resolved_device == "auto":
         resolved_device = "cpu"
 
-    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
-    model = AutoModel.from_pretrained(EMBEDDING_MODEL)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
     model.to(resolved_device)
     model.eval()
     return tokenizer, model, torch
@@ -285,119 +313,831 @@ def _mean_pool(last_hidden_state: Any, attention_mask: Any) -> Any:
     return (last_hidden_state * input_mask_expanded).sum(1) / input_mask_expanded.sum(1).clamp(min=1e-9)
 
 
-def _embed_texts(texts: Sequence[str]) -> np.ndarray:
-    tokenizer, model, torch = _load_embedding_model()
-    vectors: List[np.ndarray] = []
-    batch_size = int(os.getenv("SEQUENCE_EMBEDDING_BATCH_SIZE", "16"))
+def plan_length_batches(lengths: Sequence[int], token_budget: int, max_batch: int) -> List[np.ndarray]:
+    """
+    길이 버킷 배치: 토큰 수 오름차순으로 정렬한 문서 번호를 (문서 수 × 가장 긴 문서) ≤ token_budget,
+    문서 수 ≤ max_batch인 배치로 자른다 (예산보다 긴 문서는 혼자 한 배치)
+    """
+    order = np.argsort(np.asarray(lengths, dtype=np.int64), kind="stable")
+    batches: List[np.ndarray] = []
+    start = 0
+    for position in range(len(order)):
+        count = position - start + 1
+        if count > 1 and (count > max_batch or count * int(lengths[order[position]]) > token_budget):
+            batches.append(order[start:position])
+            start = position
+    if start < len(order):
+        batches.append(order[start:])
+    return batches
 
-    for start in range(0, len(texts), batch_size):
-        batch = list(texts[start : start + batch_size])
-        encoded = tokenizer(
-            batch,
-            padding=True,
-            truncation=True,
-            max_length=EMBEDDING_MAX_LENGTH,
-            return_tensors="pt",
-        )
-        target_device = next(model.parameters()).device
-        encoded = {key: value.to(target_device) for key, value in encoded.items()}
-        with torch.inference_mode():
-            output = model(**encoded)
-            pooled = _mean_pool(output.last_hidden_state, encoded["attention_mask"])
-            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
-        vectors.append(pooled.cpu().numpy())
 
-    if not vectors:
-        return np.empty((0, 0), dtype=np.float32)
-    return np.vstack(vectors).astype(np.float32)
+def _forward_batch(tokenizer: Any, model: Any, torch: Any, features: Dict[str, List[Any]]) -> np.ndarray:
+    # 이미 토큰화된 배치를 배치 안 최대 길이로만 패딩해서 forward → mean pooling + L2 정규화
+    encoded = tokenizer.pad(features, padding=True, return_tensors="pt")
+    target_device = next(model.parameters()).device
+    encoded = {key: value.to(target_device) for key, value in encoded.items()}
+    with torch.inference_mode():
+        output = model(**encoded)
+        pooled = _mean_pool(output.last_hidden_state, encoded["attention_mask"])
+        pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+    return pooled.cpu().numpy().astype(np.float32)
+
+
+# 빌드 프로세스 풀 워커 (spawn으로 뜬 프로세스마다 모델 한 벌)
+# torch 스레드 수는 프로세스 전역이라 여기(워커)서만 바꾸고, 서빙 프로세스에서는 건드리지 않는다
+_WORKER_BACKEND: Optional["TransformerEmbeddingBackend"] = None
+
+
+def _init_embedding_worker(model_name: str, threads: int) -> None:
+    global _WORKER_BACKEND
+
+    _, _, torch = _load_embedding_model(model_name)
+    if threads > 0:
+        torch.set_num_threads(threads)
+    _WORKER_BACKEND = TransformerEmbeddingBackend(model_name)
+
+
+def _embed_worker_chunk(texts: List[str]) -> np.ndarray:
+    return _WORKER_BACKEND.embed(texts)
+
+
+# =========================
+# 임베딩 백엔드
+# =========================
+class EmbeddingIndexNotReady(RuntimeError):
+    """색인 빌드가 아직 끝나지 않아 임베딩 검색을 할 수 없음 (채팅은 휴리스틱 경로로)."""
+
+
+class EmbeddingBackend:
+    """임베딩 엔진 인터페이스.
+
+    색인 파일 형식(mmap .npy 벡터 + json 메타)과 랭킹은 엔진과 무관하게 같고,
+    엔진이 학습한 통계(예: IDF)는 get_state()로 상태 파일(.state.npz)에 함께 저장된다.
+    """
+
+    name: str = ""
+    # 문서 벡터가 색인 전체(예: IDF)에 따라 달라지는 엔진이면 True → 엔진 상태가 같을 때만 벡터 재사용
+    vectors_depend_on_corpus: bool = False
+    # 밀집 벡터 엔진만 IVF 근사 색인 사용 (희소 벡터는 정확 검색도 0이 아닌 열만 읽어 충분히 빠름)
+    dense_vectors: bool = True
+    # 동시 질의를 micro-batch로 묶을지 (질의 하나가 1ms 미만인 엔진은 기다리는 시간만 늘어난다)
+    batch_queries: bool = True
+
+    def warm(self) -> None:
+        return None
+
+    def fit(self, texts: Sequence[str]) -> None:
+        # 색인 문서로 통계를 학습하는 엔진만 구현
+        return None
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        # 색인 빌드용 대량 임베딩 (엔진별로 스레드/프로세스 풀 사용)
+        return self.embed(texts)
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def set_state(self, state: Dict[str, np.ndarray]) -> None:
+        return None
+
+    @property
+    def vector_dim(self) -> Optional[int]:
+        # 임베딩하지 않고 알 수 있는 벡터 차원 (모르면 None)
+        return None
+
+    @property
+    def cache_token(self) -> str:
+        # 질의 임베딩 캐시 키 (엔진 상태가 바뀌면 달라져야 함)
+        return self.name
+
+
+class TransformerEmbeddingBackend(EmbeddingBackend):
+    """transformers/torch 문장 임베딩 (기본 BAAI/bge-m3, mean pooling + L2 정규화)."""
+
+    def __init__(self, model_name: str):
+        self.name = model_name
+
+    def warm(self) -> None:
+        _load_embedding_model(self.name)
+
+    @property
+    def vector_dim(self) -> Optional[int]:
+        # mean pooling이라 은닉 크기가 곧 벡터 차원
+        _, model, _ = _load_embedding_model(self.name)
+        hidden_size = getattr(model.config, "hidden_size", None)
+        return int(hidden_size) if hidden_size else None
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        전체를 한 번 토큰화(패딩 없이)한 뒤 길이 버킷 배치로 forward하고 원래 순서로 되돌린다
+        - 짧은 "PART | X | sheet"와 긴 공정 문자열이 섞여도 패딩 낭비가 배치 안 길이 차이 정도로 준다
+        """
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        tokenizer, model, torch = _load_embedding_model(self.name)
+        encoded = tokenizer(texts, padding=False, truncation=True, max_length=EMBEDDING_MAX_LENGTH)
+        if EMBEDDING_TOKEN_BUDGET > 0:
+            lengths = [len(ids) for ids in encoded["input_ids"]]
+            batches = plan_length_batches(lengths, EMBEDDING_TOKEN_BUDGET, EMBEDDING_MAX_BATCH_DOCS)
+        else:
+            batch_size = max(EMBEDDING_BATCH_SIZE, 1)
+            batches = [np.arange(start, min(start + batch_size, len(texts))) for start in range(0, len(texts), batch_size)]
+
+        vectors: Optional[np.ndarray] = None
+        for rows in batches:
+            features = {key: [values[int(row)] for row in rows] for key, values in encoded.items()}
+            pooled = _forward_batch(tokenizer, model, torch, features)
+            if vectors is None:
+                vectors = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            vectors[rows] = pooled
+        return vectors
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        색인 빌드: SEQUENCE_EMBEDDING_BUILD_WORKERS > 1이면 워커마다 SEQUENCE_EMBEDDING_BUILD_THREADS개
+        torch 스레드를 쓰는 프로세스 풀, 아니면 현재 프로세스에서 (스레드 수는 서빙 설정 그대로)
+        """
+        texts = list(texts)
+        workers = EMBEDDING_BUILD_WORKERS
+        if workers <= 1 or len(texts) < workers * EMBEDDING_MAX_BATCH_DOCS:
+            return self.embed(texts)
+
+        # 글자 수로 대강 정렬해 길이가 비슷한 문서끼리 작업 단위로 묶고, 워커 안에서 토큰 길이 버킷으로 다시 나눈다
+        order = np.argsort(np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts)), kind="stable")
+        chunks = np.array_split(order, workers * 4)
+        threads = EMBEDDING_BUILD_THREADS or max(1, (os.cpu_count() or 1) // workers)
+        import multiprocessing
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_embedding_worker,
+            initargs=(self.name, threads),
+        ) as pool:
+            results = list(pool.map(_embed_worker_chunk, [[texts[int(row)] for row in chunk] for chunk in chunks]))
+
+        vectors = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        for chunk, result in zip(chunks, results):
+            vectors[chunk] = result
+        return vectors
+
+
+class HashedNgramEmbeddingBackend(EmbeddingBackend):
+    """해시된 문자 n-gram TF-IDF. 모델 다운로드 없이 CPU에서 바로 동작."""
+
+    vectors_depend_on_corpus = True
+    dense_vectors = False
+    batch_queries = False
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.name = HASHED_NGRAM_MODEL
+        self.vectorizer = HashedNgramVectorizer(dim=dim)
+        self._state_version = 0
+
+    def fit(self, texts: Sequence[str]) -> None:
+        self.vectorizer.fit(list(texts))
+        self._state_version = next(_STATE_VERSIONS)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.vectorizer.transform(list(texts))
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {"idf": self.vectorizer.idf} if self.vectorizer.idf is not None else {}
+
+    def set_state(self, state: Dict[str, np.ndarray]) -> None:
+        idf = state.get("idf")
+        self.vectorizer.idf = np.asarray(idf, dtype=np.float32) if idf is not None else None
+        self._state_version = next(_STATE_VERSIONS)
+
+    @property
+    def vector_dim(self) -> Optional[int]:
+        return self.vectorizer.dim
+
+    @property
+    def cache_token(self) -> str:
+        return f"{self.name}:{self.vectorizer.dim}:{self._state_version}"
+
+
+def create_embedding_backend(model_name: str) -> EmbeddingBackend:
+    if model_name == HASHED_NGRAM_MODEL:
+        return HashedNgramEmbeddingBackend(dim=EMBEDDING_HASH_DIM)
+    return TransformerEmbeddingBackend(model_name)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_backend() -> EmbeddingBackend:
+    return create_embedding_backend(EMBEDDING_MODEL)
+
+
+def _embed_texts(texts: Sequence[str], backend: Optional[EmbeddingBackend] = None) -> np.ndarray:
+    return (backend or get_embedding_backend()).embed(texts)
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _states_equal(left: Dict[str, np.ndarray], right: Dict[str, np.ndarray]) -> bool:
+    return left.keys() == right.keys() and all(np.array_equal(left[key], right[key]) for key in left)
+
+
+def _read_index_files(meta_path: Path, backend: EmbeddingBackend) -> Optional[Dict[str, Any]]:
+    """
+    메타 사이드카 + 벡터(.npy, 읽기 전용 mmap) + 엔진 상태 읽기
+    - 같은 색인 버전/엔진으로 만든 색인이 아니거나 파일이 없으면 None
+    - 벡터는 페이지 캐시를 통해 워커 프로세스끼리 공유되고 실제로 읽는 부분만 메모리에 올라온다
+    """
+    if not meta_path.exists():
+        return None
+    metadata = json.loads(meta_path.read_text(encoding="utf-8"))
+    if int(metadata.get("indexVersion") or 0) != EMBEDDING_INDEX_VERSION:
+        return None
+    # 다른 엔진으로 만든 색인은 벡터 공간이 달라 다시 빌드
+    if str(metadata.get("embeddingModel") or DEFAULT_EMBEDDING_MODEL) != backend.name:
+        return None
+
+    vectors_path = meta_path.parent / str(metadata.get("vectorsFile") or "")
+    if not metadata.get("vectorsFile") or not vectors_path.exists():
+        return None
+    row_count = len(metadata.get("parts") or []) + len(metadata.get("processes") or [])
+    # 빈 배열은 mmap할 수 없어 그냥 읽는다
+    matrix = np.asarray(np.load(vectors_path, mmap_mode="r" if row_count and metadata.get("dim") else None))
+    if matrix.ndim != 2 or matrix.shape[0] != row_count:
+        return None
+
+    state: Dict[str, np.ndarray] = {}
+    if metadata.get("stateFile"):
+        with np.load(meta_path.parent / str(metadata["stateFile"])) as payload:
+            state = {key: payload[key] for key in payload.files}
+
+    ann: Optional[IvfIndex] = None
+    if metadata.get("annPrefix") and _ann_enabled(row_count, backend):
+        ann = IvfIndex.load(meta_path.parent, str(metadata["annPrefix"]))
+        if ann.row_count != row_count:
+            ann = None
+    return {"metadata": metadata, "matrix": matrix, "state": state, "ann": ann}
+
+
+def _load_vector_store(meta_path: Path, backend: EmbeddingBackend) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    기존 색인 파일의 (벡터 행렬, {문서 텍스트 해시: 행 번호})
+    - 같은 색인 버전/엔진/행렬 dtype으로 만든 색인만 (엔진이 색인 전체로 학습하면 엔진 상태도 같아야 함)
+    - 없거나 읽을 수 없으면 빈 store
+    """
+    try:
+        previous = _read_index_files(meta_path, backend)
+        if previous is None or previous["matrix"].dtype != EMBEDDING_MATRIX_DTYPE:
+            return _EMPTY_VECTOR_STORE
+        if backend.vectors_depend_on_corpus and not _states_equal(previous["state"], backend.get_state()):
+            return _EMPTY_VECTOR_STORE
+
+        metadata = previous["metadata"]
+        documents = list(metadata.get("parts") or []) + list(metadata.get("processes") or [])
+        row_by_hash = {_text_hash(str(document.get("text") or "")): row for row, document in enumerate(documents)}
+        return previous["matrix"], row_by_hash
+    except Exception as exc:
+        logger.warning("Failed to read previous embedding index for reuse: %s", exc)
+        return _EMPTY_VECTOR_STORE
+
+
+def _embed_with_store(
+    texts: List[str],
+    store: Tuple[np.ndarray, Dict[str, int]],
+    backend: EmbeddingBackend,
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    텍스트 해시로 store의 벡터 행을 재사용하고 새 텍스트(중복 제거)만 임베딩
+    - 차원이 달라졌으면(모델 설정 변경) 재사용하지 않는다. 텍스트마다 임베딩은 한 번만.
+    """
+    matrix, row_by_hash = store
+    hashes = [_text_hash(text) for text in texts]
+    text_by_hash = dict(zip(hashes, texts))
+    missing = [text_hash for text_hash in text_by_hash if text_hash not in row_by_hash]
+    # 전부 재사용이면 모델을 올리지 않도록 새 텍스트가 있을 때만 차원 확인
+    if missing and row_by_hash and backend.vector_dim not in (None, matrix.shape[1]):
+        matrix, row_by_hash = _EMPTY_VECTOR_STORE
+        missing = list(text_by_hash)
+    reused = sum(1 for text_hash in hashes if text_hash in row_by_hash)
+
+    if missing:
+        computed = backend.embed_documents([text_by_hash[text_hash] for text_hash in missing])
+        if row_by_hash and matrix.shape[1] != computed.shape[1]:
+            # 차원을 미리 알 수 없는 엔진: 재사용하려던 텍스트만 마저 임베딩
+            stale = [text_hash for text_hash in text_by_hash if text_hash in row_by_hash]
+            computed = np.concatenate(
+                [computed, backend.embed_documents([text_by_hash[text_hash] for text_hash in stale])],
+                axis=0,
+            )
+            missing, row_by_hash, reused = missing + stale, {}, 0
+        if row_by_hash:
+            row_by_hash = {**row_by_hash, **{text_hash: matrix.shape[0] + i for i, text_hash in enumerate(missing)}}
+            matrix = np.concatenate([np.asarray(matrix, dtype=np.float32), computed], axis=0)
+        else:
+            row_by_hash = {text_hash: i for i, text_hash in enumerate(missing)}
+            matrix = computed
+
+    stats = {"documents": len(texts), "reused": reused, "computed": len(missing)}
+    if not hashes:
+        return np.empty((0, 0), dtype=np.float32), stats
+    rows = np.fromiter((row_by_hash[text_hash] for text_hash in hashes), dtype=np.intp, count=len(hashes))
+    return np.asarray(matrix[rows], dtype=np.float32), stats
+
+
+def _ann_enabled(row_count: int, backend: EmbeddingBackend) -> bool:
+    # 임계값 미만의 색인은 정확 검색이 충분히 빠르고 재현율 손실도 없다
+    return EMBEDDING_ANN_MODE != "off" and backend.dense_vectors and row_count >= max(EMBEDDING_ANN_MIN_ROWS, 1)
+
+
+def _remove_stale_index_files(meta_path: Path, keep: Sequence[str]) -> None:
+    # 이전 빌드의 벡터/상태 파일 정리 (다른 워커가 아직 mmap 중이라 지울 수 없으면 다음 빌드 때 다시)
+    candidates = list(meta_path.parent.glob(f"{EMBEDDING_INDEX_STEM}.*.vectors.npy"))
+    candidates += list(meta_path.parent.glob(f"{EMBEDDING_INDEX_STEM}.*.state.npz"))
+    candidates += list(meta_path.parent.glob(f"{EMBEDDING_INDEX_STEM}.*.ivf.npz"))
+    candidates += list(meta_path.parent.glob(f"{EMBEDDING_INDEX_STEM}.*.ivf.npy"))
+    candidates += [meta_path.parent / f"{EMBEDDING_INDEX_STEM}{suffix}" for suffix in _LEGACY_INDEX_SUFFIXES]
+    for path in candidates:
+        if path.name in keep or not path.exists():
+            continue
+        try:
+            path.unlink()
+        except OSError as exc:
+            logger.info("Stale embedding index file not removed yet: %s (%s)", path, exc)
 
 
 def build_and_save_global_embedding_index(
     *,
     excel_path: Optional[Path] = None,
-    vectors_path: Optional[Path] = None,
     meta_path: Optional[Path] = None,
+    backend: Optional[EmbeddingBackend] = None,
 ) -> Dict[str, Any]:
+    """
+    색인 빌드 (문서 텍스트 해시 기준 증분)
+    - 이전 색인에 같은 텍스트의 벡터가 있으면 재사용, 새로 생기거나 바뀐 문서만 임베딩
+    - 재사용/재계산 수는 buildStats로 반환하고 메타에도 기록
+    - 벡터/상태 파일은 빌드마다 새 이름으로 쓰고 메타를 마지막에 교체 (읽는 쪽은 항상 완성된 한 벌만 본다)
+    - 엔진은 색인마다 새 인스턴스 (빌드 중에도 서비스 중인 이전 색인의 엔진 상태는 그대로)
+    """
     resolved_excel_path = (excel_path or EXCEL_DB_PATH).resolve()
-    resolved_vectors_path = (vectors_path or EMBEDDING_INDEX_VECTORS_PATH).resolve()
     resolved_meta_path = (meta_path or EMBEDDING_INDEX_META_PATH).resolve()
 
+    started = time.perf_counter()
     documents = _build_global_embedding_documents(resolved_excel_path)
     part_texts = [str(item.get("text") or "") for item in documents["parts"]]
     process_texts = [str(item.get("text") or "") for item in documents["processes"]]
-    part_vectors = _embed_texts(part_texts) if part_texts else np.empty((0, 0), dtype=np.float32)
-    process_vectors = _embed_texts(process_texts) if process_texts else np.empty((0, 0), dtype=np.float32)
+    backend = backend or create_embedding_backend(EMBEDDING_MODEL)
+    backend.fit(part_texts + process_texts)
 
-    resolved_vectors_path.parent.mkdir(parents=True, exist_ok=True)
-    resolved_meta_path.parent.mkdir(parents=True, exist_ok=True)
-    np.savez_compressed(
-        resolved_vectors_path,
-        part_vectors=part_vectors,
-        process_vectors=process_vectors,
+    store = _load_vector_store(resolved_meta_path, backend)
+    vectors, build_stats = _embed_with_store(part_texts + process_texts, store, backend)
+    index = _fuse_index_vectors({
+        "parts": documents["parts"],
+        "processes": documents["processes"],
+        "part_vectors": vectors[: len(part_texts)] if part_texts else np.empty((0, 0), dtype=np.float32),
+        "process_vectors": vectors[len(part_texts):] if process_texts else np.empty((0, 0), dtype=np.float32),
+    })
+    build_stats["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Embedding index built: documents=%s reused=%s computed=%s seconds=%s",
+        build_stats["documents"],
+        build_stats["reused"],
+        build_stats["computed"],
+        build_stats["seconds"],
     )
-    resolved_meta_path.write_text(
+
+    build_id = f"{time.time_ns():x}{os.getpid():x}"
+    vectors_file = f"{EMBEDDING_INDEX_STEM}.{build_id}.vectors.npy"
+    state = backend.get_state()
+    state_file = f"{EMBEDDING_INDEX_STEM}.{build_id}.state.npz" if state else None
+
+    resolved_meta_path.parent.mkdir(parents=True, exist_ok=True)
+    # 열 우선 행렬 그대로 저장 → mmap으로 열어도 같은 배치
+    np.save(resolved_meta_path.parent / vectors_file, index["vectors"])
+    if state_file:
+        np.savez(resolved_meta_path.parent / state_file, **state)
+    ann_prefix = None
+    if _ann_enabled(index["vectors"].shape[0], backend):
+        ann_started = time.perf_counter()
+        index["ann"] = IvfIndex.build(index["vectors"], lists=EMBEDDING_ANN_LISTS)
+        ann_prefix = f"{EMBEDDING_INDEX_STEM}.{build_id}"
+        index["ann"].save(resolved_meta_path.parent, ann_prefix)
+        build_stats["annLists"] = index["ann"].list_count
+        build_stats["annSeconds"] = round(time.perf_counter() - ann_started, 3)
+
+    temp_meta_path = resolved_meta_path.with_name(f"{resolved_meta_path.name}.{os.getpid()}.tmp")
+    temp_meta_path.write_text(
         json.dumps(
             {
                 "indexVersion": EMBEDDING_INDEX_VERSION,
+                "embeddingModel": backend.name,
                 "sourceExcelPath": str(resolved_excel_path),
                 "sourceExcelMtime": resolved_excel_path.stat().st_mtime if resolved_excel_path.exists() else 0.0,
+                "vectorsFile": vectors_file,
+                "stateFile": state_file,
+                "annPrefix": ann_prefix,
+                "dim": int(index["vectors"].shape[1]),
+                "dtype": str(index["vectors"].dtype),
+                "buildStats": build_stats,
                 "parts": documents["parts"],
                 "processes": documents["processes"],
             },
             ensure_ascii=False,
-            indent=2,
+            separators=(",", ":"),
         ),
         encoding="utf-8",
     )
+    os.replace(temp_meta_path, resolved_meta_path)
+    _remove_stale_index_files(resolved_meta_path, keep=[vectors_file, state_file or "", *(IvfIndex.file_names(ann_prefix) if ann_prefix else ())])
+
+    if index["vectors"].size:
+        # 방금 쓴 파일을 mmap으로 다시 열어 빌드한 프로세스도 다른 워커와 페이지 캐시를 공유
+        mapped = np.asarray(np.load(resolved_meta_path.parent / vectors_file, mmap_mode="r"))
+        ann = IvfIndex.load(resolved_meta_path.parent, ann_prefix) if ann_prefix else None
+        index = {**_index_from_matrix(index["parts"], index["processes"], mapped), "ann": ann}
+    return {**index, "backend": backend, "buildStats": build_stats}
+
+
+def _fuse_index_vectors(index: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    부품/공정 벡터를 한 연속 행렬(vectors)로 합치고 종류별 행 구간(offsets)을 기록
+    - 열 우선(Fortran) 배치: 밀집 질의의 행렬 곱은 그대로, 희소 질의는 필요한 열만 연속으로 읽는다
+    """
+    blocks = [
+        np.asarray(index.get("part_vectors")),
+        np.asarray(index.get("process_vectors")),
+    ]
+    dim = next((block.shape[1] for block in blocks if block.ndim == 2 and block.size), 0)
+    matrix = np.concatenate(
+        [
+            block.astype(EMBEDDING_MATRIX_DTYPE, copy=False) if block.size else np.empty((0, dim), EMBEDDING_MATRIX_DTYPE)
+            for block in blocks
+        ],
+        axis=0,
+    )
+    return _index_from_matrix(index.get("parts") or [], index.get("processes") or [], np.asfortranarray(matrix))
+
 
+def _index_from_matrix(parts: List[Dict[str, Any]], processes: List[Dict[str, Any]], matrix: np.ndarray) -> Dict[str, Any]:
+    # 행렬 = 부품 행 + 공정 행. part_vectors / process_vectors는 그 행렬의 구간 뷰 (메모리 한 벌)
+    offsets = {"parts": (0, len(parts)), "processes": (len(parts), len(parts) + len(processes))}
     return {
-        "parts": documents["parts"],
-        "processes": documents["processes"],
-        "part_vectors": part_vectors,
-        "process_vectors": process_vectors,
+        "parts": list(parts),
+        "processes": list(processes),
+        "vectors": matrix,
+        "offsets": offsets,
+        "part_vectors": matrix[slice(*offsets["parts"])],
+        "process_vectors": matrix[slice(*offsets["processes"])],
     }
 
 
-@lru_cache(maxsize=1)
+def _source_signature() -> Optional[Tuple[float, int]]:
+    try:
+        stat = EXCEL_DB_PATH.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def _load_saved_global_embedding_index() -> Optional[Dict[str, Any]]:
+    """저장된 색인이 원본 DB보다 새롭고 같은 버전/엔진이면 mmap으로 열기 (아니면 None → 빌드)."""
+    if not EMBEDDING_INDEX_META_PATH.exists():
+        return None
+    if EXCEL_DB_PATH.exists() and EMBEDDING_INDEX_META_PATH.stat().st_mtime < EXCEL_DB_PATH.stat().st_mtime:
+        return None
+
+    backend = create_embedding_backend(EMBEDDING_MODEL)
+    try:
+        loaded = _read_index_files(EMBEDDING_INDEX_META_PATH, backend)
+    except Exception as exc:
+        logger.warning("Failed to load embedding index, rebuilding: %s", exc)
+        loaded = None
+    if loaded is None:
+        return None
+
+    backend.set_state(loaded["state"])
+    matrix = loaded["matrix"]
+    if matrix.dtype != EMBEDDING_MATRIX_DTYPE:
+        # 설정한 dtype과 다르게 저장된 색인은 변환 (이 프로세스 전용 사본)
+        matrix = np.asfortranarray(matrix.astype(EMBEDDING_MATRIX_DTYPE))
+    metadata = loaded["metadata"]
+    return {
+        **_index_from_matrix(metadata.get("parts") or [], metadata.get("processes") or [], matrix),
+        "ann": loaded["ann"],
+        "backend": backend,
+    }
+
+
+def _index_is_fresh(index: Dict[str, Any]) -> bool:
+    return bool(index) and index.get("signature") == _source_signature()
+
+
+def _refresh_global_embedding_index(reason: str, force: bool = False) -> Dict[str, Any]:
+    """
+    저장된 색인을 열거나(force면 생략) 새로 빌드해서 서비스 색인으로 교체 (_INDEX_BUILD_LOCK 안에서 호출)
+    - 서명은 시작 전에 잡는다: 빌드 중에 DB가 또 바뀌면 다음 확인에서 다시 빌드
+    """
+    global _GLOBAL_INDEX
+
+    signature = _source_signature()
+    started = time.perf_counter()
+    action, error = "failed", None
+    with _INDEX_BUILD_STATE_LOCK:
+        _INDEX_BUILD_STATE.update(running=True, reason=reason, lastStartedAt=time.time())
+    try:
+        index = None if force else _load_saved_global_embedding_index()
+        action = "loaded"
+        if index is None:
+            index = build_and_save_global_embedding_index()
+            action = "built"
+        _GLOBAL_INDEX = {**index, "signature": signature, "readyAt": time.time()}
+        error = None
+    except Exception as exc:
+        action, error = "failed", str(getattr(exc, "detail", None) or exc)
+        logger.warning("Embedding index build failed (%s): %s", reason, error)
+        raise
+    finally:
+        finished_at = time.time()
+        with _INDEX_BUILD_STATE_LOCK:
+            _INDEX_BUILD_STATE.update(
+                running=False,
+                lastFinishedAt=finished_at,
+                lastSeconds=round(time.perf_counter() - started, 3),
+                lastAction=action,
+                lastError=error,
+                lastBuildStats=_GLOBAL_INDEX.get("buildStats") if action == "built" else None,
+            )
+            if action == "failed":
+                failures = _INDEX_BUILD_STATE["consecutiveFailures"] + 1
+                backoff = min(EMBEDDING_BUILD_RETRY_SECONDS * 2 ** (failures - 1), EMBEDDING_BUILD_RETRY_MAX_SECONDS)
+                _INDEX_BUILD_STATE.update(
+                    lastFailedAt=finished_at,
+                    lastFailedSignature=signature,
+                    consecutiveFailures=failures,
+                    retryAfter=finished_at + max(backoff, 0.0),
+                )
+            else:
+                _INDEX_BUILD_STATE.update(consecutiveFailures=0, retryAfter=None)
+    return _GLOBAL_INDEX
+
+
+def _in_build_backoff() -> bool:
+    # 같은 원본으로 최근에 실패했으면 채팅 경로의 자동 재빌드를 잠시 멈춘다 (실패 → 재빌드 루프 방지)
+    with _INDEX_BUILD_STATE_LOCK:
+        retry_after = _INDEX_BUILD_STATE.get("retryAfter")
+        failed_signature = _INDEX_BUILD_STATE.get("lastFailedSignature")
+    if retry_after is None or time.time() >= retry_after:
+        return False
+    return failed_signature == _source_signature()
+
+
+def _run_background_index_build(reason: str, force: bool) -> None:
+    try:
+        with _INDEX_BUILD_LOCK:
+            # 기다리는 동안 다른 빌드(워밍업 등)가 이미 최신 색인을 올렸으면 생략
+            if force or not _index_is_fresh(_GLOBAL_INDEX):
+                _refresh_global_embedding_index(reason, force=force)
+    except Exception:
+        # 빌드 실패 자체는 _refresh_global_embedding_index가 로그/상태(retryAfter)로 남긴다
+        with _INDEX_BUILD_STATE_LOCK:
+            retry_after = _INDEX_BUILD_STATE.get("retryAfter")
+        logger.info(
+            "Background embedding index build (%s) failed; automatic retry after %s",
+            reason,
+            time.strftime("%H:%M:%S", time.localtime(retry_after)) if retry_after else "next request",
+        )
+    finally:
+        with _INDEX_BUILD_STATE_LOCK:
+            _INDEX_BUILD_STATE["scheduled"] = False
+
+
+def schedule_global_embedding_index_build(reason: str = "manual", *, force: bool = False) -> bool:
+    """
+    백그라운드 색인 빌드 예약 (single-flight: 이미 예약/진행 중이면 False)
+    - force: 저장된 색인이 최신이어도 다시 빌드 (증분이라 바뀐 문서만 임베딩)
+    """
+    with _INDEX_BUILD_STATE_LOCK:
+        if _INDEX_BUILD_STATE.get("scheduled"):
+            return False
+        _INDEX_BUILD_STATE["scheduled"] = True
+    threading.Thread(
+        target=_run_background_index_build,
+        args=(reason, force),
+        name="embedding-index-build",
+        daemon=True,
+    ).start()
+    return True
+
+
+def get_global_embedding_index() -> Optional[Dict[str, Any]]:
+    """
+    채팅 요청용: 절대 빌드를 기다리지 않는다
+    - 색인이 없거나 DB가 바뀌었으면 백그라운드 빌드를 예약하고, 그동안은 이전 색인(없으면 None)을 쓴다
+    - 최근 빌드가 실패했으면 retryAfter까지는 다시 예약하지 않는다 (/admin 재빌드는 예외)
+    """
+    index = _GLOBAL_INDEX
+    if not _index_is_fresh(index) and not _in_build_backoff():
+        schedule_global_embedding_index_build("missing" if not index else "stale")
+    return index or None
+
+
 def load_or_build_global_embedding_index() -> Dict[str, Any]:
-    if (
-        not EMBEDDING_INDEX_VECTORS_PATH.exists()
-        or not EMBEDDING_INDEX_META_PATH.exists()
-        or (EXCEL_DB_PATH.exists() and EMBEDDING_INDEX_META_PATH.stat().st_mtime < EXCEL_DB_PATH.stat().st_mtime)
-    ):
-        return build_and_save_global_embedding_index()
-
-    metadata = json.loads(EMBEDDING_INDEX_META_PATH.read_text(encoding="utf-8"))
-    if int(metadata.get("indexVersion") or 0) != EMBEDDING_INDEX_VERSION:
-        return build_and_save_global_embedding_index()
-    vectors_payload = np.load(EMBEDDING_INDEX_VECTORS_PATH)
+    """
+    동기 버전 (워밍업/벤치마크): 최신 색인이 없으면 열기/빌드가 끝날 때까지 기다린다
+    - 진행 중인 빌드가 있으면 같은 락에서 기다렸다가 그 결과를 받는다 (중복 빌드 없음)
+    """
+    index = _GLOBAL_INDEX
+    if _index_is_fresh(index):
+        return index
+    with _INDEX_BUILD_LOCK:
+        if _index_is_fresh(_GLOBAL_INDEX):
+            return _GLOBAL_INDEX
+        return _refresh_global_embedding_index("sync")
+
+
+def embedding_index_serves(excel_path: Path) -> bool:
+    """전역 색인이 이 DB 파일로 빌드되는지 (다른 DB 버전을 고른 요청은 색인 후보를 쓰지 않는다)."""
+    return Path(excel_path).resolve() == EXCEL_DB_PATH
+
+
+def get_embedding_index_status() -> Dict[str, Any]:
+    index = _GLOBAL_INDEX
+    with _INDEX_BUILD_STATE_LOCK:
+        build_state = dict(_INDEX_BUILD_STATE)
+    signature = index.get("signature") or (None, None)
+    ann: Optional[IvfIndex] = index.get("ann")
+    backend: Optional[EmbeddingBackend] = index.get("backend")
     return {
-        "parts": list(metadata.get("parts") or []),
-        "processes": list(metadata.get("processes") or []),
-        "part_vectors": np.asarray(vectors_payload["part_vectors"], dtype=np.float32),
-        "process_vectors": np.asarray(vectors_payload["process_vectors"], dtype=np.float32),
+        "ready": bool(index),
+        "stale": bool(index) and not _index_is_fresh(index),
+        "embeddingModel": backend.name if backend else EMBEDDING_MODEL,
+        "parts": len(index.get("parts") or []),
+        "processes": len(index.get("processes") or []),
+        "ann": {"lists": ann.list_count, "nprobe": EMBEDDING_ANN_NPROBE} if ann is not None else None,
+        "sourceExcelPath": str(EXCEL_DB_PATH),
+        "sourceMtime": signature[0],
+        "readyAt": index.get("readyAt"),
+        "build": build_state,
+        "queryEmbedding": {
+            "cache": get_query_embedding_cache_stats(),
+            "batcher": get_query_embedding_batcher_stats(),
+        },
+        "matchIndex": get_match_index_cache_stats(),
     }
 
 
-def _rank_global_vectors(query: str, vectors: np.ndarray, metadata: List[Dict[str, Any]], *, limit: int) -> List[Dict[str, Any]]:
-    if not query or vectors.size == 0 or not metadata:
-        return []
+def _embed_query_batch(backend: EmbeddingBackend, texts: List[str]) -> List[Optional[np.ndarray]]:
+    # 같은 창에 들어온 질의 (같은 문장은 한 번만)
+    unique_texts = list(dict.fromkeys(texts))
+    matrix = _embed_texts(unique_texts, backend)
+    if matrix.shape[0] != len(unique_texts):
+        return [None] * len(texts)
+    row_by_text = {text: row for row, text in enumerate(unique_texts)}
+    return [np.array(matrix[row_by_text[text]]) for text in texts]
+
+
+_QUERY_BATCHER = MicroBatcher(
+    _embed_query_batch,
+    window_ms=QUERY_EMBEDDING_BATCH_WINDOW_MS,
+    max_batch=QUERY_EMBEDDING_BATCH_MAX,
+    name="query-embedding-batcher",
+)
+
+
+def embed_query(message: str, backend: Optional[EmbeddingBackend] = None) -> Optional[np.ndarray]:
+    """
+    채팅 메시지(공백 정리) 임베딩 1개. (엔진 상태, 메시지) 키로 LRU 캐시
+    - backend: 색인과 함께 만든 엔진 (없으면 기본 엔진)
+    - 캐시 미스는 micro-batcher로 (동시에 들어온 다른 채팅 질의와 한 번에 forward)
+    - 반환 벡터는 캐시와 공유하므로 읽기 전용
+    """
+    text = _clean_text(message)
+    if not text:
+        return None
+
+    backend = backend or get_embedding_backend()
+    key = (backend.cache_token, text)
+    with _QUERY_EMBEDDING_LOCK:
+        cached = _QUERY_EMBEDDING_CACHE.get(key)
+        if cached is not None:
+            _QUERY_EMBEDDING_CACHE.move_to_end(key)
+            _QUERY_EMBEDDING_STATS["hits"] += 1
+            return cached
+        _QUERY_EMBEDDING_STATS["misses"] += 1
+
+    if backend.batch_queries and QUERY_EMBEDDING_BATCH_WINDOW_MS > 0:
+        vector = _QUERY_BATCHER.submit(backend, text).result()
+    else:
+        vector = next(iter(_embed_query_batch(backend, [text])))
+    if vector is None:
+        return None
+    vector.flags.writeable = False
+
+    if QUERY_EMBEDDING_CACHE_SIZE > 0:
+        with _QUERY_EMBEDDING_LOCK:
+            _QUERY_EMBEDDING_CACHE[key] = vector
+            _QUERY_EMBEDDING_CACHE.move_to_end(key)
+            while len(_QUERY_EMBEDDING_CACHE) > QUERY_EMBEDDING_CACHE_SIZE:
+                _QUERY_EMBEDDING_CACHE.popitem(last=False)
+    return vector
+
+
+def get_query_embedding_cache_stats() -> Dict[str, Any]:
+    with _QUERY_EMBEDDING_LOCK:
+        stats = dict(_QUERY_EMBEDDING_STATS)
+        size = len(_QUERY_EMBEDDING_CACHE)
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hitRate": round(stats["hits"] / lookups, 4) if lookups else None,
+        "size": size,
+        "maxSize": QUERY_EMBEDDING_CACHE_SIZE,
+    }
 
-    query_matrix = _embed_texts([query])
-    if query_matrix.shape[0] == 0:
-        return []
 
-    scores = vectors @ query_matrix[0]
-    ranked_indices = np.argsort(-scores)[:limit]
+def get_query_embedding_batcher_stats() -> Dict[str, Any]:
+    return {"enabled": QUERY_EMBEDDING_BATCH_WINDOW_MS > 0, **_QUERY_BATCHER.stats()}
+
+
+def _score_vectors(matrix: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+    # float32 행렬은 matmul 한 번, float16 행렬은 행 구간별로 float32로 올려 계산 (numpy float16 matmul은 느림)
+    query = np.asarray(query_vector, dtype=np.float32)
+    nonzero = np.flatnonzero(query)
+    if nonzero.size <= query.size // _SPARSE_QUERY_RATIO:
+        # 희소 질의(해시 n-gram 등): 0이 아닌 차원의 열만 곱한다
+        return query[nonzero] @ matrix.T[nonzero].astype(np.float32, copy=False)
+    if matrix.dtype == np.float32:
+        return matrix @ query
+    scores = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], _SCORE_CHUNK_ROWS):
+        block = matrix[start:start + _SCORE_CHUNK_ROWS]
+        scores[start:start + block.shape[0]] = block.astype(np.float32) @ query
+    return scores
+
+
+def _topk_desc(scores: np.ndarray, limit: int) -> np.ndarray:
+    """점수 내림차순 상위 limit개 인덱스 (argpartition 후 후보만 정렬, 동점은 인덱스 오름차순)."""
+    count = scores.shape[0]
+    if limit <= 0 or count == 0:
+        return np.empty(0, dtype=np.intp)
+    if limit < count:
+        picked = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        picked = np.arange(count)
+    return picked[np.lexsort((picked, -scores[picked]))]
+
+
+def _hits(scores: np.ndarray, metadata: Sequence[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    # 색인의 메타데이터 목록은 그대로 두고 선택된 limit개 항목만 복사
     return [
         {
             **dict(metadata[int(index)]),
             "embeddingScore": float(scores[int(index)]),
         }
-        for index in ranked_indices
+        for index in _topk_desc(scores, min(limit, len(metadata)))
     ]
 
 
+def _rank_index_vectors(
+    query_vector: Optional[np.ndarray],
+    index: Dict[str, Any],
+    limits: Dict[str, int],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    행렬 곱 한 번으로 부품/공정 점수를 같이 계산하고 종류별 상위 limit개 반환
+    - IVF 색인이 있으면 탐색한 리스트의 행만 점수 계산 (나머지는 -inf)
+    - 한 종류의 후보가 limit보다 적으면 그 종류만 정확 검색으로 보충
+    """
+    matrix = index.get("vectors")
+    if query_vector is None or matrix is None or matrix.size == 0:
+        return {kind: [] for kind in limits}
+
+    ann: Optional[IvfIndex] = index.get("ann")
+    candidate_rows: Optional[np.ndarray] = None
+    if ann is not None and ann.row_count == matrix.shape[0]:
+        candidate_rows, candidate_scores = ann.search(query_vector, EMBEDDING_ANN_NPROBE)
+        scores = np.full(matrix.shape[0], -np.inf, dtype=np.float32)
+        scores[candidate_rows] = candidate_scores
+    else:
+        scores = _score_vectors(matrix, query_vector)
+
+    ranked: Dict[str, List[Dict[str, Any]]] = {}
+    for kind, limit in limits.items():
+        start, end = index["offsets"][kind]
+        metadata = index.get(kind) or ()
+        if end <= start or not metadata:
+            ranked[kind] = []
+            continue
+        if candidate_rows is not None:
+            found = int(np.searchsorted(candidate_rows, end) - np.searchsorted(candidate_rows, start))
+            if found < min(limit, end - start):
+                scores[start:end] = _score_vectors(matrix[start:end], query_vector)
+        ranked[kind] = _hits(scores[start:end], metadata, limit)
+    return ranked
+
+
 def _candidate_part_keys(part: Any) -> List[str]:
     keys = [
         _normalize_key(_read_value(part, "partBase")),
@@ -408,6 +1148,160 @@ def _candidate_part_keys(part: Any) -> List[str]:
     return [key for key in keys if key]
 
 
+def _store_match_index(kind: str, fingerprint: Tuple[Any, ...], built: Any) -> None:
+    key = (kind, fingerprint)
+    with _MATCH_INDEX_LOCK:
+        _MATCH_INDEX_CACHE[key] = built
+        _MATCH_INDEX_CACHE.move_to_end(key)
+        while len(_MATCH_INDEX_CACHE) > MATCH_INDEX_CACHE_SIZE:
+            _MATCH_INDEX_CACHE.popitem(last=False)
+
+
+def _cached_match_index(kind: str, fingerprint: Tuple[Any, ...], factory: Callable[[], Any]) -> Any:
+    """
+    같은 원본 버전(또는 키 필드 내용 digest)의 후보 목록이면 이전 요청에서 만든 색인 재사용
+    - 색인은 목록 위치만 담고, 결과 item은 항상 이번 요청 목록에서 꺼낸다 (키 외 필드가 달라도 안전)
+    """
+    key = (kind, fingerprint)
+    with _MATCH_INDEX_LOCK:
+        cached = _MATCH_INDEX_CACHE.get(key)
+        if cached is not None:
+            _MATCH_INDEX_CACHE.move_to_end(key)
+            _MATCH_INDEX_STATS["hits"] += 1
+            return cached
+        _MATCH_INDEX_STATS["misses"] += 1
+
+    built = factory()
+    _store_match_index(kind, fingerprint, built)
+    return built
+
+
+def get_match_index_cache_stats() -> Dict[str, Any]:
+    with _MATCH_INDEX_LOCK:
+        stats = dict(_MATCH_INDEX_STATS)
+        size = len(_MATCH_INDEX_CACHE)
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hitRate": round(stats["hits"] / lookups, 4) if lookups else None,
+        "size": size,
+        "maxSize": MATCH_INDEX_CACHE_SIZE,
+    }
+
+
+@dataclass(frozen=True)
+class CandidatePartIndex:
+    """채팅 후보 부품 목록의 정규화 키 → 위치 색인.
+
+    키별 위치는 (nodeName 또는 partBase) 순으로 미리 정렬해 두고, 질의 때는 선호 시트 여부로만 안정 분할한다.
+    """
+
+    groups: Dict[str, List[int]]
+    sheets: List[str]
+    dedupe_keys: List[Tuple[str, str, str]]
+
+    @classmethod
+    def build(cls, candidate_parts: Sequence[Any]) -> "CandidatePartIndex":
+        groups: Dict[str, List[int]] = {}
+        for position, part in enumerate(candidate_parts):
+            for key in _candidate_part_keys(part):
+                groups.setdefault(key, []).append(position)
+
+        sort_names = [
+            str(_read_value(part, "nodeName") or _read_value(part, "partBase") or "")
+            for part in candidate_parts
+        ]
+        return cls(
+            groups={key: sorted(positions, key=sort_names.__getitem__) for key, positions in groups.items()},
+            sheets=[_clean_text(_read_value(part, "sourceSheet")) for part in candidate_parts],
+            dedupe_keys=[
+                (
+                    _clean_text(_read_value(part, "nodeName")),
+                    _clean_text(_read_value(part, "partBase")),
+                    _clean_text(_read_value(part, "sourceSheet")),
+                )
+                for part in candidate_parts
+            ],
+        )
+
+    def ordered_positions(self, key: str, preferred_sheet: str) -> List[int]:
+        positions = self.groups.get(key) or []
+        return [p for p in positions if self.sheets[p] == preferred_sheet] + [
+            p for p in positions if self.sheets[p] != preferred_sheet
+        ]
+
+
+@dataclass(frozen=True)
+class ProcessTemplateIndex:
+    """공정 템플릿 목록의 (processKey, partBase, sourceSheet) / processKey → 위치 색인.
+
+    같은 세 키는 마지막 템플릿, processKey만 맞추는 대체 매칭은 첫 템플릿 (선형 탐색 시절과 같은 규칙).
+    """
+
+    by_triple: Dict[Tuple[str, str, str], int]
+    by_process_key: Dict[str, int]
+    triples: List[Tuple[str, str, str]]
+
+    @classmethod
+    def build(cls, process_templates: Sequence[Any]) -> "ProcessTemplateIndex":
+        triples = [
+            (
+                _clean_text(_read_value(process, "processKey")),
+                _clean_text(_read_value(process, "partBase")),
+                _clean_text(_read_value(process, "sourceSheet")),
+            )
+            for process in process_templates
+        ]
+        by_triple: Dict[Tuple[str, str, str], int] = {}
+        by_process_key: Dict[str, int] = {}
+        for position, triple in enumerate(triples):
+            if triple[0]:
+                by_triple[triple] = position
+            by_process_key.setdefault(triple[0], position)
+        return cls(by_triple=by_triple, by_process_key=by_process_key, triples=triples)
+
+    def lookup(self, triple: Tuple[str, str, str]) -> Optional[int]:
+        position = self.by_triple.get(triple)
+        return self.by_process_key.get(triple[0]) if position is None else position
+
+
+_PART_KEY_FIELDS = ("partBase", "partName", "partId", "nodeName", "sourceSheet")
+_TEMPLATE_KEY_FIELDS = ("processKey", "partBase", "sourceSheet")
+
+
+def _content_fingerprint(items: Sequence[Any], fields: Sequence[str]) -> str:
+    # 키 필드 내용의 짧은 digest (repr라 None/"None"이 구분되고, 해시 불가능한 값도 그대로 처리)
+    payload = "\x1f".join(repr(_read_value(item, field)) for item in items for field in fields)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _candidate_part_index(candidate_parts: Sequence[Any]) -> CandidatePartIndex:
+    # 후보 부품은 캔버스 편집마다 바뀌어 버전 키가 없으므로 내용 digest로 캐시
+    fingerprint = ("content", _content_fingerprint(candidate_parts, _PART_KEY_FIELDS))
+    return _cached_match_index("parts", fingerprint, lambda: CandidatePartIndex.build(candidate_parts))
+
+
+def _process_template_index(
+    process_templates: Sequence[Any],
+    version: Optional[Hashable] = None,
+    *,
+    rebuild: bool = False,
+) -> ProcessTemplateIndex:
+    """
+    version(서버가 만든 원본 목록의 버전, 예: DB 내용 해시)이 있으면 (버전, 길이)로 캐시 → 적중 시 목록을 훑지 않는다
+    - 버전 키는 돌려준 위치만 확인하므로 내용이 버전으로 정해지지 않는 목록(요청 템플릿)에는 쓰지 않는다
+    - version이 없거나 rebuild면 내용 digest로 찾고, version 키도 그 색인으로 갱신
+    """
+    if version is None or rebuild:
+        fingerprint = ("content", _content_fingerprint(process_templates, _TEMPLATE_KEY_FIELDS))
+        index = _cached_match_index("processes", fingerprint, lambda: ProcessTemplateIndex.build(process_templates))
+        if version is not None:
+            _store_match_index("processes", ("version", version, len(process_templates)), index)
+        return index
+    fingerprint = ("version", version, len(process_templates))
+    return _cached_match_index("processes", fingerprint, lambda: ProcessTemplateIndex.build(process_templates))
+
+
 def _match_candidate_parts(
     global_part_hits: List[Dict[str, Any]],
     candidate_parts: Sequence[Any],
@@ -417,10 +1311,7 @@ def _match_candidate_parts(
     if not global_part_hits or not candidate_parts:
         return []
 
-    by_key: Dict[str, List[Any]] = {}
-    for part in candidate_parts or []:
-        for key in _candidate_part_keys(part):
-            by_key.setdefault(key, []).append(part)
+    part_index = _candidate_part_index(candidate_parts)
 
     ranked: List[Dict[str, Any]] = []
     seen = set()
@@ -428,29 +1319,15 @@ def _match_candidate_parts(
         hit_key = _normalize_key(hit.get("partBase"))
         if not hit_key:
             continue
-        candidates = list(by_key.get(hit_key) or [])
-        if not candidates:
-            continue
-        preferred_sheet = _clean_text(hit.get("sourceSheet"))
-        candidates.sort(
-            key=lambda item: (
-                0 if _clean_text(_read_value(item, "sourceSheet")) == preferred_sheet else 1,
-                str(_read_value(item, "nodeName") or _read_value(item, "partBase") or ""),
-            )
-        )
-        for candidate in candidates:
-            dedupe_key = (
-                _clean_text(_read_value(candidate, "nodeName")),
-                _clean_text(_read_value(candidate, "partBase")),
-                _clean_text(_read_value(candidate, "sourceSheet")),
-            )
+        for position in part_index.ordered_positions(hit_key, _clean_text(hit.get("sourceSheet"))):
+            dedupe_key = part_index.dedupe_keys[position]
             if dedupe_key in seen:
                 continue
             seen.add(dedupe_key)
             ranked.append(
                 {
                     "kind": "PART",
-                    "item": candidate,
+                    "item": candidate_parts[position],
                     "embeddingScore": float(hit.get("embeddingScore") or 0),
                     "text": hit.get("text") or "",
                 }
@@ -460,53 +1337,33 @@ def _match_candidate_parts(
     return ranked
 
 
-def _match_process_templates(
+def _rank_process_templates(
     global_process_hits: List[Dict[str, Any]],
     process_templates: Sequence[Any],
+    template_index: ProcessTemplateIndex,
     *,
     limit: int,
-) -> List[Dict[str, Any]]:
-    if not global_process_hits or not process_templates:
-        return []
-
-    by_key: Dict[Tuple[str, str, str], Any] = {}
-    for process in process_templates or []:
-        key = (
-            _clean_text(_read_value(process, "processKey")),
-            _clean_text(_read_value(process, "partBase")),
-            _clean_text(_read_value(process, "sourceSheet")),
-        )
-        if key[0]:
-            by_key[key] = process
-
+    verify: bool,
+) -> Optional[List[Dict[str, Any]]]:
+    # verify: 쓰는 위치의 템플릿 키가 색인과 같은지 확인 (다르면 None → 버전 키가 낡았다)
     ranked: List[Dict[str, Any]] = []
     seen = set()
     for hit in global_process_hits:
-        exact_key = (
-            _clean_text(hit.get("processKey")),
-            _clean_text(hit.get("partBase")),
-            _clean_text(hit.get("sourceSheet")),
-        )
-        matched = by_key.get(exact_key)
-        if matched is None:
-            fallback = next(
-                (
-                    process
-                    for process in process_templates or []
-                    if _clean_text(_read_value(process, "processKey")) == exact_key[0]
-                ),
-                None,
+        position = template_index.lookup(
+            (
+                _clean_text(hit.get("processKey")),
+                _clean_text(hit.get("partBase")),
+                _clean_text(hit.get("sourceSheet")),
             )
-            matched = fallback
-        if matched is None:
-            continue
-        dedupe_key = (
-            _clean_text(_read_value(matched, "processKey")),
-            _clean_text(_read_value(matched, "partBase")),
-            _clean_text(_read_value(matched, "sourceSheet")),
         )
+        if position is None:
+            continue
+        dedupe_key = template_index.triples[position]
         if dedupe_key in seen:
             continue
+        matched = process_templates[position]
+        if verify and tuple(_clean_text(_read_value(matched, field)) for field in _TEMPLATE_KEY_FIELDS) != dedupe_key:
+            return None
         seen.add(dedupe_key)
         ranked.append(
             {
@@ -517,7 +1374,38 @@ def _match_process_templates(
             }
         )
         if len(ranked) >= limit:
-            return ranked
+            break
+    return ranked
+
+
+def _match_process_templates(
+    global_process_hits: List[Dict[str, Any]],
+    process_templates: Sequence[Any],
+    *,
+    limit: int,
+    version: Optional[Hashable] = None,
+) -> List[Dict[str, Any]]:
+    if not global_process_hits or not process_templates:
+        return []
+
+    template_index = _process_template_index(process_templates, version)
+    ranked = _rank_process_templates(
+        global_process_hits,
+        process_templates,
+        template_index,
+        limit=limit,
+        verify=version is not None,
+    )
+    if ranked is None:
+        logger.info("Process template index for version %r is stale; re-indexing by content", version)
+        template_index = _process_template_index(process_templates, version, rebuild=True)
+        ranked = _rank_process_templates(
+            global_process_hits,
+            process_templates,
+            template_index,
+            limit=limit,
+            verify=False,
+        )
     return ranked
 
 
@@ -528,22 +1416,37 @@ def search_chat_candidates_with_bge_m3(
     process_templates: Sequence[Any],
     part_limit: int,
     process_limit: int,
+    process_templates_version: Optional[Hashable] = None,
 ) -> Dict[str, List[Dict[str, Any]]]:
-    index = load_or_build_global_embedding_index()
-    global_part_hits = _rank_global_vectors(
-        message,
-        index.get("part_vectors"),
-        list(index.get("parts") or []),
-        limit=max(part_limit * 4, 40),
-    )
-    global_process_hits = _rank_global_vectors(
-        message,
-        index.get("process_vectors"),
-        list(index.get("processes") or []),
-        limit=max(process_limit * 4, 80),
+    """
+    process_templates_version: 서버가 만든 템플릿 목록의 원본 버전 (예: DB 내용 해시). 주면 템플릿 색인을 목록을 훑지 않고 찾는다
+    (목록 내용이 버전만으로 정해질 때만 준다. 클라이언트가 보낸 목록은 None → 내용 digest로 캐시)
+    """
+    index = get_global_embedding_index()
+    if index is None:
+        # 첫 빌드가 끝나기 전: 호출 측은 휴리스틱 후보로 진행
+        raise EmbeddingIndexNotReady("Embedding index is being built")
+
+    # 질의는 요청당 한 번만 임베딩하고, 부품/공정은 합친 행렬 곱 한 번으로 랭킹
+    matrix = index.get("vectors")
+    query_vector = embed_query(message, index.get("backend")) if matrix is not None and matrix.size else None
+    hits = _rank_index_vectors(
+        query_vector,
+        index,
+        {
+            "parts": max(part_limit * 4, 40),
+            "processes": max(process_limit * 4, 80),
+        },
     )
+    global_part_hits = hits["parts"]
+    global_process_hits = hits["processes"]
 
     return {
         "parts": _match_candidate_parts(global_part_hits, candidate_parts, limit=part_limit),
-        "processes": _match_process_templates(global_process_hits, process_templates, limit=process_limit),
+        "processes": _match_process_templates(
+            global_process_hits,
+            process_templates,
+            limit=process_limit,
+            version=process_templates_version,
+        ),
     }
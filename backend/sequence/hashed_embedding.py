@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.text_normalization import normalize_token_text
+
+# =========================
+# 설정
+# =========================
+# SEQUENCE_EMBEDDING_MODEL에 이 이름을 주면 모델 다운로드 없이 로컬 CPU 엔진 사용
+HASHED_NGRAM_MODEL = "hashed-char-ngram"
+DEFAULT_DIM = 1024
+DEFAULT_NGRAM_RANGE = (2, 4)
+# bincount 한 번에 처리할 문서 수 (문서 수 × dim 크기의 임시 배열)
+_BATCH_DOCS = 2048
+
+_HASH_PRIME = np.uint64(1099511628211)
+_MIX_1 = np.uint64(0xFF51AFD7ED558CCD)
+_MIX_2 = np.uint64(0xC4CEB9FE1A85EC53)
+_SHIFT_33 = np.uint64(33)
+_SHIFT_62 = np.uint64(62)
+
+
+def _prepare(texts: Sequence[str]) -> List[str]:
+    # 대문자 + 구분 기호 정리, 앞뒤 공백으로 단어 경계 n-gram도 만든다
+    prepared = []
+    for text in texts:
+        normalized = normalize_token_text(text)
+        prepared.append(f" {normalized} " if normalized else "")
+    return prepared
+
+
+def _ngram_features(prepared: Sequence[str], dim: int, ngram_range: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    문서들의 문자 n-gram을 한 번에 해시 → (문서 번호, 버킷, 부호)
+    문서를 이어 붙인 코드포인트 배열 위에서 n별로 벡터화하고, 문서 경계를 넘는 n-gram은 버린다.
+    """
+    lengths = np.fromiter((len(text) for text in prepared), dtype=np.int64, count=len(prepared))
+    ends = np.cumsum(lengths)
+    codepoints = np.frombuffer("".join(prepared).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+    doc_parts: List[np.ndarray] = []
+    hash_parts: List[np.ndarray] = []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        if codepoints.size < n:
+            continue
+        positions = np.arange(codepoints.size - n + 1)
+        docs = np.searchsorted(ends, positions, side="right")
+        valid = positions + n <= ends[docs]
+        positions = positions[valid]
+        docs = docs[valid]
+
+        hashes = np.full(positions.size, np.uint64(n), dtype=np.uint64)
+        for offset in range(n):
+            hashes = (hashes * _HASH_PRIME) ^ codepoints[positions + offset]
+        # murmur3 finalizer로 비트 섞기
+        hashes ^= hashes >> _SHIFT_33
+        hashes *= _MIX_1
+        hashes ^= hashes >> _SHIFT_33
+        hashes *= _MIX_2
+        hashes ^= hashes >> _SHIFT_33
+
+        doc_parts.append(docs)
+        hash_parts.append(hashes)
+
+    if not hash_parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=np.float64)
+
+    docs = np.concatenate(doc_parts)
+    hashes = np.concatenate(hash_parts)
+    buckets = (hashes % np.uint64(dim)).astype(np.int64)
+    # 충돌 편향을 줄이는 부호 해싱 (버킷과 다른 비트 사용)
+    signs = 1.0 - 2.0 * ((hashes >> _SHIFT_62) & np.uint64(1)).astype(np.float64)
+    return docs, buckets, signs
+
+
+class HashedNgramVectorizer:
+    """해시된 문자 n-gram TF-IDF 벡터 (고정 dim, 부호 해싱, sublinear TF, L2 정규화).
+
+    fit()으로 색인 문서의 버킷별 IDF를 학습하고, transform()은 같은 IDF로 문서/질의를 변환한다.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM, ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE):
+        self.dim = int(dim)
+        self.ngram_range = ngram_range
+        self.idf: Optional[np.ndarray] = None
+
+    def _term_frequencies(self, prepared: Sequence[str]) -> np.ndarray:
+        docs, buckets, signs = _ngram_features(prepared, self.dim, self.ngram_range)
+        counts = np.bincount(docs * self.dim + buckets, weights=signs, minlength=len(prepared) * self.dim)
+        counts = counts.reshape(len(prepared), self.dim)
+        return np.sign(counts) * np.log1p(np.abs(counts))
+
+    def fit(self, texts: Sequence[str]) -> "HashedNgramVectorizer":
+        document_frequency = np.zeros(self.dim, dtype=np.int64)
+        for start in range(0, len(texts), _BATCH_DOCS):
+            tf = self._term_frequencies(_prepare(texts[start:start + _BATCH_DOCS]))
+            document_frequency += np.count_nonzero(tf, axis=0)
+        self.idf = (np.log((1.0 + len(texts)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        return self
+
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), _BATCH_DOCS):
+            tf = self._term_frequencies(_prepare(texts[start:start + _BATCH_DOCS]))
+            if self.idf is not None:
+                tf *= self.idf
+            norms = np.linalg.norm(tf, axis=1, keepdims=True)
+            np.divide(tf, norms, out=tf, where=norms > 0)
+            out[start:start + tf.shape[0]] = tf
+        return out
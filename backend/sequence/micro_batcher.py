@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+# 최근 배치/대기 시간 분포 계산에 쓰는 표본 수
+_RECENT_SAMPLES = 1024
+
+
+def _percentile(values: Sequence[float], ratio: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(ratio * len(ordered)))]
+
+
+class MicroBatcher:
+    """짧은 시간창 안에 들어온 요청을 모아 한 번에 처리하는 in-process 배처.
+
+    submit()은 Future를 돌려주고, 작업 스레드가 첫 요청 후 window_ms 동안(또는 max_batch개까지) 모은 요청을
+    group별로 run_batch(group, items) 한 번에 처리해 결과를 각 Future로 나눠 준다.
+    run_batch는 items와 같은 순서/길이의 결과를 돌려줘야 한다.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Any, List[Any]], Sequence[Any]],
+        *,
+        window_ms: float,
+        max_batch: int,
+        name: str = "micro-batcher",
+    ):
+        self.run_batch = run_batch
+        self.window = max(float(window_ms), 0.0) / 1000.0
+        self.max_batch = max(int(max_batch), 1)
+        self.name = name
+        self._queue: "queue.SimpleQueue[Tuple[Any, Any, Future, float]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "errors": 0, "maxBatchSize": 0}
+        self._recent_sizes: Deque[int] = deque(maxlen=_RECENT_SAMPLES)
+        self._recent_waits: Deque[float] = deque(maxlen=_RECENT_SAMPLES)
+        self._recent_runs: Deque[float] = deque(maxlen=_RECENT_SAMPLES)
+
+    # -----------------------------
+    # 요청
+    # -----------------------------
+    def submit(self, group: Any, item: Any) -> Future:
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((group, item, future, time.perf_counter()))
+        return future
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self._thread.start()
+
+    # -----------------------------
+    # 작업 스레드
+    # -----------------------------
+    def _collect(self) -> List[Tuple[Any, Any, Future, float]]:
+        pending = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(pending) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                pending.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return pending
+
+    def _worker(self) -> None:
+        while True:
+            pending = self._collect()
+            started = time.perf_counter()
+
+            groups: Dict[int, Tuple[Any, List[Tuple[Any, Future]]]] = {}
+            for group, item, future, _ in pending:
+                groups.setdefault(id(group), (group, []))[1].append((item, future))
+
+            for group, entries in groups.values():
+                live = [(item, future) for item, future in entries if future.set_running_or_notify_cancel()]
+                if not live:
+                    continue
+                try:
+                    results = self.run_batch(group, [item for item, _ in live])
+                except BaseException as exc:
+                    self._count("errors")
+                    for _, future in live:
+                        future.set_exception(exc)
+                    continue
+                for (_, future), result in zip(live, results):
+                    future.set_result(result)
+
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self._stats["requests"] += len(pending)
+                self._stats["batches"] += 1
+                self._stats["maxBatchSize"] = max(self._stats["maxBatchSize"], len(pending))
+                self._recent_sizes.append(len(pending))
+                self._recent_waits.extend(started - queued_at for _, _, _, queued_at in pending)
+                self._recent_runs.append(finished - started)
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    # -----------------------------
+    # 통계
+    # -----------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            sizes = list(self._recent_sizes)
+            waits = list(self._recent_waits)
+            runs = list(self._recent_runs)
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 3) if value is not None else None
+
+        return {
+            **stats,
+            "windowMs": round(self.window * 1000, 3),
+            "maxBatch": self.max_batch,
+            "avgBatchSize": round(stats["requests"] / stats["batches"], 3) if stats["batches"] else None,
+            "recentAvgBatchSize": round(sum(sizes) / len(sizes), 3) if sizes else None,
+            "queueWaitMs": {
+                "avg": ms(sum(waits) / len(waits)) if waits else None,
+                "p50": ms(_percentile(waits, 0.5)),
+                "p95": ms(_percentile(waits, 0.95)),
+                "max": ms(max(waits)) if waits else None,
+            },
+            "batchRunMs": {
+                "avg": ms(sum(runs) / len(runs)) if runs else None,
+                "p95": ms(_percentile(runs, 0.95)),
+            },
+        }
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Tuple
+
+from .builder import iter_process_labels
+
+HEADER = ("부품 기준", "요소작업", "OPTION", "작업자\n(작업분배)", "no", "동작요소", "반복횟수", "SEC", "TOTAL")
+
+
+def _synthetic_rows(row_count: int) -> List[Tuple[Any, ...]]:
+    rows: List[Tuple[Any, ...]] = [("작업시간 분석표",), HEADER]
+    for index in range(row_count):
+        part = f"PART-{index // 20}" if index % 20 == 0 else None
+        process = f"공정 {index % 997}" if index % 3 == 0 else None
+        rows.append((part, process, "STD", "A", index, "동작", 1, 1.5, 1.5))
+    return rows
+
+
+def _best_of(repeat: int, fn: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _measure_in_memory(row_count: int, repeat: int) -> float:
+    rows = _synthetic_rows(row_count)
+    return _best_of(repeat, lambda: list(iter_process_labels(rows)))
+
+
+def _measure_xlsx(row_count: int, repeat: int) -> float:
+    from openpyxl import Workbook, load_workbook
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "process_labels_bench.xlsx"
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("공통 DB")
+        for row in _synthetic_rows(row_count):
+            worksheet.append(list(row))
+        workbook.save(path)
+
+        def run() -> None:
+            source = load_workbook(path, read_only=True, data_only=True)
+            try:
+                for sheet in source.worksheets:
+                    list(iter_process_labels(sheet.iter_rows(values_only=True)))
+            finally:
+                source.close()
+
+        return _best_of(repeat, run)
+
+
+def bench_process_labels(args: argparse.Namespace) -> int:
+    measure = _measure_xlsx if args.xlsx else _measure_in_memory
+    small = max(args.rows, 1)
+    large = small * max(args.scale, 2)
+
+    small_seconds = measure(small, args.repeat)
+    large_seconds = measure(large, args.repeat)
+    small_per_row = small_seconds / small
+    large_per_row = large_seconds / large
+    growth = large_per_row / small_per_row if small_per_row else 0.0
+
+    print(f"source={'xlsx' if args.xlsx else 'memory'}")
+    print(f"rows_small={small} seconds={small_seconds:.4f} us_per_row={small_per_row * 1e6:.2f}")
+    print(f"rows_large={large} seconds={large_seconds:.4f} us_per_row={large_per_row * 1e6:.2f}")
+    print(f"per_row_growth={growth:.2f} tolerance={args.tolerance:.2f}")
+
+    if growth > args.tolerance:
+        print("result=FAIL (process label extraction is no longer linear in sheet size)")
+        return 1
+    print("result=OK")
+    return 0
+
+
+def _synthetic_labels(unique_count: int) -> List[str]:
+    words = ("HOUSING", "LENS", "BRKT", "SCREW", "주광 LED 모듈", "체결", "로딩", "검사", "HEAT-SINK", "[LH]", "(RH)")
+    return [
+        f"{words[index % len(words)]} {words[(index * 7) % len(words)]}-{index} ASS'Y_{index % 13}"
+        for index in range(unique_count)
+    ]
+
+
+def bench_normalize(args: argparse.Namespace) -> int:
+    from backend.text_normalization import _NORMALIZERS, clear_normalizer_caches, normalizer_stats
+
+    labels = _synthetic_labels(max(args.unique, 1))
+    # 채팅/빌드처럼 같은 문자열이 반복해서 들어오는 스트림
+    stream = [labels[index % len(labels)] for index in range(len(labels) * max(args.repeat_ratio, 1))]
+
+    clear_normalizer_caches()
+    print(f"unique={len(labels)} calls={len(stream)}")
+    for name, normalizer in _NORMALIZERS.items():
+        raw = normalizer.uncached
+        raw_seconds = _best_of(args.repeat, lambda: [raw(value) for value in stream])
+        normalizer.cache_clear()
+        memo_seconds = _best_of(1, lambda: [normalizer(value) for value in stream])
+        speedup = raw_seconds / memo_seconds if memo_seconds else 0.0
+        print(
+            f"normalizer={name} uncached_us={raw_seconds / len(stream) * 1e6:.3f} "
+            f"memoized_us={memo_seconds / len(stream) * 1e6:.3f} speedup={speedup:.2f} "
+            f"hit_rate={normalizer_stats()[name]['hitRate']}"
+        )
+    return 0
+
+
+def _synthetic_vectors(row_count: int, dim: int, clusters: int, seed: int):
+    import numpy as np
+
+    # 군집이 있는 L2 정규화 벡터 (실제 부품/공정 문서처럼 비슷한 문서끼리 뭉친 분포)
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size=row_count)]
+    vectors += 0.6 * rng.standard_normal((row_count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.asfortranarray(vectors)
+
+
+def bench_ann(args: argparse.Namespace) -> int:
+    import numpy as np
+
+    from backend.sequence.ann_index import IvfIndex
+    from backend.sequence.embedding_search import EMBEDDING_ANN_LISTS, EMBEDDING_ANN_NPROBE, _score_vectors, _topk_desc
+
+    if args.index:
+        from backend.sequence.embedding_search import load_or_build_global_embedding_index
+
+        matrix = load_or_build_global_embedding_index()["vectors"]
+    else:
+        matrix = _synthetic_vectors(args.rows, args.dim, args.clusters, args.seed)
+    if matrix.shape[0] == 0:
+        print("result=SKIP (empty index)")
+        return 0
+
+    started = time.perf_counter()
+    ivf = IvfIndex.build(matrix, lists=args.lists or EMBEDDING_ANN_LISTS, seed=args.seed)
+    build_seconds = time.perf_counter() - started
+    print(f"rows={matrix.shape[0]} dim={matrix.shape[1]} lists={ivf.list_count} build_seconds={build_seconds:.2f}")
+
+    # 색인 행에 잡음을 더한 질의 (채팅 질의가 기존 문서와 비슷한 상황)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = np.asarray(matrix[rng.choice(matrix.shape[0], size=args.queries, replace=False)], dtype=np.float32)
+    queries += 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(matrix.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact_hits = []
+    started = time.perf_counter()
+    for query in queries:
+        exact_hits.append(set(_topk_desc(_score_vectors(matrix, query), args.k).tolist()))
+    exact_ms = (time.perf_counter() - started) / len(queries) * 1000
+    print(f"mode=exact ms_per_query={exact_ms:.3f}")
+
+    nprobes = sorted({int(value) for value in args.nprobe.split(",") if value.strip()} | {EMBEDDING_ANN_NPROBE})
+    default_recall = 1.0
+    for nprobe in nprobes:
+        recall = 0.0
+        candidates = 0
+        started = time.perf_counter()
+        for query, exact in zip(queries, exact_hits):
+            rows, scores = ivf.search(query, nprobe)
+            picked = rows[_topk_desc(scores, args.k)]
+            recall += len(exact.intersection(picked.tolist())) / max(len(exact), 1)
+            candidates += rows.size
+        ann_ms = (time.perf_counter() - started) / len(queries) * 1000
+        recall /= len(queries)
+        if nprobe == EMBEDDING_ANN_NPROBE:
+            default_recall = recall
+        print(
+            f"mode=ivf nprobe={nprobe} recall_at_{args.k}={recall:.4f} ms_per_query={ann_ms:.3f} "
+            f"speedup={exact_ms / ann_ms if ann_ms else 0.0:.2f} scanned_ratio={candidates / len(queries) / matrix.shape[0]:.4f}"
+        )
+
+    print(f"default_nprobe={EMBEDDING_ANN_NPROBE} recall={default_recall:.4f} min_recall={args.min_recall:.2f}")
+    if default_recall < args.min_recall:
+        print("result=FAIL (IVF recall at the configured nprobe is below the minimum)")
+        return 1
+    print("result=OK")
+    return 0
+
+
+def _synthetic_embedding_documents(count: int, seed: int) -> List[str]:
+    # 짧은 부품 문서와 긴 공정 문서가 섞인 색인 문서 (실제 색인과 비슷한 길이 분포)
+    rng = random.Random(seed)
+    labels = _synthetic_labels(500)
+    documents = []
+    for index in range(count):
+        if index % 4 == 0:
+            documents.append(f"PART | {rng.choice(labels)} | 공통 DB")
+        else:
+            steps = " / ".join(rng.choice(labels) for _ in range(rng.randint(1, 12)))
+            documents.append(f"PROCESS | {rng.choice(labels)} | {steps} | 공통 DB")
+    return documents
+
+
+def _padded_tokens(lengths: List[int], token_budget: int, batch_size: int, max_batch: int) -> int:
+    from backend.sequence.embedding_search import plan_length_batches
+
+    if token_budget > 0:
+        batches = [[lengths[int(row)] for row in rows] for rows in plan_length_batches(lengths, token_budget, max_batch)]
+    else:
+        batches = [lengths[start:start + batch_size] for start in range(0, len(lengths), batch_size)]
+    return sum(max(batch) * len(batch) for batch in batches if batch)
+
+
+def bench_embed_build(args: argparse.Namespace) -> int:
+    try:
+        import torch  # noqa: F401
+        import transformers  # noqa: F401
+    except ImportError:
+        print("result=SKIP (transformers/torch not installed)")
+        return 0
+
+    from backend.sequence import embedding_search
+
+    if args.index:
+        documents = embedding_search._build_global_embedding_documents(embedding_search.EXCEL_DB_PATH)
+        texts = [str(item.get("text") or "") for kind in ("parts", "processes") for item in documents[kind]]
+        texts = random.Random(args.seed).sample(texts, min(args.docs, len(texts)))
+    else:
+        texts = _synthetic_embedding_documents(args.docs, args.seed)
+
+    backend = embedding_search.TransformerEmbeddingBackend(args.model or embedding_search.EMBEDDING_MODEL)
+    backend.warm()
+    tokenizer = embedding_search._load_embedding_model(backend.name)[0]
+    lengths = [
+        len(ids)
+        for ids in tokenizer(texts, truncation=True, max_length=embedding_search.EMBEDDING_MAX_LENGTH)["input_ids"]
+    ]
+    real_tokens = sum(lengths)
+    print(f"model={backend.name} docs={len(texts)} real_tokens={real_tokens}")
+
+    modes = [("fixed", 0, 0), ("bucketed", args.token_budget, 0)]
+    if args.workers > 1:
+        modes.append(("bucketed_pool", args.token_budget, args.workers))
+
+    saved = (embedding_search.EMBEDDING_TOKEN_BUDGET, embedding_search.EMBEDDING_BUILD_WORKERS)
+    saved_env = os.environ.get("SEQUENCE_EMBEDDING_TOKEN_BUDGET")
+    baseline = None
+    try:
+        for name, token_budget, workers in modes:
+            embedding_search.EMBEDDING_TOKEN_BUDGET = token_budget
+            embedding_search.EMBEDDING_BUILD_WORKERS = workers
+            # 풀 워커는 새 프로세스라 환경 변수로 전달
+            os.environ["SEQUENCE_EMBEDDING_TOKEN_BUDGET"] = str(token_budget)
+            padded = _padded_tokens(
+                lengths,
+                token_budget,
+                embedding_search.EMBEDDING_BATCH_SIZE,
+                embedding_search.EMBEDDING_MAX_BATCH_DOCS,
+            )
+            seconds = _best_of(args.repeat, lambda: backend.embed_documents(texts))
+            docs_per_sec = len(texts) / seconds if seconds else 0.0
+            baseline = baseline or docs_per_sec
+            print(
+                f"mode={name} seconds={seconds:.2f} docs_per_sec={docs_per_sec:.1f} "
+                f"padded_tokens={padded} padding_ratio={padded / max(real_tokens, 1):.2f} "
+                f"speedup={docs_per_sec / baseline if baseline else 0.0:.2f}"
+            )
+    finally:
+        embedding_search.EMBEDDING_TOKEN_BUDGET, embedding_search.EMBEDDING_BUILD_WORKERS = saved
+        if saved_env is None:
+            os.environ.pop("SEQUENCE_EMBEDDING_TOKEN_BUDGET", None)
+        else:
+            os.environ["SEQUENCE_EMBEDDING_TOKEN_BUDGET"] = saved_env
+    print("result=OK")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="sequence_rag 성능 회귀 벤치마크")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    labels_parser = subparsers.add_parser(
+        "process-labels",
+        help="DB 공정 라벨 추출이 시트 크기에 선형인지 확인",
+    )
+    labels_parser.add_argument("--rows", type=int, default=5000)
+    labels_parser.add_argument("--scale", type=int, default=8)
+    labels_parser.add_argument("--repeat", type=int, default=3)
+    labels_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=2.0,
+        help="Maximum allowed growth of per-row time between the small and large sheet.",
+    )
+    labels_parser.add_argument(
+        "--xlsx",
+        action="store_true",
+        help="Write a real workbook and stream it with openpyxl read-only mode.",
+    )
+    labels_parser.set_defaults(handler=bench_process_labels)
+
+    normalize_parser = subparsers.add_parser(
+        "normalize",
+        help="공용 텍스트 정규화: 메모이즈 전/후 호출당 시간과 적중률",
+    )
+    normalize_parser.add_argument("--unique", type=int, default=2000)
+    normalize_parser.add_argument(
+        "--repeat-ratio",
+        type=int,
+        default=20,
+        help="How many times each unique string appears in the call stream.",
+    )
+    normalize_parser.add_argument("--repeat", type=int, default=3)
+    normalize_parser.set_defaults(handler=bench_normalize)
+
+    ann_parser = subparsers.add_parser(
+        "ann",
+        help="임베딩 IVF 근사 검색: nprobe별 재현율(정확 검색 대비)과 질의당 시간",
+    )
+    ann_parser.add_argument("--rows", type=int, default=200000)
+    ann_parser.add_argument("--dim", type=int, default=256)
+    ann_parser.add_argument("--clusters", type=int, default=2000)
+    ann_parser.add_argument("--lists", type=int, default=0, help="IVF list count (0 = sqrt(rows)).")
+    ann_parser.add_argument("--nprobe", default="1,4,8,16,32,64")
+    ann_parser.add_argument("--queries", type=int, default=200)
+    ann_parser.add_argument("--k", type=int, default=10)
+    ann_parser.add_argument("--seed", type=int, default=0)
+    ann_parser.add_argument("--min-recall", type=float, default=0.9)
+    ann_parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Use the saved global embedding index instead of synthetic vectors.",
+    )
+    ann_parser.set_defaults(handler=bench_ann)
+
+    embed_parser = subparsers.add_parser(
+        "embed-build",
+        help="색인 빌드 임베딩 docs/sec: 입력 순서 고정 배치 vs 길이 버킷 토큰 예산 배치 (vs 프로세스 풀)",
+    )
+    embed_parser.add_argument("--docs", type=int, default=2000)
+    embed_parser.add_argument("--model", default="", help="HuggingFace model (default SEQUENCE_EMBEDDING_MODEL).")
+    embed_parser.add_argument("--token-budget", type=int, default=8192)
+    embed_parser.add_argument("--workers", type=int, default=0, help="Also measure a process pool of this size.")
+    embed_parser.add_argument("--repeat", type=int, default=1)
+    embed_parser.add_argument("--seed", type=int, default=0)
+    embed_parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Sample documents from the work-time DB instead of synthetic ones.",
+    )
+    embed_parser.set_defaults(handler=bench_embed_build)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
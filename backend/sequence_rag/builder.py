@@ -1,20 +1,26 @@
 from __future__ import annotations
 
 import json
-from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
 
-from openpyxl import load_workbook
+import numpy as np
 
+from backend.Assembly.db_snapshot import get_work_time_db_snapshot, resolve_sequence_columns
+from backend.Assembly.excel_db import EXCEL_PATH
+from backend.Assembly.gram_index import GramIndex
 from backend.Assembly.auto_match import (
     COMBINED_THRESHOLD,
     combined_score,
+    combined_upper_bound,
     jw_score,
     load_db_rows,
-    match_one_best,
-    rf_score,
+    rf_score_many,
+    rf_score_matrix,
 )
+from backend.Assembly.batch_match import match_part_best
+from backend.text_normalization import normalize_token_text as _normalize_token_text
 
 from .models import GraphIndex, SequenceStep, WindowDocument
 
@@ -50,8 +56,12 @@ PROCESS_STOPWORDS = (
     "이동",
 )
 
-EXCEL_DB_PATH = Path(__file__).resolve().parent.parent / "작업시간분석표DB.xlsx"
+# 그래프 인덱스는 버전 공용 산출물이라 db_registry의 "default" 버전 DB로만 정체성을 맞춘다
+# (다른 버전을 고른 요청에서는 그 버전 공정 템플릿에 있는 후보만 남는다)
+EXCEL_DB_PATH = EXCEL_PATH.resolve()
 PROCESS_COMBINED_THRESHOLD = 82.0
+# 전체 스캔 후보를 한 번에 점수 계산할 때 행렬 행 수 (질의 × 공정 라벨 float64)
+PROCESS_SCORE_CHUNK = 256
 
 
 def _iter_sequence_files(sequence_dir: Path) -> Iterable[Path]:
@@ -73,86 +83,175 @@ def _normalize_text(value: Any) -> str:
     return " ".join(str(value or "").split()).strip()
 
 
-@lru_cache(maxsize=1)
 def _get_db_rows_and_choices() -> tuple[list[dict[str, Any]], list[str]]:
     if not EXCEL_DB_PATH.exists():
         return [], []
     return load_db_rows(EXCEL_DB_PATH)
 
 
-@lru_cache(maxsize=1)
 def _get_exact_db_part_map() -> dict[str, str]:
-    db_rows, _ = _get_db_rows_and_choices()
-    exact_map: dict[str, str] = {}
-    for row in db_rows:
-        normalized = _normalize_token_text(row.get("db_part_raw"))
-        raw = _normalize_text(row.get("db_part_raw"))
-        if normalized and raw and normalized not in exact_map:
-            exact_map[normalized] = raw
-    return exact_map
+    if not EXCEL_DB_PATH.exists():
+        return {}
+
+    def build() -> dict[str, str]:
+        db_rows, _ = _get_db_rows_and_choices()
+        exact_map: dict[str, str] = {}
+        for row in db_rows:
+            normalized = _normalize_token_text(row.get("db_part_raw"))
+            raw = _normalize_text(row.get("db_part_raw"))
+            if normalized and raw and normalized not in exact_map:
+                exact_map[normalized] = raw
+        return exact_map
+
+    return get_work_time_db_snapshot(EXCEL_DB_PATH).derive("sequence_rag.exact_part_map", build)
+
+
+def iter_process_labels(rows: Iterable[Sequence[Any]], *, header_row: int = 2) -> Iterator[str]:
+    """values-only 행 스트림을 한 번만 훑어 헤더에서 공정 컬럼을 찾고 라벨을 흘려보낸다.
+
+    `rows`는 1행부터 순서대로 들어오는 행 튜플이면 된다
+    (`worksheet.iter_rows(values_only=True)` 또는 스냅샷 테이블).
+    """
+    process_col = None
+    for row_number, row in enumerate(rows, start=1):
+        if row_number < header_row:
+            continue
+        if row_number == header_row:
+            process_col = resolve_sequence_columns(tuple(row))["process"]
+            if process_col is None:
+                return
+            continue
+        if process_col >= len(row):
+            continue
+        raw = _normalize_text(row[process_col])
+        if raw:
+            yield raw
 
 
-@lru_cache(maxsize=1)
 def _get_db_process_labels() -> list[str]:
     if not EXCEL_DB_PATH.exists():
         return []
 
-    workbook = load_workbook(EXCEL_DB_PATH, read_only=True, data_only=True)
-    labels: list[str] = []
-    seen = set()
-
-    for worksheet in workbook.worksheets:
-        headers: dict[str, int] = {}
-        for col in range(1, worksheet.max_column + 1):
-            value = worksheet.cell(row=2, column=col).value
-            if value:
-                headers[str(value).strip()] = col
-
-        process_col = None
-        for header, col in headers.items():
-            normalized = str(header).replace(" ", "")
-            if "요소작업" in normalized or "공정" in normalized:
-                process_col = col
-                break
-
-        if not process_col:
-            continue
+    snapshot = get_work_time_db_snapshot(EXCEL_DB_PATH)
 
-        for row in range(3, worksheet.max_row + 1):
-            value = worksheet.cell(row=row, column=process_col).value
-            raw = _normalize_text(value)
-            if not raw or raw in seen:
-                continue
-            seen.add(raw)
-            labels.append(raw)
+    def build() -> list[str]:
+        labels: list[str] = []
+        seen = set()
+
+        for table in snapshot.tables.values():
+            for raw in iter_process_labels(chain([table.header], table.rows), header_row=1):
+                if raw in seen:
+                    continue
+                seen.add(raw)
+                labels.append(raw)
 
-    return labels
+        return labels
+
+    return snapshot.derive("sequence_rag.process_labels", build)
 
 
-@lru_cache(maxsize=1)
 def _get_exact_db_process_map() -> dict[str, str]:
-    exact_map: dict[str, str] = {}
-    for raw in _get_db_process_labels():
-        normalized = _normalize_token_text(raw)
-        if normalized and normalized not in exact_map:
-            exact_map[normalized] = raw
-    return exact_map
+    if not EXCEL_DB_PATH.exists():
+        return {}
+
+    def build() -> dict[str, str]:
+        exact_map: dict[str, str] = {}
+        for raw in _get_db_process_labels():
+            normalized = _normalize_token_text(raw)
+            if normalized and normalized not in exact_map:
+                exact_map[normalized] = raw
+        return exact_map
+
+    return get_work_time_db_snapshot(EXCEL_DB_PATH).derive("sequence_rag.exact_process_map", build)
 
 
-def _normalize_token_text(value: Any) -> str:
-    text = _normalize_text(value).upper()
-    if not text:
+def _get_db_process_search_table() -> tuple[list[str], list[str], Optional[GramIndex]]:
+    """공정 라벨, 정규화 라벨(같은 순서), 정규화 라벨 위 gram 역색인."""
+    if not EXCEL_DB_PATH.exists():
+        return [], [], None
+
+    def build() -> tuple[list[str], list[str], GramIndex]:
+        labels = _get_db_process_labels()
+        normalized = [_normalize_token_text(label) for label in labels]
+        return labels, normalized, GramIndex.build(normalized)
+
+    return get_work_time_db_snapshot(EXCEL_DB_PATH).derive("sequence_rag.process_search_table", build)
+
+
+def _process_identity_memo() -> dict[str, str]:
+    """정규화 후보 → 정규 공정 라벨("" = 기준 미달). DB 스냅샷이 같으면 빌드 간에도 재사용."""
+    return get_work_time_db_snapshot(EXCEL_DB_PATH).derive("sequence_rag.process_identity_memo", dict)
+
+
+def _best_process_label(
+    candidate_normalized: str,
+    positions: Sequence[int],
+    rf_scores: np.ndarray,
+) -> str:
+    """
+    positions 라벨 중 combined 최고(동점이면 앞 라벨) 1건이 기준 이상이면 그 라벨
+    - RF 내림차순으로 훑으며 JW=100 가정 상한이 현재 최고점보다 낮아지면 중단
+    """
+    process_labels, normalized_labels, _ = _get_db_process_search_table()
+    best_rank: Optional[tuple[float, int]] = None
+    for pos in np.argsort(-rf_scores, kind="stable").tolist():
+        rf = float(rf_scores[pos])
+        if best_rank is not None and combined_upper_bound(rf) < best_rank[0]:
+            break
+        position = positions[pos]
+        score = combined_score(rf, jw_score(candidate_normalized, normalized_labels[position]))
+        rank = (score, -position)
+        if best_rank is None or rank > best_rank:
+            best_rank = rank
+
+    if best_rank is None or best_rank[0] < PROCESS_COMBINED_THRESHOLD:
         return ""
-    for old, new in (("-", " "), ("_", " "), ("(", " "), (")", " "), ("/", " ")):
-        text = text.replace(old, new)
-    return " ".join(text.split()).strip()
+    return _normalize_text(process_labels[-best_rank[1]])
+
+
+def _resolve_process_candidates(candidates: Iterable[str]) -> dict[str, str]:
+    """
+    정규화 후보들을 한 번에 공정 라벨로 해석 (결과는 스냅샷 memo에 저장)
+    - gram 역색인으로 추린 후보는 후보별 RF 한 번
+    - 추린 후보가 너무 적어 전체 스캔인 후보는 모아서 질의 × 라벨 RF 행렬로 계산
+    """
+    candidates = [candidate for candidate in dict.fromkeys(candidates) if candidate]
+    process_labels, normalized_labels, gram_index = _get_db_process_search_table()
+    if not process_labels:
+        return {candidate: "" for candidate in candidates}
+
+    memo = _process_identity_memo()
+    full_scan: list[str] = []
+    for candidate in candidates:
+        if candidate in memo:
+            continue
+        positions = gram_index.candidates(candidate) if gram_index is not None else None
+        if positions is None:
+            full_scan.append(candidate)
+            continue
+        rf_scores = rf_score_many(candidate, [normalized_labels[position] for position in positions])
+        memo[candidate] = _best_process_label(candidate, positions, rf_scores)
 
+    all_positions = range(len(process_labels))
+    for start in range(0, len(full_scan), PROCESS_SCORE_CHUNK):
+        chunk = full_scan[start:start + PROCESS_SCORE_CHUNK]
+        for candidate, rf_scores in zip(chunk, rf_score_matrix(chunk, normalized_labels)):
+            memo[candidate] = _best_process_label(candidate, all_positions, rf_scores)
 
-def _matches_stopword(value: str, candidates: Sequence[str]) -> bool:
+    return {candidate: memo[candidate] for candidate in candidates}
+
+
+# 노드마다 다시 정규화하지 않도록 키워드/불용어는 한 번만 정규화
+_PROCESS_HINT_TOKENS = tuple(_normalize_token_text(item) for item in PROCESS_HINT_KEYWORDS)
+_PART_STOP_TOKENS = tuple(_normalize_token_text(item) for item in PART_STOPWORDS if item)
+_PROCESS_STOP_TOKENS = tuple(_normalize_token_text(item) for item in PROCESS_STOPWORDS if item)
+
+
+def _matches_stopword(value: str, normalized_stopwords: Sequence[str]) -> bool:
     normalized = _normalize_token_text(value)
     if not normalized:
         return False
-    return any(_normalize_token_text(candidate) in normalized for candidate in candidates if candidate)
+    return any(stopword in normalized for stopword in normalized_stopwords)
 
 
 def _classify_step_type(node: Dict[str, Any]) -> str:
@@ -182,7 +281,7 @@ def _classify_step_type(node: Dict[str, Any]) -> str:
     if any(
         keyword in normalized_text
         for normalized_text in normalized_texts
-        for keyword in (_normalize_token_text(item) for item in PROCESS_HINT_KEYWORDS)
+        for keyword in _PROCESS_HINT_TOKENS
     ):
         return "PROCESS"
 
@@ -211,7 +310,7 @@ def _build_part_identity(data: Dict[str, Any]) -> tuple[str, str]:
     db_rows, db_choices = _get_db_rows_and_choices()
     if db_rows and db_choices:
         for candidate in raw_candidates:
-            best = match_one_best(candidate, db_rows, db_choices)
+            best = match_part_best(candidate, EXCEL_DB_PATH)
             if best and float(best.get("score_combined") or 0) >= COMBINED_THRESHOLD:
                 canonical = _normalize_text(best.get("db_part_raw"))
                 if canonical:
@@ -238,33 +337,44 @@ def _build_process_identity(data: Dict[str, Any]) -> tuple[str, str]:
         if canonical:
             return canonical, canonical
 
-    process_labels = _get_db_process_labels()
-    if process_labels:
-        for candidate in raw_candidates:
-            candidate_normalized = _normalize_token_text(candidate)
-            best_label = ""
-            best_score = -1.0
-            for process_label in process_labels:
-                process_normalized = _normalize_token_text(process_label)
-                rf = rf_score(candidate_normalized, process_normalized)
-                jw = jw_score(candidate_normalized, process_normalized)
-                score = combined_score(rf, jw)
-                if score > best_score:
-                    best_score = score
-                    best_label = process_label
-            if best_label and best_score >= PROCESS_COMBINED_THRESHOLD:
-                canonical = _normalize_text(best_label)
-                return canonical, canonical
+    # 후보 순서대로 하나씩 해석 (앞 후보가 맞으면 뒤 후보는 계산하지 않음)
+    for candidate in raw_candidates:
+        candidate_normalized = _normalize_token_text(candidate)
+        canonical = _resolve_process_candidates([candidate_normalized]).get(candidate_normalized)
+        if canonical:
+            return canonical, canonical
 
     return "", ""
 
 
+def _prime_process_identities(payloads: Iterable[Dict[str, Any]]) -> None:
+    """
+    빌드 전에 모든 PROCESS 노드의 첫 후보(정확 일치가 없는 노드만)를 한 번에 해석해
+    memo를 채워 둔다. 노드별 해석은 memo 조회만 하게 된다.
+    """
+    exact_map = _get_exact_db_process_map()
+    pending: list[str] = []
+    for payload in payloads:
+        for node in payload.get("nodes") or []:
+            if _classify_step_type(node) != "PROCESS":
+                continue
+            data = node.get("data") or {}
+            normalized_candidates = [
+                _normalize_token_text(data.get(key))
+                for key in ("processKey", "label", "nodeName", "statusLabel")
+            ]
+            normalized_candidates = [value for value in normalized_candidates if value]
+            if normalized_candidates and not any(value in exact_map for value in normalized_candidates):
+                pending.append(normalized_candidates[0])
+    _resolve_process_candidates(pending)
+
+
 def _should_keep_step(step_type: str, key: str, label: str) -> bool:
     if not key:
         return False
-    if step_type == "PART" and _matches_stopword(f"{key} {label}", PART_STOPWORDS):
+    if step_type == "PART" and _matches_stopword(f"{key} {label}", _PART_STOP_TOKENS):
         return False
-    if step_type == "PROCESS" and _matches_stopword(f"{key} {label}", PROCESS_STOPWORDS):
+    if step_type == "PROCESS" and _matches_stopword(f"{key} {label}", _PROCESS_STOP_TOKENS):
         return False
     return True
 
@@ -342,8 +452,9 @@ def _add_count(bucket: Dict[str, Dict[str, int]], left_key: str, right_key: str)
     bucket[left_key][right_key] = bucket[left_key].get(right_key, 0) + 1
 
 
-def _build_documents_for_file(sequence_path: Path) -> List[WindowDocument]:
-    payload = json.loads(sequence_path.read_text(encoding="utf-8"))
+def _build_documents_for_file(sequence_path: Path, payload: Optional[Dict[str, Any]] = None) -> List[WindowDocument]:
+    if payload is None:
+        payload = json.loads(sequence_path.read_text(encoding="utf-8"))
     steps = _extract_steps(payload)
     windows = _build_part_windows(steps)
     documents: List[WindowDocument] = []
@@ -372,8 +483,14 @@ def _build_documents_for_file(sequence_path: Path) -> List[WindowDocument]:
 def build_index_from_sequence_dir(sequence_dir: Path) -> GraphIndex:
     index = GraphIndex()
 
-    for sequence_path in _iter_sequence_files(sequence_dir):
-        documents = _build_documents_for_file(sequence_path)
+    payloads = {
+        sequence_path: json.loads(sequence_path.read_text(encoding="utf-8"))
+        for sequence_path in _iter_sequence_files(sequence_dir)
+    }
+    _prime_process_identities(payloads.values())
+
+    for sequence_path, payload in payloads.items():
+        documents = _build_documents_for_file(sequence_path, payload)
         index.documents.extend(documents)
 
         for document in documents:
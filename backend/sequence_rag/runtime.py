@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from backend.sequence.schema import SequenceAIDraftRequest
+from backend.text_normalization import normalize_ascii_token_text as _normalize_token_text
 
 from .builder import build_index_from_sequence_dir, write_index
 from .models import GraphIndex
@@ -18,6 +19,7 @@ _INDEX_CACHE: Optional[GraphIndex] = None
 _INDEX_PATH_CACHE: str = ""
 logger = logging.getLogger(__name__)
 RAG_BACKEND = os.getenv("SEQUENCE_RAG_BACKEND", "hybrid").strip().lower()
+_NON_COMPACT_CHAR_RE = re.compile(r"[^A-Z0-9가-힣]+")
 
 
 def _default_sequence_dir() -> Path:
@@ -94,16 +96,6 @@ def _log_rag_result(
     return
 
 
-def _normalize_token_text(value: Any) -> str:
-    text = " ".join(str(value or "").split()).strip().upper()
-    if not text:
-        return ""
-    text = text.replace("-", " ").replace("_", " ")
-    text = re.sub(r"[^A-Z0-9/ ]+", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-
 def _token_set(value: Any) -> set[str]:
     return {token for token in _normalize_token_text(value).split(" ") if token}
 
@@ -111,7 +103,7 @@ def _token_set(value: Any) -> set[str]:
 def _is_manual_barcode_reading_process(*values: Any) -> bool:
     haystack = " ".join(str(value or "") for value in values)
     normalized = " ".join(haystack.split()).strip().upper()
-    compact = re.sub(r"[^A-Z0-9가-힣]+", "", normalized)
+    compact = _NON_COMPACT_CHAR_RE.sub("", normalized)
     has_barcode = any(keyword in normalized for keyword in ("바코드", "BAR CODE", "BAR-CODE", "BARCODE"))
     has_reading = any(keyword in normalized for keyword in ("리딩", "READ", "READING", "SCAN", "스캔"))
     return (has_barcode and has_reading) or "단순 리딩 작업" in normalized or "단순리딩작업" in compact
@@ -2,89 +2,22 @@ from __future__ import annotations
 
 import argparse
 import json
-import re
 from collections import defaultdict
 from pathlib import Path
 from typing import Any, Dict, List, Sequence, Set
 
-from openpyxl import load_workbook
+from backend.Assembly.db_snapshot import get_work_time_db_snapshot
+from backend.text_normalization import normalize_part_text as normalize_text
 
 from .neo4j_export import build_cypher_from_index
 
 
-STOP_TOKENS = {
-    "LH",
-    "RH",
-    "STD",
-    "ECE",
-    "LHD",
-    "RHD",
-    "LD",
-    "HD",
-    "EC",
-    "LEFT",
-    "RIGHT",
-    "TYPE",
-    "TYP",
-    "ASSY",
-    "S/A",
-}
-
-SYN_MAP = {
-    "BPR": "BUMPER",
-    "BUMPER": "BUMPER",
-    "BRKT": "BRACKET",
-    "BRACKET": "BRACKET",
-    "HSG": "HOUSING",
-    "HOUSING": "HOUSING",
-    "INR": "INNER",
-    "INNER": "INNER",
-    "OTR": "MAIN",
-    "OUTER": "MAIN",
-    "EXTN": "EXTENSION",
-    "EXT": "EXTENSION",
-    "EXTENSION": "EXTENSION",
-    "WIRG": "WIRING",
-    "WIRING": "WIRING",
-    "WIRE": "WIRING",
-    "TURN": "T/SIG",
-    "SIGNAL": "",
-}
-
-
-def normalize_text(value: Any) -> str:
-    if value is None:
-        return ""
-
-    text = str(value).strip()
-    if not text:
-        return ""
-
-    text = re.sub(r"\[[^\]]*\]", " ", text)
-    text = text.replace("-", " ").replace("_", " ")
-    text = text.upper()
-    text = re.sub(r"[^A-Z0-9/ ]+", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-
-    tokens: List[str] = []
-    for token in text.split(" "):
-        if not token:
-            continue
-        if token in STOP_TOKENS:
-            break
-        token = SYN_MAP.get(token, token)
-        if token:
-            tokens.append(token)
-
-    return " ".join(tokens).strip()
-
-
 def load_allowed_keys(excel_path: Path) -> Set[str]:
-    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    snapshot = get_work_time_db_snapshot(excel_path)
     allowed: Set[str] = set()
 
-    for worksheet in workbook.worksheets:
-        for row in worksheet.iter_rows(min_row=3, values_only=True):
+    for table in snapshot.tables.values():
+        for row in table.rows:
             raw = str((row[0] if row else "") or "").strip()
             if not raw:
                 continue
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Any
-from functools import lru_cache
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 
 import json
 import io
+import heapq
 from uuid import uuid4
 
+import numpy as np
+
 from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException, Request, Response, UploadFile, File, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
@@ -34,7 +36,20 @@ from backend.Lob_router import (
     append_worker_lob_sheet_to_workbook,
 )
 from pathlib import Path
-from backend.Assembly.auto_match import load_db_rows, normalize_text, rf_score, jw_score
+from backend.Assembly.auto_match import (
+    MATCH_SCORING_VERSION,
+    ChoiceTable,
+    combined_upper_bound,
+    jw_score,
+    load_choice_table,
+    load_db_rows,
+    load_match_gram_index,
+    normalize_text,
+    rf_score_many,
+)
+from backend.Assembly.db_snapshot import get_work_time_db_snapshot
+from backend.Assembly.match_cache import get_match_cache
+from backend.Assembly.db_registry import current_db_path
 from pydantic import BaseModel
 
 sub_router = APIRouter(prefix="/sub", tags=["SUB API"])
@@ -51,64 +66,145 @@ class ExcelBundleExportRequest(BaseModel):
 BASE_DIR = Path(__file__).resolve().parents[1]   # backend
 DATA_DIR = BASE_DIR / "backend" /"data"
 SESSION_STORE_PATH = DATA_DIR / "session_state.json"
-ASSEMBLY_DB_PATH = BASE_DIR / "backend" / "작업시간분석표DB.xlsx"
 MANUAL_SEQUENCE_SPEC_PREFIX = "manual-sequence-"
 
 
-@lru_cache(maxsize=4)
-def _get_cached_db_rows(excel_path_str: str, mtime: float):
-    return load_db_rows(Path(excel_path_str))
+def _suggestion_rank(item: Dict[str, Any]) -> Tuple[float, float, float, int]:
+    # 점수 내림차순, 완전 동점이면 DB 앞쪽 행 우선
+    return (
+        item["score_combined"],
+        item["score_jaro_winkler"],
+        item["score_rapidfuzz"],
+        -int(item["row_position"]),
+    )
 
 
-def _get_part_suggestions(query_values: List[str], limit: int = 5) -> List[Dict[str, Any]]:
-    if not ASSEMBLY_DB_PATH.exists():
-        raise HTTPException(status_code=500, detail=f"작업시간 분석표 DB 엑셀 없음: {ASSEMBLY_DB_PATH}")
+def _score_part_suggestions(
+    normalized_query: str,
+    db_rows: Sequence[Dict[str, Any]],
+    choice_table: ChoiceTable,
+    gram_index: Any,
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    질의 하나의 상위 limit개 제안 (부품 기준, 시트) 중복 제거
+    1) gram 역색인 후보를 먼저 훑어 힙을 빨리 채움 (가지치기가 아닌 순서 힌트)
+    2) RF를 unique 문자열에만 한 번에 계산해 내림차순으로 훑음
+    3) JW는 살아남은 unique 문자열에만 한 번 계산하고 그 문자열의 행들로 펼쳐
+       (부품 기준, 시트)별 최고점을 크기 limit 힙으로 유지
+    4) RF 상한(JW=100 가정)이 힙의 최저점보다 낮아지면 그 단계 중단
+    5) 나머지 unique 문자열도 같은 상한으로 확인 → 전체 정렬과 같은 결과
+    """
+    if limit <= 0 or len(choice_table) == 0:
+        return []
 
-    db_rows, db_choices = _get_cached_db_rows(
-        str(ASSEMBLY_DB_PATH.resolve()),
-        ASSEMBLY_DB_PATH.stat().st_mtime,
-    )
+    hinted = gram_index.candidates(normalized_query)
+    if hinted is None:
+        phases = [list(range(len(choice_table)))]
+    else:
+        hinted_set = set(hinted)
+        phases = [hinted, [uid for uid in range(len(choice_table)) if uid not in hinted_set]]
 
-    suggestions: Dict[str, Dict[str, Any]] = {}
+    best_by_key: Dict[str, Dict[str, Any]] = {}
+    top: List[Tuple[Tuple[float, float, float, int], str]] = []
+    in_top: set = set()
 
-    for query_raw in query_values:
-        normalized_query = normalize_text(query_raw)
-        if not normalized_query:
+    for uids in phases:
+        if not uids:
             continue
+        rf_scores = rf_score_many(normalized_query, [choice_table.unique[uid] for uid in uids])
+        order = np.argsort(-rf_scores, kind="stable")
+
+        for pos in order:
+            rf = float(rf_scores[pos])
+            if len(top) >= limit and combined_upper_bound(rf) < top[0][0][0]:
+                break
+
+            uid = uids[pos]
+            jw = jw_score(normalized_query, choice_table.unique[uid])
+            for index in choice_table.occurrences(uid).tolist():
+                meta = db_rows[index]
+                key = f"{meta['db_part_raw']}::{meta['sheet']}"
+                candidate = {
+                    "db_part_raw": meta["db_part_raw"],
+                    "db_part_norm": meta["db_part_norm"],
+                    "sheet": meta["sheet"],
+                    "row_index": meta["row_index"],
+                    "row_position": index,
+                    "score_rapidfuzz": round(rf, 2),
+                    "score_jaro_winkler": round(jw, 2),
+                    "score_combined": round((rf * 0.45) + (jw * 0.55), 2),
+                }
+                rank = _suggestion_rank(candidate)
+
+                previous = best_by_key.get(key)
+                if previous is not None and rank <= _suggestion_rank(previous):
+                    continue
+                best_by_key[key] = candidate
+
+                if key in in_top:
+                    top = [(_suggestion_rank(best_by_key[k]), k) for k in in_top]
+                    heapq.heapify(top)
+                elif len(top) < limit:
+                    heapq.heappush(top, (rank, key))
+                    in_top.add(key)
+                elif rank > top[0][0]:
+                    _, dropped = heapq.heapreplace(top, (rank, key))
+                    in_top.discard(dropped)
+                    in_top.add(key)
+
+    return _rank_part_suggestions(best_by_key[key] for key in in_top)[:limit]
+
+
+def _rank_part_suggestions(items) -> List[Dict[str, Any]]:
+    return sorted(items, key=_suggestion_rank, reverse=True)
 
-        for index, choice_norm in enumerate(db_choices):
-            rf = rf_score(normalized_query, choice_norm)
-            jw = jw_score(normalized_query, choice_norm)
-            combined = round((rf * 0.45) + (jw * 0.55), 2)
-            meta = db_rows[index]
-            key = f"{meta['db_part_raw']}::{meta['sheet']}"
 
+def _get_part_suggestions(query_values: List[str], limit: int = 5) -> List[Dict[str, Any]]:
+    excel_path = current_db_path()
+    if not excel_path.exists():
+        raise HTTPException(status_code=500, detail=f"작업시간 분석표 DB 엑셀 없음: {excel_path}")
+
+    db_rows, _ = load_db_rows(excel_path)
+
+    # 질의별 상위 limit개는 영구 매칭 캐시에 (정규화 질의, DB 해시, 점수 규칙 버전)으로 보관
+    normalized_by_query = {
+        query_raw: normalize_text(query_raw)
+        for query_raw in query_values
+        if normalize_text(query_raw)
+    }
+    cache = get_match_cache()
+    cache_key = {
+        "db_hash": get_work_time_db_snapshot(excel_path).content_hash,
+        "scoring_version": MATCH_SCORING_VERSION,
+        "topk": limit,
+    }
+    per_query = cache.get_many("part_suggestions", normalized_by_query.values(), **cache_key)
+
+    missing = [norm for norm in dict.fromkeys(normalized_by_query.values()) if norm not in per_query]
+    if missing:
+        choice_table = load_choice_table(excel_path)
+        gram_index = load_match_gram_index(excel_path)
+        computed = {
+            norm: _score_part_suggestions(norm, db_rows, choice_table, gram_index, limit)
+            for norm in missing
+        }
+        cache.put_many("part_suggestions", computed, **cache_key)
+        per_query.update(computed)
+
+    # 같은 (부품 기준, 시트)는 질의 간 최고 점수 하나만 남긴다
+    suggestions: Dict[str, Dict[str, Any]] = {}
+    for query_raw, normalized_query in normalized_by_query.items():
+        for item in per_query.get(normalized_query, []):
+            key = f"{item['db_part_raw']}::{item['sheet']}"
             previous = suggestions.get(key)
-            candidate = {
-                "query": query_raw,
-                "db_part_raw": meta["db_part_raw"],
-                "db_part_norm": meta["db_part_norm"],
-                "sheet": meta["sheet"],
-                "row_index": meta["row_index"],
-                "score_rapidfuzz": round(rf, 2),
-                "score_jaro_winkler": round(jw, 2),
-                "score_combined": combined,
-            }
-
-            if previous is None or candidate["score_combined"] > previous["score_combined"]:
-                suggestions[key] = candidate
-
-    ranked = sorted(
-        suggestions.values(),
-        key=lambda item: (
-            item["score_combined"],
-            item["score_jaro_winkler"],
-            item["score_rapidfuzz"],
-        ),
-        reverse=True,
-    )
+            if previous is None or _suggestion_rank(item) > _suggestion_rank(previous):
+                suggestions[key] = {"query": query_raw, **item}
 
-    return ranked[:limit]
+    return [
+        {k: v for k, v in item.items() if k != "row_position"}
+        for item in _rank_part_suggestions(suggestions.values())[:limit]
+    ]
 
 
 def _is_manual_sequence_spec(spec: Optional[str]) -> bool:
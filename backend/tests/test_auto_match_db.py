@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import pytest
+from openpyxl import Workbook
+
+from backend.Assembly import db_snapshot
+from backend.Assembly.auto_match import (
+    ASSEMBLY_COLUMNS,
+    EXCEL_HEADER_ROW,
+    find_part_col,
+    load_db_rows,
+    load_excel_rows_for_matches,
+    normalize_text,
+)
+
+
+def _write_workbook(path: Path, sheets: Dict[str, Sequence[Sequence[Any]]], header=ASSEMBLY_COLUMNS) -> Path:
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        worksheet.append([f"{name} 작업시간 분석표"])
+        worksheet.append(list(header))
+        for row in rows:
+            worksheet.append(list(row))
+    workbook.save(path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def compiled_db_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_snapshot, "COMPILED_DB_DIR", tmp_path / "db_cache")
+
+
+@pytest.fixture
+def sample_db(tmp_path) -> Path:
+    return _write_workbook(
+        tmp_path / "작업시간분석표DB.xlsx",
+        {
+            "도어": [
+                ["도어 트림 ASSY", "체결", "LH", "A", 1, "볼트 체결", 2, 1.5, 3.0],
+                [None, None, None, "A", 2, "커넥터 연결", 1, 2, 2],
+                [None, "검사", "RH", None, None, "외관 확인", None, 0.5, None],
+                ["도어 웨더스트립", "부착", None, "B", 1, "부착", 1, 3, 3],
+                [None, None, None, None, None, None, None, None, None],
+                ["  도어 트림 ASSY  ", "체결", "LH", "A", 1, "클립 체결", 4, 0.25, 1],
+            ],
+            "범퍼": [
+                ["프론트 범퍼", "장착", "OPT-1", "C", 1, "장착", 1, 10, 10],
+                ["리어 범퍼 커버", "장착", None, "D", 1, "장착", 1, 7.5, 7.5],
+                [None, None, None, None, None, None, None, None, None],
+            ],
+            "대형램프 DB": [["헤드 램프", "장착", None, "E", 1, "장착", 1, 4, 4]],
+        },
+    )
+
+
+def _reference_db_rows(excel_path: Path) -> List[Dict[str, Any]]:
+    # 기존 pd.read_excel 구현 (빈 칸 제외, str().strip())
+    pd = pytest.importorskip("pandas")
+    db_rows = []
+    for sheet in pd.ExcelFile(excel_path).sheet_names:
+        if sheet == "대형램프 DB":
+            continue
+        df = pd.read_excel(excel_path, sheet_name=sheet, header=EXCEL_HEADER_ROW)
+        part_col = find_part_col(df.columns)
+        for idx, val in df[part_col].items():
+            if pd.isna(val) or not str(val).strip():
+                continue
+            raw = str(val).strip()
+            db_rows.append({"db_part_raw": raw, "db_part_norm": normalize_text(raw), "sheet": sheet, "row_index": int(idx)})
+    return db_rows
+
+
+def test_db_rows_match_pandas_for_text_parts(sample_db):
+    db_rows, db_choices = load_db_rows(sample_db)
+    assert list(db_rows) == _reference_db_rows(sample_db)
+    assert list(db_choices) == [row["db_part_norm"] for row in db_rows]
+
+
+def test_rows_for_matches_cover_each_part_block(sample_db):
+    db_rows, _ = load_db_rows(sample_db)
+    rows = load_excel_rows_for_matches(sample_db, [db_rows[2], db_rows[0]])
+    assert [row["동작요소"] for row in rows] == ["볼트 체결", "커넥터 연결", "외관 확인", "클립 체결"]
+    assert rows[0] == {
+        "부품 기준": "도어 트림 ASSY", "요소작업": "체결", "OPTION": "LH", "작업자": "A", "no": "1",
+        "동작요소": "볼트 체결", "반복횟수": "2", "SEC": "1.5", "TOTAL": "3",
+    }
+    assert rows[2]["부품 기준"] == "" and rows[2]["no"] == "" and rows[2]["TOTAL"] == ""
+
+    bumper = load_excel_rows_for_matches(sample_db, [db_rows[4]])
+    assert [row["부품 기준"] for row in bumper] == ["리어 범퍼 커버"]
+
+
+def test_cells_use_plain_str_instead_of_pandas_dtypes(tmp_path):
+    """
+    값은 openpyxl 값의 str().strip() 그대로 (pandas dtype 추론을 따라 하지 않음).
+    pd.read_excel과 다른 점을 여기서 고정한다:
+    - 빈 칸이 섞인 숫자 컬럼: pandas는 float64라 "2.0", 여기서는 "2"
+    - 빈 칸: pandas는 "nan", 여기서는 ""
+    - 공백만 있는 셀은 부품 시작으로 보지 않는다 (pandas도 strip 후 빈 문자열은 건너뜀)
+    """
+    pd = pytest.importorskip("pandas")
+    path = _write_workbook(
+        tmp_path / "numeric.xlsx",
+        {"S": [[100, "a", None, None, 2], ["   ", "b"], [None, "c"], [200.5, "d", None, None, None]]},
+    )
+    db_rows, _ = load_db_rows(path)
+    assert [(row["db_part_raw"], row["row_index"]) for row in db_rows] == [("100", 0), ("200.5", 3)]
+    assert [row["db_part_raw"] for row in _reference_db_rows(path)] == ["100", "200.5"]
+
+    rows = load_excel_rows_for_matches(path, [db_rows[0]])
+    assert [row["no"] for row in rows] == ["2", "", ""]
+    df = pd.read_excel(path, sheet_name="S", header=EXCEL_HEADER_ROW)
+    assert [str(value) for value in df["no"][:3]] == ["2.0", "nan", "nan"]
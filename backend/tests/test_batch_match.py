@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import random
+import threading
+from typing import Any, Dict, List
+
+import pytest
+from rapidfuzz import fuzz, process
+
+from backend.Assembly import batch_match
+from backend.Assembly.auto_match import (
+    ChoiceTable,
+    combined_score,
+    jw_score,
+    match_many_best,
+    match_many_topk,
+    normalize_text,
+)
+
+TOKENS = ["도어", "트림", "ASSY", "범퍼", "커버", "LH", "RH", "브라켓", "볼트", "클립", "A1", "b-2"]
+
+
+def _random_text(rnd: random.Random) -> str:
+    return " ".join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 4)))
+
+
+def _reference_topk(query_raw: str, db_rows, db_choices: List[str], topk: int, score_cutoff=None) -> List[Dict[str, Any]]:
+    # 중복 제거 없이 전체 선택지에 plain process.extract → JW 내림차순 안정 정렬
+    qn = normalize_text(query_raw)
+    if not qn:
+        return []
+    ranked = []
+    for _, rf, idx in process.extract(
+        qn, db_choices, scorer=fuzz.WRatio, processor=None, limit=topk, score_cutoff=score_cutoff
+    ):
+        meta = db_rows[idx]
+        jw = jw_score(qn, meta["db_part_norm"])
+        ranked.append({
+            "json_id_raw": query_raw,
+            "json_id_norm": qn,
+            "db_part_raw": meta["db_part_raw"],
+            "db_part_norm": meta["db_part_norm"],
+            "score_rapidfuzz": float(rf),
+            "score_jw": jw,
+            "score_combined": combined_score(rf, jw),
+            "sheet": meta["sheet"],
+            "row_index": meta["row_index"],
+        })
+    ranked.sort(key=lambda item: item["score_jw"], reverse=True)
+    return ranked
+
+
+# =========================
+# 점수 행렬 일괄 매칭 ↔ plain process.extract
+# =========================
+@pytest.mark.parametrize("score_cutoff", [None, 60.0])
+def test_match_many_topk_matches_plain_extract(score_cutoff):
+    rnd = random.Random(7)
+    texts = [_random_text(rnd) for _ in range(60)]
+    raws = [rnd.choice(texts) for _ in range(300)]
+    db_rows = [
+        {"db_part_raw": raw, "db_part_norm": normalize_text(raw), "sheet": f"S{i % 3}", "row_index": i}
+        for i, raw in enumerate(raws)
+    ]
+    db_choices = [row["db_part_norm"] for row in db_rows]
+    queries = [_random_text(rnd) for _ in range(40)] + [raws[0], raws[0], "", "   "]
+    table = ChoiceTable.build(db_choices)
+
+    for topk in (1, 5, 12):
+        batched = match_many_topk(queries, db_rows, db_choices, topk, score_cutoff)
+        assert batched == match_many_topk(queries, db_rows, db_choices, topk, score_cutoff, table)
+        best = match_many_best(queries, db_rows, db_choices, topk, score_cutoff, table)
+        for query, ranked, first in zip(queries, batched, best):
+            reference = _reference_topk(query, db_rows, db_choices, topk, score_cutoff)
+            assert ranked == reference
+            assert first == (reference[0] if reference else None)
+
+
+# =========================
+# 사전 매칭 백그라운드 예약
+# =========================
+@pytest.fixture
+def prematch_calls(monkeypatch):
+    # prematch_bom_run 대신 호출만 기록하고 release 전까지 대기
+    calls: List[Any] = []
+    release = threading.Event()
+    finished = threading.Event()
+
+    def fake_prematch(root, excel_path, *, topk=batch_match.TOPK):
+        calls.append((root, excel_path, topk))
+        release.wait(5)
+        finished.set()
+        return {"queryCount": 0, "seconds": 0.0}
+
+    monkeypatch.setattr(batch_match, "prematch_bom_run", fake_prematch)
+    yield calls, release, finished
+    release.set()
+
+
+def test_schedule_prematch_is_single_flight(tmp_path, prematch_calls):
+    calls, release, finished = prematch_calls
+    excel_path = tmp_path / "db.xlsx"
+
+    assert batch_match.schedule_prematch_bom_run(tmp_path, excel_path) is True
+    assert batch_match.schedule_prematch_bom_run(tmp_path, excel_path) is False
+    release.set()
+    assert finished.wait(5)
+
+    for _ in range(100):
+        if str(tmp_path.resolve()) not in batch_match._PREMATCH_RUNNING:
+            break
+        threading.Event().wait(0.01)
+    assert calls == [(tmp_path, excel_path, batch_match.TOPK)]
+    assert str(tmp_path.resolve()) not in batch_match._PREMATCH_RUNNING
+
+
+def test_load_miss_schedules_prematch_only_for_imported_trees(tmp_path, prematch_calls, monkeypatch):
+    calls, release, finished = prematch_calls
+    excel_path = tmp_path / "db.xlsx"
+    monkeypatch.setattr(batch_match, "_prematch_header", lambda path, topk: {"topk": topk})
+
+    # 트리 캐시가 없으면(임포트 전) 예약하지 않음
+    assert batch_match.load_prematched_matches(tmp_path, excel_path) == {}
+    # TopK가 다른 조회도 기본 사전 매칭을 예약하지 않음
+    (tmp_path / batch_match.TREE_SPECS_CACHE_FILENAME).write_text("{}", encoding="utf-8")
+    assert batch_match.load_prematched_matches(tmp_path, excel_path, topk=batch_match.TOPK + 1) == {}
+    assert calls == []
+
+    assert batch_match.load_prematched_matches(tmp_path, excel_path) == {}
+    release.set()
+    assert finished.wait(5)
+    assert calls == [(tmp_path, excel_path, batch_match.TOPK)]
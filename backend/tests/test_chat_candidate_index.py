@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pytest
+
+from backend.sequence import embedding_search
+from backend.sequence.embedding_search import (
+    _clean_text,
+    _match_candidate_parts,
+    _match_process_templates,
+    _normalize_key,
+    _read_value,
+)
+
+KEYS = ["", "A", "a ", "B-1", "b 1", "C", None, "D_x", "  d x"]
+SHEETS = ["S1", "S2", " S1", None, ""]
+
+
+# =========================
+# 기존 선형 구현 참조
+# =========================
+def _reference_candidate_parts(hits: List[Dict[str, Any]], candidate_parts: Sequence[Any], *, limit: int):
+    if not hits or not candidate_parts:
+        return []
+
+    by_key: Dict[str, List[Any]] = {}
+    for part in candidate_parts:
+        for field in ("partBase", "partName", "partId", "nodeName"):
+            key = _normalize_key(_read_value(part, field))
+            if key:
+                by_key.setdefault(key, []).append(part)
+
+    ranked = []
+    seen = set()
+    for hit in hits:
+        hit_key = _normalize_key(hit.get("partBase"))
+        if not hit_key:
+            continue
+        preferred_sheet = _clean_text(hit.get("sourceSheet"))
+        candidates = sorted(
+            by_key.get(hit_key) or [],
+            key=lambda item: (
+                0 if _clean_text(_read_value(item, "sourceSheet")) == preferred_sheet else 1,
+                str(_read_value(item, "nodeName") or _read_value(item, "partBase") or ""),
+            ),
+        )
+        for candidate in candidates:
+            dedupe_key = tuple(_clean_text(_read_value(candidate, f)) for f in ("nodeName", "partBase", "sourceSheet"))
+            if dedupe_key in seen:
+                continue
+            seen.add(dedupe_key)
+            ranked.append({
+                "kind": "PART",
+                "item": candidate,
+                "embeddingScore": float(hit.get("embeddingScore") or 0),
+                "text": hit.get("text") or "",
+            })
+            if len(ranked) >= limit:
+                return ranked
+    return ranked
+
+
+def _template_triple(item: Any) -> Tuple[str, str, str]:
+    return tuple(_clean_text(_read_value(item, f)) for f in ("processKey", "partBase", "sourceSheet"))
+
+
+def _reference_process_templates(hits: List[Dict[str, Any]], process_templates: Sequence[Any], *, limit: int):
+    if not hits or not process_templates:
+        return []
+
+    by_key = {}
+    for process in process_templates:
+        key = _template_triple(process)
+        if key[0]:
+            by_key[key] = process
+
+    ranked = []
+    seen = set()
+    for hit in hits:
+        exact_key = _template_triple(hit)
+        matched = by_key.get(exact_key)
+        if matched is None:
+            matched = next((p for p in process_templates if _template_triple(p)[0] == exact_key[0]), None)
+        if matched is None:
+            continue
+        dedupe_key = _template_triple(matched)
+        if dedupe_key in seen:
+            continue
+        seen.add(dedupe_key)
+        ranked.append({
+            "kind": "PROCESS",
+            "item": matched,
+            "embeddingScore": float(hit.get("embeddingScore") or 0),
+            "text": hit.get("text") or "",
+        })
+        if len(ranked) >= limit:
+            return ranked
+    return ranked
+
+
+def _same(expected, actual) -> bool:
+    # 결과 item은 이번 요청 목록의 바로 그 객체여야 한다
+    return expected == actual and [id(x["item"]) for x in expected] == [id(x["item"]) for x in actual]
+
+
+@pytest.fixture(autouse=True)
+def empty_match_index_cache():
+    embedding_search._MATCH_INDEX_CACHE.clear()
+    yield
+    embedding_search._MATCH_INDEX_CACHE.clear()
+
+
+def test_keyed_lookups_match_linear_scan():
+    rnd = random.Random(1)
+
+    def part(i):
+        return {
+            "partBase": rnd.choice(KEYS),
+            "partName": rnd.choice(KEYS),
+            "partId": rnd.choice(KEYS),
+            "nodeName": rnd.choice(KEYS + ["Z", "Y"]),
+            "sourceSheet": rnd.choice(SHEETS),
+            "i": i,
+        }
+
+    def template(i):
+        return {"processKey": rnd.choice(KEYS), "partBase": rnd.choice(KEYS), "sourceSheet": rnd.choice(SHEETS), "i": i}
+
+    def hit():
+        return {
+            "partBase": rnd.choice(KEYS),
+            "processKey": rnd.choice(KEYS),
+            "sourceSheet": rnd.choice(SHEETS),
+            "embeddingScore": rnd.random(),
+            "text": "t",
+        }
+
+    for trial in range(500):
+        parts = [part(i) for i in range(rnd.randint(0, 25))]
+        templates = [template(i) for i in range(rnd.randint(0, 25))]
+        hits = [hit() for _ in range(rnd.randint(0, 15))]
+        limit = rnd.randint(1, 30)
+
+        assert _same(_reference_candidate_parts(hits, parts, limit=limit), _match_candidate_parts(hits, parts, limit=limit))
+        expected = _reference_process_templates(hits, templates, limit=limit)
+        assert _same(expected, _match_process_templates(hits, templates, limit=limit))
+        assert _same(expected, _match_process_templates(hits, templates, limit=limit, version=("v", trial)))
+
+        # 같은 내용의 새 목록(요청마다 새로 만든 dict)도 캐시된 색인으로 이번 목록의 item을 돌려준다
+        copies = [dict(t) for t in templates]
+        assert _same(
+            _reference_process_templates(hits, copies, limit=limit),
+            _match_process_templates(hits, copies, limit=limit, version=("v", trial)),
+        )
+        part_copies = [dict(p) for p in parts]
+        assert _same(
+            _reference_candidate_parts(hits, part_copies, limit=limit),
+            _match_candidate_parts(hits, part_copies, limit=limit),
+        )
+
+
+def test_stale_version_reindexes_by_content():
+    first = [
+        {"processKey": "P1", "partBase": "A", "sourceSheet": "S"},
+        {"processKey": "P2", "partBase": "B", "sourceSheet": "S"},
+    ]
+    second = [dict(first[1]), dict(first[0])]
+    hits = [{"processKey": "P1", "partBase": "A", "sourceSheet": "S"}]
+
+    assert _match_process_templates(hits, first, limit=5, version="same")[0]["item"] is first[0]
+    assert _match_process_templates(hits, second, limit=5, version="same")[0]["item"] is second[1]
+
+
+def test_version_hit_skips_content_fingerprint(monkeypatch):
+    templates = [{"processKey": "P1", "partBase": "A", "sourceSheet": "S"}]
+    hits = [{"processKey": "P1", "partBase": "A", "sourceSheet": "S"}]
+    _match_process_templates(hits, templates, limit=5, version=("db", "hash"))
+
+    def fail_fingerprint(*args, **kwargs):
+        raise AssertionError("버전 키 적중이면 목록 내용을 훑지 않아야 한다")
+
+    monkeypatch.setattr(embedding_search, "_content_fingerprint", fail_fingerprint)
+    copies = [dict(t) for t in templates]
+    assert _match_process_templates(hits, copies, limit=5, version=("db", "hash"))[0]["item"] is copies[0]
+
+
+def test_unhashable_key_values():
+    parts = [{"partBase": ["A"], "nodeName": {"x": 1}}, {"partBase": "A", "nodeName": "N"}]
+    templates = [{"processKey": ["P1"], "partBase": "A"}, {"processKey": "P1", "partBase": "A"}]
+    part_hits = [{"partBase": "A"}]
+    process_hits = [{"processKey": "P1", "partBase": "A"}]
+
+    assert _same(
+        _reference_candidate_parts(part_hits, parts, limit=3),
+        _match_candidate_parts(part_hits, parts, limit=3),
+    )
+    assert _same(
+        _reference_process_templates(process_hits, templates, limit=3),
+        _match_process_templates(process_hits, templates, limit=3),
+    )
+
+
+def test_request_templates_of_same_length_are_content_keyed():
+    # 요청 템플릿은 버전 없이 내용 digest로 캐시 → 길이가 같은 다른 목록이 이전 색인을 재사용하지 않는다
+    first = [
+        {"processKey": "P1", "partBase": "A", "sourceSheet": "S"},
+        {"processKey": "P2", "partBase": "B", "sourceSheet": "S"},
+    ]
+    second = [
+        {"processKey": "P3", "partBase": "C", "sourceSheet": "S"},
+        {"processKey": "P2", "partBase": "B", "sourceSheet": "S"},
+    ]
+    hits = [
+        {"processKey": "P3", "partBase": "C", "sourceSheet": "S"},
+        {"processKey": "P1", "partBase": "A", "sourceSheet": "S"},
+    ]
+
+    assert [x["item"] for x in _match_process_templates(hits, first, limit=5)] == [first[0]]
+    assert _same(_reference_process_templates(hits, second, limit=5), _match_process_templates(hits, second, limit=5))
+    assert _match_process_templates(hits, second, limit=5)[0]["item"] is second[0]
+
+
+def test_only_server_templates_get_a_version_key(monkeypatch):
+    router = pytest.importorskip("backend.Seuqence_router")
+
+    class _Snapshot:
+        content_hash = "hash"
+
+    monkeypatch.setattr(router, "get_work_time_db_snapshot", lambda path: _Snapshot())
+    assert router._effective_process_templates_version(None) == ("db", "hash")
+    assert router._effective_process_templates_version([]) == ("db", "hash")
+    assert router._effective_process_templates_version([{"processKey": "P1"}]) is None
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+
+from backend.Assembly import db_snapshot
+from backend.Assembly.auto_match import ASSEMBLY_COLUMNS, ChoiceTable, load_choice_table, load_db_rows
+
+
+@pytest.fixture(autouse=True)
+def compiled_db_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_snapshot, "COMPILED_DB_DIR", tmp_path / "db_cache")
+
+
+@pytest.fixture
+def sample_db(tmp_path) -> Path:
+    # 같은 부품 기준이 시트 안/시트 사이에 반복되는 DB
+    sheets = {
+        "DOOR": ["DOOR TRIM ASSY", "WEATHER STRIP", "door trim assy", "DOOR TRIM ASSY"],
+        "BUMPER": ["FRONT BUMPER", "DOOR TRIM ASSY", None, "REAR BUMPER COVER", "FRONT BUMPER"],
+    }
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for name, parts in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        worksheet.append([f"{name} 작업시간 분석표"])
+        worksheet.append(list(ASSEMBLY_COLUMNS))
+        for part in parts:
+            worksheet.append([part, "체결", None, "A", 1, "체결", 1, 1, 1])
+    path = tmp_path / "작업시간분석표DB.xlsx"
+    workbook.save(path)
+    return path
+
+
+def test_choice_table_groups_rows_in_first_seen_order():
+    choices = ["b", "a", "b", "c", "a", "b"]
+    table = ChoiceTable.build(choices)
+    assert table.unique == ["b", "a", "c"]
+    assert table.row_count == len(choices)
+    assert [table.occurrences(uid).tolist() for uid in range(len(table))] == [[0, 2, 5], [1, 4], [3]]
+    assert table.rows_of_text("a").tolist() == [1, 4]
+    assert table.rows_of_text("zz").tolist() == []
+
+
+def test_expand_topk_breaks_ties_by_row_position():
+    table = ChoiceTable.build(["b", "a", "b", "c", "a", "b"])
+    # unique 점수를 행으로 펼치고 동점은 행 위치 오름차순, topk로 자름
+    assert table.expand_topk([(0, 90.0), (1, 90.0), (2, 80.0)], 4) == [(0, 90.0), (1, 90.0), (2, 90.0), (4, 90.0)]
+    assert table.expand_topk([(2, 80.0), (1, 70.0)], 10) == [(3, 80.0), (1, 70.0), (4, 70.0)]
+
+
+def test_load_choice_table_covers_db_rows(sample_db):
+    db_rows, db_choices = load_db_rows(sample_db)
+    table = load_choice_table(sample_db)
+    assert table is load_choice_table(sample_db)
+    assert len(table) < len(db_rows)
+    for uid, text in enumerate(table.unique):
+        rows = table.occurrences(uid).tolist()
+        assert rows and [db_choices[i] for i in rows] == [text] * len(rows)
+    assert sorted(table.rows.tolist()) == list(range(len(db_rows)))
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import datetime
+import json
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+import pytest
+from openpyxl import Workbook
+
+from backend.Assembly import db_snapshot
+from backend.Assembly.db_snapshot import (
+    compile_work_time_db,
+    compiled_db_path,
+    load_work_time_db,
+    parse_work_time_db,
+    prune_compiled_snapshots,
+)
+
+
+def _write_workbook(path: Path, sheets: Dict[str, Sequence[Sequence[Any]]]) -> Path:
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        worksheet.append([f"{name} 작업시간 분석표"])
+        worksheet.append(["부품 기준", "요소작업", "SEC", "등록일"])
+        for row in rows:
+            worksheet.append(list(row))
+    workbook.save(path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def compiled_db_dir(tmp_path, monkeypatch):
+    target = tmp_path / "db_cache"
+    monkeypatch.setattr(db_snapshot, "COMPILED_DB_DIR", target)
+    return target
+
+
+def test_round_trip_without_reparsing(tmp_path, compiled_db_dir, monkeypatch):
+    path = _write_workbook(
+        tmp_path / "작업시간분석표DB.xlsx",
+        {
+            "도어": [
+                ["도어 트림", "체결", 1.5, datetime.datetime(2024, 3, 1, 9, 30)],
+                [None, None, 2, datetime.time(8, 15)],
+                [True, "", 3.0, None],
+            ],
+            "빈 시트": [],
+        },
+    )
+    parsed = load_work_time_db(path)
+    target = compiled_db_path(path, parsed.content_hash)
+    assert target.parent == compiled_db_dir
+    assert json.loads(target.read_text(encoding="utf-8"))["contentHash"] == parsed.content_hash
+
+    def fail_parse(*args, **kwargs):
+        raise AssertionError("컴파일 캐시가 있으면 xlsx를 다시 파싱하지 않아야 한다")
+
+    monkeypatch.setattr(db_snapshot, "parse_work_time_db", fail_parse)
+    loaded = load_work_time_db(path)
+    assert loaded.sheet_names == parsed.sheet_names
+    for name in parsed.sheet_names:
+        assert loaded.tables[name].header == parsed.tables[name].header
+        assert loaded.tables[name].rows == parsed.tables[name].rows
+        for got, expected in zip(loaded.tables[name].rows, parsed.tables[name].rows):
+            assert [type(value) for value in got] == [type(value) for value in expected]
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda payload: payload.update(contentHash="0" * 64),
+        lambda payload: payload["sheets"][0]["columns"][0].pop(),
+        lambda payload: payload["sheets"][0].pop("columns"),
+    ],
+)
+def test_mismatched_or_broken_cache_is_reparsed(tmp_path, corrupt):
+    path = _write_workbook(tmp_path / "db.xlsx", {"S": [["A", "x", 1, None], ["B", "y", 2, None]]})
+    digest = load_work_time_db(path).content_hash
+    target = compiled_db_path(path, digest)
+    payload = json.loads(target.read_text(encoding="utf-8"))
+    corrupt(payload)
+    target.write_text(json.dumps(payload), encoding="utf-8")
+
+    assert db_snapshot.load_compiled_snapshot(path, digest) is None
+    assert load_work_time_db(path).tables["S"].rows == parse_work_time_db(path).tables["S"].rows
+
+
+def test_prune_keeps_same_stem_caches_of_other_sources(tmp_path):
+    v1 = tmp_path / "v1"
+    v2 = tmp_path / "v2"
+    v1.mkdir()
+    v2.mkdir()
+    first = _write_workbook(v1 / "작업시간분석표DB.xlsx", {"S": [["A", "x"]]})
+    second = _write_workbook(v2 / "작업시간분석표DB.xlsx", {"S": [["B", "y"]]})
+
+    old_hash = load_work_time_db(first).content_hash
+    other_hash = load_work_time_db(second).content_hash
+    assert compiled_db_path(first, old_hash) != compiled_db_path(second, old_hash)
+
+    _write_workbook(first, {"S": [["A", "changed"]]})
+    result = compile_work_time_db(first)
+    assert result["status"] == "compiled"
+    assert result["stale_removed"] == 1
+    assert not compiled_db_path(first, old_hash).exists()
+    assert compiled_db_path(first, result["hash"]).exists()
+    assert compiled_db_path(second, other_hash).exists()
+    assert prune_compiled_snapshots(first, result["hash"]) == []
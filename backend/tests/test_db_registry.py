@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+# db_registry는 BOM 모듈(pythoncom/win32com)을 함께 불러오므로 Windows 환경에서만 돈다
+db_registry = pytest.importorskip("backend.Assembly.db_registry")
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    versions_dir = tmp_path / "work_time_dbs"
+    versions_dir.mkdir()
+    (versions_dir / "v2.xlsx").write_bytes(b"")
+    bom_runs = tmp_path / "bom_runs"
+    for bom_id, meta in {"bom-v2": {"workTimeDb": "v2"}, "bom-plain": {}, "bom-gone": {"workTimeDb": "v9"}}.items():
+        (bom_runs / bom_id).mkdir(parents=True)
+        (bom_runs / bom_id / "bom_meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    monkeypatch.setattr(db_registry, "DB_VERSIONS_DIR", versions_dir)
+    monkeypatch.setattr(db_registry, "BOM_RUNS_DIR", bom_runs)
+    db_registry._cached_bom_db_version.cache_clear()
+    yield versions_dir
+    db_registry._cached_bom_db_version.cache_clear()
+
+
+def test_body_bom_id_selects_bom_version(registry):
+    with db_registry.use_bom_db_version("bom-v2") as path:
+        assert path == registry / "v2.xlsx"
+        assert db_registry.current_db_version() == "v2"
+    assert db_registry.current_db_version() == db_registry.DEFAULT_DB_VERSION
+
+
+@pytest.mark.parametrize("bom_id", [None, "", "bom-plain", "missing", "../bom-v2"])
+def test_bom_without_version_keeps_current(registry, bom_id):
+    with db_registry.use_bom_db_version(bom_id) as path:
+        assert path == db_registry.EXCEL_PATH
+        assert db_registry.current_db_version() == db_registry.DEFAULT_DB_VERSION
+
+
+def test_explicit_selection_wins_over_bom(registry):
+    with db_registry.use_db_version(db_registry.DEFAULT_DB_VERSION):
+        with db_registry.use_bom_db_version("bom-v2"):
+            assert db_registry.current_db_version() == db_registry.DEFAULT_DB_VERSION
+
+
+def test_unknown_bom_version_is_rejected(registry):
+    with pytest.raises(db_registry.UnknownDbVersionError):
+        with db_registry.use_bom_db_version("bom-gone"):
+            pass
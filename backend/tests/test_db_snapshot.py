@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+from openpyxl import Workbook, load_workbook
+
+from backend.Assembly.db_snapshot import FIRST_DATA_ROW, HEADER_ROW, parse_work_time_db
+
+HEADER = ["부품 기준", "요소작업", "OPTION", "작업자", "no", "동작요소", "반복횟수", "SEC", "TOTAL"]
+
+
+def _write_workbook(path: Path, sheets: Dict[str, Sequence[Sequence[Any]]]) -> Path:
+    # 작업시간분석표DB.xlsx 레이아웃: 1행 제목, 2행 헤더, 3행부터 데이터
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        worksheet.append([f"{name} 작업시간 분석표"])
+        worksheet.append(HEADER)
+        for row in rows:
+            worksheet.append(list(row))
+    workbook.save(path)
+    return path
+
+
+def _sample_db(tmp_path: Path) -> Path:
+    return _write_workbook(
+        tmp_path / "작업시간분석표DB.xlsx",
+        {
+            "도어": [
+                ["도어 트림 ASSY", "체결", "LH", "A", 1, "볼트 체결", 2, 1.5, 3.0],
+                [None, None, None, "A", 2, "커넥터 연결", 1, 2, 2],
+                [None, "검사", "RH", None, None, "외관 확인", None, 0.5, None],
+                ["도어 웨더스트립", "부착", None, "B", 1, "부착", 1, 3, 3],
+                [None, None, None, None, None, None, None, None, None],
+                ["  도어 트림 ASSY  ", "체결", "LH", "A", 1, "클립 체결", 4, 0.25, 1],
+            ],
+            "범퍼": [
+                ["프론트 범퍼", "장착", "OPT-1", "C", 1, "장착", 1, 10, 10],
+                [2024, "장착", None, "C", 2, "정렬", 2, 5, 10],
+                [None, None, None, None, None, None, None, None, None],
+            ],
+            "메모": [],
+        },
+    )
+
+
+# =========================
+# openpyxl 일괄 파싱 ↔ 셀 단위(ws.cell) 읽기
+# =========================
+def test_parse_matches_cell_reads(tmp_path):
+    path = _sample_db(tmp_path)
+    snapshot = parse_work_time_db(path)
+    workbook = load_workbook(path, data_only=True)
+    try:
+        assert snapshot.sheet_names == workbook.sheetnames
+        for worksheet in workbook.worksheets:
+            table = snapshot.tables[worksheet.title]
+            width = len(table.header)
+            assert width >= worksheet.max_column
+            assert table.header == tuple(worksheet.cell(HEADER_ROW, col).value for col in range(1, width + 1))
+            # read_only 모드는 시트 dimension까지 읽어 끝쪽에 셀 없는 빈 행이 더 있을 수 있다
+            assert len(table.rows) >= max(worksheet.max_row - HEADER_ROW, 0)
+            for index, row in enumerate(table.rows):
+                assert len(row) == width
+                excel_row = table.excel_row(index)
+                assert excel_row == FIRST_DATA_ROW + index
+                assert row == tuple(worksheet.cell(excel_row, col).value for col in range(1, width + 1))
+    finally:
+        workbook.close()
+
+
+def test_short_rows_are_padded_to_sheet_width(tmp_path):
+    path = _write_workbook(tmp_path / "db.xlsx", {"S": [["A"], ["B", 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]]})
+    table = parse_work_time_db(path).tables["S"]
+    assert len(table.header) == 11
+    assert table.header[9:] == (None, None)
+    assert all(len(row) == 11 for row in table.rows)
+    assert table.rows[0] == ("A",) + (None,) * 10
+
+
+def test_sequence_rows_fill_down(tmp_path):
+    rows = parse_work_time_db(_sample_db(tmp_path)).sequence_rows["도어"]
+    assert [(item["row"], item["partBase"], item["processLabel"], item["option"]) for item in rows] == [
+        (3, "도어 트림 ASSY", "체결", "LH"),
+        (4, "도어 트림 ASSY", "체결", "LH"),
+        (5, "도어 트림 ASSY", "검사", "RH"),
+        (6, "도어 웨더스트립", "부착", "RH"),
+        (7, "도어 웨더스트립", "부착", "RH"),
+        (8, "도어 트림 ASSY", "체결", "LH"),
+    ]
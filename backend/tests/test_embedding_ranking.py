@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from backend.sequence import embedding_search
+
+
+def _index(rows: int, parts: int, seed: int = 3):
+    rnd = np.random.default_rng(seed)
+    matrix = rnd.standard_normal((rows, 8)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return {
+        "vectors": matrix,
+        "offsets": {"parts": (0, parts), "processes": (parts, rows)},
+        "parts": [{"kind": "part", "row": i} for i in range(parts)],
+        "processes": [{"kind": "process", "row": i} for i in range(rows - parts)],
+    }
+
+
+@pytest.mark.parametrize("limit", [1, 4, 50])
+def test_rank_matches_full_sort_and_leaves_metadata(limit):
+    index = _index(40, 15)
+    query = index["vectors"][7] + 0.1
+    scores = index["vectors"] @ query
+    ranked = embedding_search._rank_index_vectors(query, index, {"parts": limit, "processes": limit})
+
+    for kind in ("parts", "processes"):
+        start, end = index["offsets"][kind]
+        order = sorted(range(end - start), key=lambda i: (-scores[start + i], i))[:limit]
+        assert [hit["row"] for hit in ranked[kind]] == order
+        assert all("embeddingScore" not in item for item in index[kind])
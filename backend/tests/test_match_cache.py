@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from backend.Assembly.match_cache import MatchCache
+
+KEY = {"db_hash": "hash-1", "scoring_version": 3, "topk": 5}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MatchCache(tmp_path / "match_cache.sqlite3", max_entries=3)
+
+
+def _last_used(cache: MatchCache, query: str) -> float:
+    return cache._connect().execute(
+        "SELECT last_used FROM match_results WHERE query = ?", (query,)
+    ).fetchone()[0]
+
+
+def test_round_trip(cache):
+    payload = {"도어": [{"db_part_raw": "도어 트림", "score_combined": 91.5}], "범퍼": []}
+    cache.put_many("part_suggestions", payload, **KEY)
+    assert cache.get_many("part_suggestions", ["도어", "범퍼", "없음", "", "도어"], **KEY) == payload
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["writes"] == 2
+    assert stats["entries"] == 2
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [("db_hash", "hash-2"), ("scoring_version", 4), ("topk", 10)],
+)
+def test_key_change_invalidates(cache, field, value):
+    cache.put_many("auto_match", {"q": {"v": 1}}, **KEY)
+    assert cache.get_many("auto_match", ["q"], **{**KEY, field: value}) == {}
+    assert cache.get_many("part_suggestions", ["q"], **KEY) == {}
+    assert cache.get_many("auto_match", ["q"], **KEY) == {"q": {"v": 1}}
+
+
+def test_hits_do_not_write_until_next_put(cache):
+    cache.put_many("auto_match", {"q": 1}, **KEY)
+    written = _last_used(cache, "q")
+
+    # 다른 연결이 쓰기 잠금을 잡고 있어도 조회는 막히지 않는다
+    blocker = sqlite3.connect(str(cache.path), timeout=0)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        assert cache.get_many("auto_match", ["q"], **KEY) == {"q": 1}
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert cache.stats()["pendingTouches"] == 1
+    assert _last_used(cache, "q") == written
+
+    cache.put_many("auto_match", {"other": 2}, **KEY)
+    assert cache.stats()["pendingTouches"] == 0
+    assert _last_used(cache, "q") > written
+
+
+def test_trim_evicts_least_recently_used(cache):
+    for index, query in enumerate(["a", "b", "c", "d", "e"]):
+        cache.put_many("auto_match", {query: index}, **KEY)
+    assert cache.get_many("auto_match", ["a"], **KEY) == {"a": 0}
+
+    assert cache.trim() == 2
+    assert set(cache.get_many("auto_match", ["a", "b", "c", "d", "e"], **KEY)) == {"a", "d", "e"}
+    assert cache.stats()["evictions"] == 2
+
+
+def test_clear(cache):
+    cache.put_many("auto_match", {"q": 1}, **KEY)
+    cache.get_many("auto_match", ["q"], **KEY)
+    cache.clear()
+    assert cache.get_many("auto_match", ["q"], **KEY) == {}
+    assert cache.stats()["entries"] == 0
+
+
+def test_unusable_path_degrades_to_misses(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    cache = MatchCache(blocker / "cache" / "match_cache.sqlite3")
+
+    assert cache.get_many("auto_match", ["q"], **KEY) == {}
+    cache.put_many("auto_match", {"q": 1}, **KEY)
+    assert cache.trim() == 0
+    stats = cache.stats()
+    assert stats["available"] is False
+    assert stats["entries"] is None
+    assert stats["misses"] == 1
+
+
+def test_connect_failure_is_latched(tmp_path, monkeypatch, caplog):
+    # sqlite 파일이 아닌 파일: connect는 되지만 WAL 설정에서 실패
+    path = tmp_path / "match_cache.sqlite3"
+    path.write_bytes(b"not a sqlite database" * 10)
+    cache = MatchCache(path)
+    connects = []
+    real_connect = sqlite3.connect
+    monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: connects.append(args) or real_connect(*args, **kwargs))
+
+    with caplog.at_level("WARNING", logger="backend.Assembly.match_cache"):
+        for _ in range(3):
+            assert cache.get_many("auto_match", ["q"], **KEY) == {}
+            cache.put_many("auto_match", {"q": 1}, **KEY)
+
+    assert len(connects) == 1
+    assert len(caplog.records) == 1
+    assert cache.stats()["available"] is False
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List, Optional
+
+import pytest
+from rapidfuzz import fuzz, process
+
+from backend.Assembly.auto_match import combined_score, jw_score, match_one_best, normalize_text
+
+TOKENS = ["도어", "트림", "ASSY", "범퍼", "커버", "LH", "RH", "브라켓", "볼트", "클립", "A1", "b-2"]
+
+
+def _random_text(rnd: random.Random) -> str:
+    return " ".join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 4)))
+
+
+def _random_db(seed: int):
+    rnd = random.Random(seed)
+    texts = [_random_text(rnd) for _ in range(60)]
+    raws = [rnd.choice(texts) for _ in range(300)]
+    db_rows = [
+        {"db_part_raw": raw, "db_part_norm": normalize_text(raw), "sheet": f"S{i % 3}", "row_index": i}
+        for i, raw in enumerate(raws)
+    ]
+    queries = [_random_text(rnd) for _ in range(40)] + [raws[0], "", "   "]
+    return db_rows, [row["db_part_norm"] for row in db_rows], queries
+
+
+def _reference_best(query_raw: str, db_rows, db_choices: List[str], topk: int, score_cutoff=None) -> Optional[Dict[str, Any]]:
+    # 전체 선택지에 plain process.extract → TopK 중 JW 최고(동점이면 RF 순위가 앞선 후보)
+    qn = normalize_text(query_raw)
+    if not qn:
+        return None
+    best = None
+    for _, rf, idx in process.extract(
+        qn, db_choices, scorer=fuzz.WRatio, processor=None, limit=topk, score_cutoff=score_cutoff
+    ):
+        meta = db_rows[idx]
+        jw = jw_score(qn, meta["db_part_norm"])
+        if best is None or jw > best["score_jw"]:
+            best = {
+                "json_id_raw": query_raw,
+                "json_id_norm": qn,
+                "db_part_raw": meta["db_part_raw"],
+                "db_part_norm": meta["db_part_norm"],
+                "score_rapidfuzz": float(rf),
+                "score_jw": jw,
+                "score_combined": combined_score(rf, jw),
+                "sheet": meta["sheet"],
+                "row_index": meta["row_index"],
+            }
+    return best
+
+
+@pytest.mark.parametrize("score_cutoff", [None, 60.0])
+@pytest.mark.parametrize("topk", [1, 5, 12])
+def test_match_one_best_matches_plain_extract(topk, score_cutoff):
+    db_rows, db_choices, queries = _random_db(7)
+    for query in queries:
+        expected = _reference_best(query, db_rows, db_choices, topk, score_cutoff)
+        assert match_one_best(query, db_rows, db_choices, topk, score_cutoff) == expected
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List
+
+import pytest
+
+from backend.Assembly.auto_match import ChoiceTable, jw_score, normalize_text, rf_score
+from backend.Assembly.gram_index import GramIndex
+
+# sub_router는 BOM 모듈(pythoncom/win32com)을 함께 불러오므로 Windows 환경에서만 돈다
+sub_router = pytest.importorskip("backend.sub_router")
+
+TOKENS = ["도어", "트림", "ASSY", "범퍼", "커버", "LH", "RH", "브라켓", "볼트", "클립", "A1", "b-2"]
+
+
+class _FullScan:
+    # gram 역색인으로 추리지 않고 전체 unique 문자열을 훑는다
+    def candidates(self, query: str):
+        return None
+
+
+def _reference_suggestions(normalized_query: str, db_rows, uids: List[int], table: ChoiceTable, limit: int):
+    # 힙/조기 중단 없이 후보 전체 점수 → (부품 기준, 시트)별 최고점 → 전체 정렬
+    best_by_key: Dict[str, Dict[str, Any]] = {}
+    for uid in uids:
+        text = table.unique[uid]
+        rf = rf_score(normalized_query, text)
+        jw = jw_score(normalized_query, text)
+        for index in table.occurrences(uid).tolist():
+            meta = db_rows[index]
+            key = f"{meta['db_part_raw']}::{meta['sheet']}"
+            candidate = {
+                "db_part_raw": meta["db_part_raw"],
+                "db_part_norm": meta["db_part_norm"],
+                "sheet": meta["sheet"],
+                "row_index": meta["row_index"],
+                "row_position": index,
+                "score_rapidfuzz": round(rf, 2),
+                "score_jaro_winkler": round(jw, 2),
+                "score_combined": round((rf * 0.45) + (jw * 0.55), 2),
+            }
+            previous = best_by_key.get(key)
+            if previous is None or sub_router._suggestion_rank(candidate) > sub_router._suggestion_rank(previous):
+                best_by_key[key] = candidate
+    return sorted(best_by_key.values(), key=sub_router._suggestion_rank, reverse=True)[:limit]
+
+
+def _random_db(seed: int):
+    rnd = random.Random(seed)
+    texts = [" ".join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 4))) for _ in range(80)]
+    raws = [rnd.choice(texts) for _ in range(400)]
+    db_rows = [
+        {"db_part_raw": raw, "db_part_norm": normalize_text(raw), "sheet": f"S{rnd.randrange(3)}", "row_index": i}
+        for i, raw in enumerate(raws)
+    ]
+    queries = [normalize_text(" ".join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 3)))) for _ in range(30)]
+    return db_rows, ChoiceTable.build([row["db_part_norm"] for row in db_rows]), queries
+
+
+@pytest.mark.parametrize("limit", [1, 5, 20, 1000])
+def test_heap_matches_full_sort(limit):
+    db_rows, table, queries = _random_db(11)
+    for query in queries:
+        expected = _reference_suggestions(query, db_rows, list(range(len(table))), table, limit)
+        assert sub_router._score_part_suggestions(query, db_rows, table, _FullScan(), limit) == expected
+
+
+def _part_number_db(seed: int):
+    # 품번 + 영문 품명 (gram 역색인이 실제로 후보를 추리는 크기)
+    rnd = random.Random(seed)
+    words = ["DOOR", "TRIM", "BUMPER", "COVER", "BRKT", "BOLT", "CLIP", "PANEL", "HINGE", "LAMP", "SEAL", "NUT"]
+
+    def part_text() -> str:
+        return " ".join([str(rnd.randrange(10000, 99999))] + [rnd.choice(words) for _ in range(rnd.randint(1, 3))])
+
+    texts = [part_text() for _ in range(200)]
+    raws = [rnd.choice(texts) for _ in range(500)]
+    db_rows = [
+        {"db_part_raw": raw, "db_part_norm": normalize_text(raw), "sheet": f"S{rnd.randrange(3)}", "row_index": i}
+        for i, raw in enumerate(raws)
+    ]
+    queries = [normalize_text(rnd.choice(texts)[:rnd.randint(4, 12)]) for _ in range(20)]
+    queries += [normalize_text(part_text()) for _ in range(20)]
+    return db_rows, ChoiceTable.build([row["db_part_norm"] for row in db_rows]), queries
+
+
+@pytest.mark.parametrize("limit", [1, 5, 20])
+def test_gram_index_only_orders_candidates(limit):
+    # gram 후보 밖의 행도 RF 상한으로 확인하므로 전체 스캔과 결과가 같다
+    db_rows, table, queries = _part_number_db(12)
+    gram_index = GramIndex.build(table.unique)
+    pruned = 0
+    for query in queries:
+        uids = gram_index.candidates(query)
+        pruned += uids is not None
+        expected = _reference_suggestions(query, db_rows, list(range(len(table))), table, limit)
+        assert sub_router._score_part_suggestions(query, db_rows, table, gram_index, limit) == expected
+    assert pruned
+
+
+def test_no_suggestions_for_zero_limit():
+    db_rows, table, queries = _random_db(13)
+    assert sub_router._score_part_suggestions(queries[0], db_rows, table, _FullScan(), 0) == []
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import os
+import re
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, List
+
+# =========================
+# 설정
+# =========================
+# 정규화 함수별 LRU 크기 (부품명/공정 라벨/채팅 토큰은 종류가 제한적이라 적중률이 높다)
+NORMALIZE_CACHE_SIZE = int(os.getenv("TEXT_NORMALIZE_CACHE_SIZE", "65536"))
+
+# 부품명 정규화 규칙 (작업시간분석표 '부품 기준' 매칭)
+# 바꾸면 auto_match.MATCH_SCORING_VERSION도 올린다 (사전 매칭·매칭 캐시 무효화)
+STOP_TOKENS = {
+    "LH", "RH", "STD", "ECE", "LHD", "RHD", "LD", "HD", "EC",
+    "LEFT", "RIGHT",
+    "TYPE", "TYP", "ASSY", "S/A",
+}
+
+SYN_MAP = {
+    "BPR": "BUMPER",
+    "BUMPER": "BUMPER",
+    "BRKT": "BRACKET",
+    "BRACKET": "BRACKET",
+    "HSG": "HOUSING",
+    "HOUSING": "HOUSING",
+    "INR": "INNER",
+    "INNER": "INNER",
+    "OTR": "MAIN",
+    "OUTER": "MAIN",
+    "EXTN": "EXTENSION",
+    "EXT": "EXTENSION",
+    "EXTENSION": "EXTENSION",
+    "WIRG": "WIRING",
+    "WIRING": "WIRING",
+    "WIRE": "WIRING",
+    "TURN": "T/SIG",
+    "SIGNAL": "",
+}
+
+# 미리 컴파일한 패턴 / 문자 치환표
+_BRACKET_RE = re.compile(r"\[[^\]]*\]")
+_NON_PART_CHAR_RE = re.compile(r"[^A-Z0-9/ ]+")
+_NON_CHAT_CHAR_RE = re.compile(r"[^0-9A-Z가-힣/ ]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_TOKEN_SEPARATORS = str.maketrans({"-": " ", "_": " ", "(": " ", ")": " ", "/": " "})
+_KEY_SEPARATORS = str.maketrans({"-": " ", "_": " ", "(": " ", ")": " ", "[": " ", "]": " "})
+_DASH_SEPARATORS = str.maketrans({"-": " ", "_": " "})
+
+_NORMALIZERS: Dict[str, Callable[[Any], str]] = {}
+
+
+def memoized_normalizer(name: str, maxsize: int = NORMALIZE_CACHE_SIZE):
+    """
+    문자열 입력만 LRU 메모이즈하는 정규화 함수 데코레이터
+    - None/숫자 등 문자열이 아닌 값은 원래 함수로 (str(value or "") 규칙 그대로)
+    - normalizer_stats()에 name으로 적중률이 잡힌다
+    """
+
+    def decorate(fn: Callable[[Any], str]) -> Callable[[Any], str]:
+        cached = lru_cache(maxsize=maxsize)(fn)
+
+        @wraps(fn)
+        def wrapper(value: Any) -> str:
+            if type(value) is str:
+                return cached(value)
+            return fn(value)
+
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        wrapper.uncached = fn
+        _NORMALIZERS[name] = wrapper
+        return wrapper
+
+    return decorate
+
+
+def clean_text(value: Any) -> str:
+    return " ".join(str(value or "").split()).strip()
+
+
+# =========================
+# 정규화 함수
+# =========================
+@memoized_normalizer("part")
+def normalize_part_text(value: Any) -> str:
+    """부품명 매칭용: [] 제거, 영숫자// 만 남김, STOP_TOKENS 이후 버림, SYN_MAP 치환."""
+    if value is None:
+        return ""
+
+    text = str(value).strip()
+    if not text:
+        return ""
+
+    # [] 안 제거
+    text = _BRACKET_RE.sub(" ", text)
+    text = text.translate(_DASH_SEPARATORS).upper()
+    text = _NON_PART_CHAR_RE.sub(" ", text)
+
+    tokens: List[str] = []
+    for token in text.split():
+        # STOP_TOKENS 만나면 이후 토큰은 버림
+        if token in STOP_TOKENS:
+            break
+        token = SYN_MAP.get(token, token)
+        if token:
+            tokens.append(token)
+
+    return " ".join(tokens)
+
+
+@memoized_normalizer("token")
+def normalize_token_text(value: Any) -> str:
+    """라벨 키: 대문자 + 구분 기호(- _ ( ) /)를 공백으로 (한글 유지)."""
+    text = clean_text(value).upper()
+    if not text:
+        return ""
+    return " ".join(text.translate(_TOKEN_SEPARATORS).split())
+
+
+@memoized_normalizer("asciiToken")
+def normalize_ascii_token_text(value: Any) -> str:
+    """대문자 영숫자// 토큰만 남김 (한글 등은 공백으로)."""
+    text = clean_text(value).upper()
+    if not text:
+        return ""
+    text = _NON_PART_CHAR_RE.sub(" ", text.translate(_DASH_SEPARATORS))
+    return " ".join(text.split())
+
+
+@memoized_normalizer("chat")
+def normalize_chat_text(value: Any) -> str:
+    """채팅 질의/후보: 대문자 + 영숫자/한글// 만 남김."""
+    text = str(value or "").strip().upper()
+    if not text:
+        return ""
+    text = _NON_CHAT_CHAR_RE.sub(" ", text.translate(_DASH_SEPARATORS))
+    return " ".join(text.split())
+
+
+@memoized_normalizer("relationKey")
+def normalize_relation_key(value: Any) -> str:
+    """부품-공정 관계 키: 공백 정리 + 대문자."""
+    return _WHITESPACE_RE.sub(" ", str(value or "").strip()).upper()
+
+
+@memoized_normalizer("embeddingKey")
+def normalize_embedding_key(value: Any) -> str:
+    """임베딩 색인 키: 공백 정리 + 대문자 + 구분 기호(- _ ( ) [ ])를 공백으로 (공백 재정리 없음)."""
+    return clean_text(value).upper().translate(_KEY_SEPARATORS)
+
+
+# =========================
+# 통계
+# =========================
+def normalizer_stats() -> Dict[str, Dict[str, Any]]:
+    stats: Dict[str, Dict[str, Any]] = {}
+    for name, normalizer in _NORMALIZERS.items():
+        info = normalizer.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hitRate": round(info.hits / lookups, 4) if lookups else None,
+            "size": info.currsize,
+            "maxSize": info.maxsize,
+        }
+    return stats
+
+
+def clear_normalizer_caches() -> None:
+    for normalizer in _NORMALIZERS.values():
+        normalizer.cache_clear()
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("BACKEND_WARMUP", "true").strip().lower() not in {
+    "0",
+    "false",
+    "no",
+    "off",
+}
+
+# 필수 단계가 실패하면 이 간격(초)부터 두 배씩 늘려 가며 실패한 단계만 다시 시도 (0이면 재시도 없음)
+WARMUP_RETRY_SECONDS = float(os.getenv("BACKEND_WARMUP_RETRY_SECONDS", "30"))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("BACKEND_WARMUP_RETRY_MAX_SECONDS", "600"))
+
+_STATE_LOCK = threading.Lock()
+_THREAD_LOCK = threading.Lock()
+_WARMUP_THREAD: Optional[threading.Thread] = None
+# request_rewarm()이 재시도 대기를 깨울 때 사용
+_RETRY_WAKE = threading.Event()
+WARMUP_STATE: Dict[str, Dict[str, Any]] = {}
+
+
+class _SkipStep(Exception):
+    """선택 구성요소가 설정되지 않아 워밍업을 건너뛸 때 사용."""
+
+
+# -----------------------------
+# 워밍업 단계
+# -----------------------------
+def _warm_work_time_db() -> Optional[str]:
+    from backend.Assembly.db_snapshot import get_work_time_db_snapshot
+
+    return f"version={get_work_time_db_snapshot().version}"
+
+
+def _warm_assembly_cache() -> Optional[str]:
+    from backend.Assembly_router import ensure_assembly_cache
+
+    cache = ensure_assembly_cache()
+    return f"sheets={len(cache.get('sheets') or [])}"
+
+
+def _warm_sequence_part_matching() -> Optional[str]:
+    from backend.Assembly.auto_match import load_choice_table, load_match_gram_index
+    from backend.Assembly.db_registry import current_db_path
+
+    choice_table = load_choice_table(current_db_path())
+    load_match_gram_index(current_db_path())
+    return f"db_rows={choice_table.row_count} unique={len(choice_table)}"
+
+
+def _warm_process_templates() -> Optional[str]:
+    from backend.Seuqence_router import get_process_templates
+
+    return f"processes={get_process_templates().get('count', 0)}"
+
+
+def _warm_embedding_model() -> Optional[str]:
+    from backend.sequence.embedding_search import get_embedding_backend
+
+    backend = get_embedding_backend()
+    backend.warm()
+    return f"model={backend.name}"
+
+
+def _warm_embedding_index() -> Optional[str]:
+    # CPU 임베딩 빌드는 수 분 걸릴 수 있어 기다리지 않는다 (진행 상황은 /api/sequence/admin/embedding-index)
+    from backend.sequence.embedding_search import schedule_global_embedding_index_build
+
+    scheduled = schedule_global_embedding_index_build("warmup")
+    return "build scheduled" if scheduled else "build already scheduled"
+
+
+def _warm_graph_index() -> Optional[str]:
+    from backend.sequence_rag.runtime import get_or_build_index
+
+    return f"documents={len(get_or_build_index().documents)}"
+
+
+def _warm_neo4j_driver() -> Optional[str]:
+    from backend.sequence_rag.neo4j_retriever import _get_driver, is_neo4j_configured
+
+    if not is_neo4j_configured():
+        raise _SkipStep("not configured")
+    driver = _get_driver()
+    if driver is None:
+        raise _SkipStep("driver not installed")
+    driver.verify_connectivity()
+    return "connected"
+
+
+# (이름, 함수, 필수 여부) — 순서대로 실행. DB 스냅샷을 먼저 올려 뒤 단계가 공유하게 한다.
+WARMUP_STEPS: List[Tuple[str, Callable[[], Optional[str]], bool]] = [
+    ("workTimeDb", _warm_work_time_db, True),
+    ("assemblyCache", _warm_assembly_cache, True),
+    ("sequencePartMatching", _warm_sequence_part_matching, True),
+    ("processTemplates", _warm_process_templates, True),
+    ("embeddingModel", _warm_embedding_model, False),
+    ("embeddingIndex", _warm_embedding_index, False),
+    ("graphIndex", _warm_graph_index, False),
+    ("neo4jDriver", _warm_neo4j_driver, False),
+]
+
+
+def _set_step(name: str, **updates: Any) -> None:
+    with _STATE_LOCK:
+        WARMUP_STATE[name].update(updates)
+
+
+def _reset_state() -> None:
+    with _STATE_LOCK:
+        WARMUP_STATE.clear()
+        for name, _, required in WARMUP_STEPS:
+            WARMUP_STATE[name] = {
+                "status": "pending",
+                "required": required,
+                "seconds": None,
+                "detail": None,
+                "error": None,
+                "attempts": 0,
+            }
+
+
+def _failed_steps(*, required_only: bool = False) -> List[str]:
+    with _STATE_LOCK:
+        return [
+            name
+            for name, item in WARMUP_STATE.items()
+            if item["status"] == "failed" and (item["required"] or not required_only)
+        ]
+
+
+def _run_steps(names: List[str]) -> None:
+    selected = set(names)
+    for name, step, _ in WARMUP_STEPS:
+        if name not in selected:
+            continue
+        with _STATE_LOCK:
+            WARMUP_STATE[name]["status"] = "running"
+            WARMUP_STATE[name]["attempts"] += 1
+        started = time.perf_counter()
+        try:
+            detail = step()
+            status, error = "ready", None
+        except _SkipStep as exc:
+            detail, status, error = str(exc), "skipped", None
+        except Exception as exc:
+            detail, status, error = None, "failed", str(getattr(exc, "detail", None) or exc)
+            logger.warning("Warm-up step %s failed: %s", name, error)
+        seconds = round(time.perf_counter() - started, 3)
+        _set_step(name, status=status, seconds=seconds, detail=detail, error=error)
+        logger.info("Warm-up step %s %s in %.3fs", name, status, seconds)
+
+
+def run_warmup(names: Optional[List[str]] = None) -> None:
+    """
+    워밍업 단계 실행 (names가 없으면 전체)
+    - 필수 단계가 실패하면 간격을 늘려 가며 실패한 단계만 다시 시도 (request_rewarm()으로 즉시 재시도)
+    """
+    _run_steps(names if names is not None else [name for name, _, _ in WARMUP_STEPS])
+
+    delay = WARMUP_RETRY_SECONDS
+    while delay > 0 and _failed_steps(required_only=True):
+        logger.warning(
+            "Required warm-up steps failed (%s); retrying in %.0fs",
+            ", ".join(_failed_steps(required_only=True)),
+            delay,
+        )
+        _RETRY_WAKE.wait(delay)
+        _RETRY_WAKE.clear()
+        _run_steps(_failed_steps())
+        delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+
+def _start_thread(names: Optional[List[str]]) -> None:
+    global _WARMUP_THREAD
+
+    _RETRY_WAKE.clear()
+    _WARMUP_THREAD = threading.Thread(target=run_warmup, args=(names,), name="backend-warmup", daemon=True)
+    _WARMUP_THREAD.start()
+
+
+def start_background_warmup() -> bool:
+    if not WARMUP_ENABLED:
+        return False
+    with _THREAD_LOCK:
+        if _WARMUP_THREAD is not None and _WARMUP_THREAD.is_alive():
+            return False
+        _reset_state()
+        _start_thread(None)
+    return True
+
+
+def request_rewarm() -> bool:
+    """
+    실패한 워밍업 단계 즉시 재시도 (/admin/reload 등에서 호출)
+    - 재시도 대기 중이면 깨우고, 워밍업 스레드가 끝났으면 실패한 단계만 새로 실행
+    """
+    if not WARMUP_ENABLED:
+        return False
+    with _THREAD_LOCK:
+        if _WARMUP_THREAD is not None and _WARMUP_THREAD.is_alive():
+            _RETRY_WAKE.set()
+            return True
+        failed = _failed_steps()
+        if not failed:
+            return False
+        _start_thread(failed)
+    return True
+
+
+def get_readiness() -> Dict[str, Any]:
+    """
+    준비 여부는 필수 단계만으로 판단하고, 선택 단계(임베딩/그래프 색인 등)는 참고용으로만 보고한다.
+    """
+    with _STATE_LOCK:
+        subsystems = {name: dict(item) for name, item in WARMUP_STATE.items()}
+
+    if not WARMUP_ENABLED:
+        return {"ready": True, "warmup": "disabled", "subsystems": subsystems}
+
+    required = [item for item in subsystems.values() if item["required"]]
+    finished = all(item["status"] not in {"pending", "running"} for item in subsystems.values())
+    return {
+        "ready": bool(required) and all(item["status"] == "ready" for item in required),
+        "warmup": "finished" if finished else "running",
+        "optional": {name: item["status"] for name, item in subsystems.items() if not item["required"]},
+        "subsystems": subsystems,
+    }